@@ -0,0 +1,123 @@
+"""
+Benchmark Fakes
+Local stand-ins for Firestore and Firebase Auth with injected latency
+"""
+import asyncio
+import random
+import time
+import types
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from services.local_repository import MemoryRepository
+from services.repository_base import Filter, Transaction, Write
+
+
+class LatencyRepository(MemoryRepository):
+    """
+    In-memory repository that waits like a remote datastore
+
+    Every call costs one round-trip of latency seconds (plus uniform
+    jitter), awaited without blocking the event loop, so concurrent
+    calls overlap the way Firestore calls through io_executor do.
+    Latency is 0 until enabled, so datasets can be seeded quickly.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+
+    async def _round_trip(self):
+        self.calls += 1
+        delay = self.latency + random.uniform(0, self.jitter) if self.latency else 0
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        await self._round_trip()
+        await super().set(collection, doc_id, data, merge)
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        await self._round_trip()
+        return await super().get(collection, doc_id)
+
+    async def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        await self._round_trip()
+        await super().update(collection, doc_id, updates)
+
+    async def delete(self, collection: str, doc_id: str):
+        await self._round_trip()
+        await super().delete(collection, doc_id)
+
+    async def query(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[Any, str]] = None
+    ) -> List[Dict[str, Any]]:
+        await self._round_trip()
+        return await super().query(collection, filters, order_by, descending, limit, start_after)
+
+    async def count(self, collection: str, filters: Sequence[Filter] = ()) -> int:
+        await self._round_trip()
+        return await super().count(collection, filters)
+
+    async def run_transaction(self, func: Callable[[Transaction], Any]) -> Any:
+        # Firestore transactions take a begin and a commit round-trip
+        await self._round_trip()
+        await self._round_trip()
+        return await super().run_transaction(func)
+
+    async def write_batch(self, writes: Sequence[Write]):
+        # A batch is a single commit, not a transaction
+        await self._round_trip()
+        await MemoryRepository.run_transaction(self, lambda tx: self._apply(tx, writes))
+
+    @staticmethod
+    def _apply(tx: Transaction, writes: Sequence[Write]):
+        for operation, collection, doc_id, data in writes:
+            if operation == 'delete':
+                tx.delete(collection, doc_id)
+            else:
+                getattr(tx, operation)(collection, doc_id, data)
+
+
+class FakeFirebaseAuth:
+    """
+    The firebase_admin.auth calls AuthService makes, with latency
+
+    Calls block for latency seconds like the SDK's HTTP requests; ID
+    tokens are accepted as 'token:{uid}' without a network call, as
+    firebase_admin does once the signing certificates are cached.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.users: Dict[str, str] = {}
+
+    def add_user(self, uid: str, email: str):
+        self.users[email.lower()] = uid
+
+    def get_user_by_email(self, email: str):
+        if self.latency:
+            time.sleep(self.latency)
+        uid = self.users.get(email.lower())
+        if uid is None:
+            raise ValueError(f"No user record found for email: {email}")
+        return types.SimpleNamespace(uid=uid, email=email)
+
+    def verify_id_token(self, id_token: str) -> Dict[str, Any]:
+        prefix, _, uid = id_token.partition(':')
+        if prefix != 'token' or uid not in self.users.values():
+            raise ValueError('Invalid ID token')
+        return {'uid': uid}
+
+    def create_user(self, email: str, password: str, display_name: str = ''):
+        if self.latency:
+            time.sleep(self.latency)
+        uid = f"uid-{len(self.users) + 1}"
+        self.add_user(uid, email)
+        return types.SimpleNamespace(uid=uid, email=email)
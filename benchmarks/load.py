@@ -0,0 +1,612 @@
+"""
+Load Test
+Simulated browser sessions against the Flet web app, over its websocket
+
+    python -m benchmarks.load [--sessions 50] [--ramp 10] [--iterations 3] [--url http://host:8551]
+
+Starts main.py in demo mode (in-memory datastore, no Firebase) unless
+--url points at a running instance, then opens --sessions concurrent
+sessions speaking the protocol of the Flet web client (Flet 0.21: JSON
+messages on /ws). Each session keeps a mirror of its page's controls,
+logs in with a demo user, opens a quick action and logs out, and ends
+logged in on its dashboard, so the server holds every session with its
+live subscriptions when memory is sampled.
+
+Reports per-event latency percentiles (from sending the event to the
+resulting controls arriving), event throughput, and the server's RSS
+per session (Linux only). Results go to benchmarks/results/load-*.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Demo users of AuthService, by role
+DEMO_USERS = {
+    'nutritionist': ('nutri@test.com', 'test123'),
+    'client': ('cliente@test.com', 'test123'),
+}
+
+# Texts of the controls sessions look for (see ui/screens)
+EMAIL_LABEL = 'Correo Electrónico'
+PASSWORD_LABEL = 'Contraseña'
+LOGIN_TEXT = 'Iniciar Sesión'
+LOGOUT_TOOLTIP = 'Cerrar sesión'
+QUICK_ACTIONS = {'nutritionist': 'Ver Clientes', 'client': 'Ver Progreso'}
+
+EVENTS = ('connect', 'login', 'action', 'logout')
+
+
+class ControlTree:
+    """
+    Mirror of a page's controls, kept from the messages the server sends
+
+    Controls are the dicts of the Flet protocol: 'i' (id), 't' (type),
+    'p' (parent id), 'c' (child ids) and lowercase properties.
+    """
+
+    def __init__(self):
+        self.controls: Dict[str, Dict[str, Any]] = {}
+
+    def apply(self, message: Dict[str, Any]):
+        action, payload = message.get('action'), message.get('payload')
+        if action == 'registerWebClient':
+            self.controls = payload['session']['controls']
+        elif action == 'pageControlsBatch':
+            for inner in payload:
+                self.apply(inner)
+        elif action == 'addPageControls':
+            for control_id in payload.get('trimIDs') or []:
+                self._remove(control_id)
+            for control in payload['controls']:
+                self.controls[control['i']] = control
+                parent = self.controls.get(control['p'])
+                if parent is not None and control['i'] not in parent['c']:
+                    parent['c'].append(control['i'])
+        elif action == 'updateControlProps':
+            for props in payload['props']:
+                control = self.controls.get(props['i'])
+                if control is not None:
+                    control.update(props)
+        elif action == 'cleanControl':
+            for control_id in payload['ids']:
+                control = self.controls.get(control_id)
+                if control is not None:
+                    for child_id in list(control['c']):
+                        self._remove(child_id)
+        elif action == 'removeControl':
+            for control_id in payload['ids']:
+                self._remove(control_id)
+        elif action == 'sessionCrashed':
+            raise RuntimeError(f"Session crashed: {payload.get('message')}")
+
+    def _remove(self, control_id: str):
+        control = self.controls.pop(control_id, None)
+        if control is None:
+            return
+        for child_id in control['c']:
+            self._remove(child_id)
+        parent = self.controls.get(control['p'])
+        if parent is not None and control_id in parent['c']:
+            parent['c'].remove(control_id)
+
+    def find(self, control_type: str, **props: str) -> Optional[str]:
+        """ID of the first control of a type with the given properties"""
+        for control_id, control in self.controls.items():
+            if control['t'] == control_type and all(control.get(k) == v for k, v in props.items()):
+                return control_id
+        return None
+
+    def ancestor(self, control_id: Optional[str], control_type: str) -> Optional[str]:
+        """Nearest control of a type containing a control"""
+        while control_id:
+            control = self.controls.get(control_id)
+            if control is None:
+                return None
+            if control['t'] == control_type:
+                return control_id
+            control_id = control['p']
+        return None
+
+    def ids(self, control_type: str) -> set:
+        return {control_id for control_id, control in self.controls.items() if control['t'] == control_type}
+
+
+class Report:
+    """Latencies and failures per event, shared by all sessions"""
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = {event: [] for event in EVENTS}
+        self.errors: Dict[str, int] = {event: 0 for event in EVENTS}
+        self.failures: List[str] = []
+
+    def record(self, event: str, started: float):
+        self.timings[event].append((time.perf_counter() - started) * 1000)
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        events = {}
+        for event in EVENTS:
+            ordered = sorted(self.timings[event])
+            if not ordered:
+                events[event] = {'count': 0, 'errors': self.errors[event]}
+                continue
+
+            def percentile(p: float) -> float:
+                return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+            events[event] = {
+                'count': len(ordered),
+                'errors': self.errors[event],
+                'meanMs': round(statistics.fmean(ordered), 3),
+                'p50Ms': round(percentile(50), 3),
+                'p95Ms': round(percentile(95), 3),
+                'p99Ms': round(percentile(99), 3),
+                'maxMs': round(ordered[-1], 3),
+            }
+        completed = sum(len(timings) for timings in self.timings.values())
+        return {
+            'events': events,
+            'durationSeconds': round(duration, 2),
+            'eventsPerSecond': round(completed / duration, 2) if duration else 0.0,
+            'loginsPerSecond': round(len(self.timings['login']) / duration, 2) if duration else 0.0,
+        }
+
+
+class SimulatedSession:
+    """One browser tab: a websocket and the controls it is showing"""
+
+    def __init__(self, http: aiohttp.ClientSession, ws_url: str, report: Report, timeout: float):
+        self.http = http
+        self.ws_url = ws_url
+        self.report = report
+        self.timeout = timeout
+        self.tree = ControlTree()
+        self.session_id: Optional[str] = None
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._changed = asyncio.Event()
+        self._receiver: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    async def _send(self, action: str, payload: Dict[str, Any]):
+        await self.ws.send_str(json.dumps({'action': action, 'payload': payload}, separators=(',', ':')))
+
+    async def _receive(self):
+        try:
+            async for message in self.ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    break
+                data = json.loads(message.data)
+                self.tree.apply(data)
+                if data.get('action') == 'registerWebClient':
+                    self.session_id = data['payload']['session']['id']
+                self._changed.set()
+        except Exception as e:
+            self._error = e
+        finally:
+            if self._error is None:
+                self._error = ConnectionError('websocket closed by the server')
+            self._changed.set()
+
+    async def wait_for(self, predicate: Callable[[], Any], deadline: float) -> Any:
+        """Wait until the mirrored page satisfies predicate (returns its result)"""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._changed.clear()
+            found = predicate()
+            if found:
+                return found
+            if self._error is not None:
+                raise self._error
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.wait_for(self._changed.wait(), remaining)
+
+    async def _act(
+        self,
+        event: str,
+        target: Callable[[], Optional[str]],
+        done: Callable[[], Any],
+        retry: bool = False
+    ):
+        """
+        Click a control and time until done() holds
+
+        With retry, the target is looked up again and re-clicked if the
+        page replaced it before the click landed (a dashboard refreshing
+        with its data), as a user would. Without it, the click is expected
+        to replace the target (navigation cleans the page first).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        control_id = await self.wait_for(target, deadline)
+        started = time.perf_counter()
+        await self.click(control_id)
+        while True:
+            clicked = control_id
+            if retry:
+                await self.wait_for(lambda: done() or clicked not in self.tree.controls, deadline)
+            else:
+                await self.wait_for(done, deadline)
+            if done():
+                break
+            control_id = await self.wait_for(target, deadline)
+            await self.click(control_id)
+        self.report.record(event, started)
+
+    async def click(self, control_id: str):
+        await self._send('pageEventFromWeb', {'eventTarget': control_id, 'eventName': 'click', 'eventData': ''})
+
+    async def set_value(self, control_id: str, value: str):
+        """Type into a field: the browser sends the new value as a property change"""
+        await self._send('updateControlProps', {'props': [{'i': control_id, 'value': value}]})
+
+    def _login_form(self) -> Optional[str]:
+        if self.tree.find('iconbutton', tooltip=LOGOUT_TOOLTIP):
+            return None
+        return self.tree.ancestor(self.tree.find('text', value=LOGIN_TEXT), 'elevatedbutton')
+
+    def _dashboard(self) -> Optional[str]:
+        return self.tree.find('iconbutton', tooltip=LOGOUT_TOOLTIP)
+
+    async def connect(self):
+        """Open the page as a new tab and wait for the login form"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.ws = await self.http.ws_connect(self.ws_url, max_msg_size=0)
+        self._receiver = asyncio.create_task(self._receive())
+        media = json.dumps({side: {'left': 0, 'top': 0, 'right': 0, 'bottom': 0}
+                            for side in ('padding', 'view_padding', 'view_insets')})
+        await self._send('registerWebClient', {
+            'pageName': '',
+            'pageRoute': '/',
+            'pageWidth': '1280',
+            'pageHeight': '800',
+            'windowWidth': '1280',
+            'windowHeight': '800',
+            'windowTop': '0',
+            'windowLeft': '0',
+            'isPWA': 'false',
+            'isWeb': 'true',
+            'isDebug': 'false',
+            'platform': 'linux',
+            'platformBrightness': 'light',
+            'media': media,
+            'sessionId': '',
+        })
+        await self.wait_for(self._login_form, loop.time() + self.timeout)
+        self.report.record('connect', started)
+
+    async def login(self, email: str, password: str):
+        """Fill in the login form and wait for the dashboard"""
+        await self.set_value(self.tree.find('textfield', label=EMAIL_LABEL), email)
+        await self.set_value(self.tree.find('textfield', label=PASSWORD_LABEL), password)
+        await self._act('login', self._login_form, self._dashboard)
+
+    async def quick_action(self, text: str):
+        """Click a dashboard quick action and wait for its snackbar"""
+        shown = self.tree.ids('snackbar')
+        await self._act(
+            'action',
+            lambda: self.tree.find('elevatedbutton', text=text),
+            lambda: self.tree.ids('snackbar') - shown,
+            retry=True
+        )
+
+    async def logout(self):
+        """Log out and wait for the login form"""
+        await self._act('logout', self._dashboard, self._login_form)
+
+    async def close(self):
+        """Close the tab: the browser reports it before dropping the socket"""
+        try:
+            if self.ws is not None and not self.ws.closed:
+                await self._send('pageEventFromWeb', {'eventTarget': 'page', 'eventName': 'close', 'eventData': ''})
+                await self.ws.close()
+        except Exception:
+            pass
+        if self._receiver is not None:
+            self._receiver.cancel()
+
+
+async def _think(seconds: float):
+    if seconds:
+        await asyncio.sleep(random.uniform(0.5, 1.5) * seconds)
+
+
+async def drive(
+    index: int,
+    http: aiohttp.ClientSession,
+    ws_url: str,
+    report: Report,
+    args: argparse.Namespace
+) -> Optional[SimulatedSession]:
+    """Start a session after its ramp-up delay and run the user journey"""
+    await asyncio.sleep(index * args.ramp / args.sessions)
+    role = args.role if args.role != 'both' else ('nutritionist', 'client')[index % 2]
+    email, password = DEMO_USERS[role]
+    session = SimulatedSession(http, ws_url, report, args.timeout)
+    event = 'connect'
+    try:
+        await session.connect()
+        for iteration in range(args.iterations):
+            await _think(args.think)
+            event = 'login'
+            await session.login(email, password)
+            await _think(args.think)
+            event = 'action'
+            await session.quick_action(QUICK_ACTIONS[role])
+            if iteration < args.iterations - 1:
+                await _think(args.think)
+                event = 'logout'
+                await session.logout()
+        return session
+    except Exception as e:
+        report.errors[event] += 1
+        report.failures.append(f"session {index} ({role}) {event}: {type(e).__name__} {e}".strip())
+        await session.close()
+        return None
+
+
+def _rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident memory of a process in MiB, from /proc (Linux)"""
+    if not pid:
+        return None
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def _sample_rss(pid: Optional[int], samples: List[float], interval: float = 0.5):
+    while True:
+        rss = _rss_mb(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+async def _scrape_sessions(http: aiohttp.ClientSession, metrics_url: Optional[str]) -> Dict[str, float]:
+    """Session gauges from the app's /metrics endpoint"""
+    if not metrics_url:
+        return {}
+    try:
+        async with http.get(metrics_url) as response:
+            text = await response.text()
+    except Exception as e:
+        print(f"⚠️  Could not scrape {metrics_url}: {e}")
+        return {}
+    gauges = {}
+    for name in ('nutri_sessions_active', 'nutri_sessions_authenticated'):
+        match = re.search(rf'^{name} (\S+)$', text, re.MULTILINE)
+        if match:
+            gauges[name] = float(match.group(1))
+    return gauges
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """main.py in demo mode, on free ports, logging to a temporary file"""
+
+    def __init__(self):
+        self.port = _free_port()
+        self.metrics_port = _free_port()
+        self.log = tempfile.NamedTemporaryFile(prefix='nutri-load-', suffix='.log', delete=False)
+        env = dict(
+            os.environ,
+            DEMO_MODE='true',
+            DATA_BACKEND='memory',
+            PORT=str(self.port),
+            METRICS_PORT=str(self.metrics_port),
+            # Serve only: do not try to open a browser
+            FLET_FORCE_WEB_SERVER='true',
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, 'main.py'], cwd=ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    async def ready(self, http: aiohttp.ClientSession, timeout: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"main.py exited with code {self.process.returncode}, see {self.log.name}")
+            try:
+                async with http.get(self.url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.25)
+        raise RuntimeError(f"main.py did not answer within {timeout:.0f}s, see {self.log.name}")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    server = Server() if not args.url else None
+    base_url = server.url if server else args.url.rstrip('/')
+    pid = server.process.pid if server else args.pid
+    metrics_url = f'http://127.0.0.1:{server.metrics_port}/metrics' if server else args.metrics_url
+    ws_url = re.sub(r'^http', 'ws', base_url) + '/ws'
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        try:
+            if server:
+                await server.ready(http, args.startup_timeout)
+                print(f"Server started on {base_url} (pid {pid}, log {server.log.name})")
+
+            # Warm-up: the first login of each role imports the dashboards
+            warmup_args = argparse.Namespace(**dict(vars(args), iterations=1, think=0, ramp=0, role='both'))
+            warmup = Report()
+            sessions = [await drive(index, http, ws_url, warmup, warmup_args) for index in range(2)]
+            for session in sessions:
+                if session is not None:
+                    await session.close()
+            if warmup.failures:
+                raise RuntimeError(f"Warm-up failed: {warmup.failures[0]}")
+            await asyncio.sleep(args.settle)
+
+            baseline = _rss_mb(pid)
+            samples: List[float] = []
+            sampler = asyncio.create_task(_sample_rss(pid, samples))
+
+            report = Report()
+            started = time.perf_counter()
+            sessions = await asyncio.gather(*(
+                drive(index, http, ws_url, report, args) for index in range(args.sessions)
+            ))
+            duration = time.perf_counter() - started
+            open_sessions = [session for session in sessions if session is not None]
+
+            # Every surviving session is parked on its dashboard
+            await asyncio.sleep(args.hold)
+            held = _rss_mb(pid)
+            gauges = await _scrape_sessions(http, metrics_url)
+
+            await asyncio.gather(*(session.close() for session in open_sessions))
+            await asyncio.sleep(args.settle)
+            after_close = _rss_mb(pid)
+            gauges_after = await _scrape_sessions(http, metrics_url)
+            sampler.cancel()
+        finally:
+            if server:
+                server.stop()
+
+    results = report.summary(duration)
+    results['sessions'] = {
+        'requested': args.sessions,
+        'completed': len(open_sessions),
+        'failed': args.sessions - len(open_sessions),
+        'failures': report.failures[:20],
+    }
+    memory: Dict[str, Any] = {'available': baseline is not None}
+    if baseline is not None and held is not None:
+        memory.update({
+            'baselineMb': round(baseline, 1),
+            'heldMb': round(held, 1),
+            'peakMb': round(max(samples + [held]), 1),
+            'afterCloseMb': round(after_close, 1) if after_close is not None else None,
+            'perSessionKb': round((held - baseline) * 1024 / len(open_sessions), 1) if open_sessions else None,
+        })
+    results['memory'] = memory
+    results['server'] = {'held': gauges, 'afterClose': gauges_after}
+
+    return {
+        'commit': _commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=ROOT
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.load',
+        description='Load test the Flet web app with simulated browser sessions'
+    )
+    parser.add_argument('--sessions', type=int, default=50, help='Concurrent sessions')
+    parser.add_argument('--ramp', type=float, default=10, help='Seconds over which sessions are started')
+    parser.add_argument('--iterations', type=int, default=3, help='Login/action rounds per session')
+    parser.add_argument('--think', type=float, default=0.5, help='Mean seconds between events of a session')
+    parser.add_argument('--role', choices=('both', 'nutritionist', 'client'), default='both',
+                        help='Demo user sessions log in as (both alternates)')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for the result of an event')
+    parser.add_argument('--hold', type=float, default=5, help='Seconds all sessions stay open before closing')
+    parser.add_argument('--settle', type=float, default=2, help='Seconds to let the server settle before sampling')
+    parser.add_argument('--startup-timeout', type=float, default=60, help='Seconds to wait for main.py to serve')
+    parser.add_argument('--url', help='Running instance to test instead of starting main.py')
+    parser.add_argument('--pid', type=int, help='Process ID of the --url instance, for memory sampling')
+    parser.add_argument('--metrics-url', help='/metrics endpoint of the --url instance')
+    parser.add_argument('--output', help='Results file (default benchmarks/results/load-{timestamp}-{commit}.json)')
+    args = parser.parse_args(argv)
+    if args.sessions < 1 or args.iterations < 1:
+        parser.error('--sessions and --iterations must be at least 1')
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = _parse_args(argv)
+    report = asyncio.run(run(args))
+    results = report['results']
+
+    print(f"\n{'event':10} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, event in results['events'].items():
+        if not event['count']:
+            print(f"{name:10} {0:7} {event['errors']:7}")
+            continue
+        print(f"{name:10} {event['count']:7} {event['errors']:7} {event['p50Ms']:9.1f} "
+              f"{event['p95Ms']:9.1f} {event['p99Ms']:9.1f} {event['maxMs']:9.1f}")
+
+    sessions = results['sessions']
+    print(f"\nSessions: {sessions['completed']}/{sessions['requested']} completed "
+          f"in {results['durationSeconds']}s, {results['eventsPerSecond']} events/s, "
+          f"{results['loginsPerSecond']} logins/s")
+    memory = results['memory']
+    if memory.get('perSessionKb') is not None:
+        print(f"Server RSS: {memory['baselineMb']} MiB idle, {memory['heldMb']} MiB with "
+              f"{sessions['completed']} sessions (~{memory['perSessionKb']} KiB/session), "
+              f"{memory['afterCloseMb']} MiB after closing")
+    elif not memory['available']:
+        print("Server RSS: not available (needs /proc and a local server or --pid)")
+    for failure in sessions['failures'][:5]:
+        print(f"⚠️  {failure}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load-{datetime.now():%Y%m%d-%H%M%S}-{report['commit'] or 'nocommit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Service Benchmarks
+Times the real services against a fake datastore with injected latency
+
+    python -m benchmarks.run [--latency-ms 20] [--measurements 500] [--compare old.json]
+
+Scenarios: login (profile cache cold and warm, email and ID token),
+both dashboard loads, measurement creation with photos, and history
+fetches. Results (with the commit, configuration and Firestore-billable
+document counts per call) are written as JSON to benchmarks/results/.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from benchmarks.fakes import FakeFirebaseAuth, LatencyRepository
+from services.appointment_service import AppointmentService
+from services.auth_service import AuthService
+from services.blob_store import LocalBlobStore
+from services.client_service import ClientService
+from services.measurement_service import MeasurementService
+from services.metrics import metrics
+from services.photo_pipeline import PhotoPipeline
+from services.realtime import RealtimeHub
+from services.repository import InstrumentedRepository
+from services.session_registry import SessionRegistry
+from services.stats_service import StatsService
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+NUTRITIONIST = {'id': 'bench-nutri', 'email': 'nutri@bench.test', 'role': 'nutritionist', 'name': 'Bench Nutri'}
+CLIENT = {'id': 'bench-client', 'email': 'client@bench.test', 'role': 'client', 'name': 'Bench Client'}
+
+
+class Bench:
+    """Services wired to the fakes, plus the seeded dataset"""
+
+    def __init__(self, args: argparse.Namespace, media_dir: str):
+        self.args = args
+        self.store = LatencyRepository()
+        self.repo = InstrumentedRepository(self.store)
+        self.firebase_auth = FakeFirebaseAuth()
+        hub = RealtimeHub()
+        self.auth = AuthService(self.repo, SessionRegistry(), auth=self.firebase_auth)
+        self.clients = ClientService(self.repo)
+        self.appointments = AppointmentService(self.repo, hub)
+        self.stats = StatsService(self.repo, hub)
+        self.measurements = MeasurementService(
+            repo=self.repo,
+            pipeline=PhotoPipeline(pool=args.photo_pool),
+            blobs=LocalBlobStore(media_dir),
+            layout=args.layout,
+            hub=hub
+        )
+
+    async def seed(self):
+        """Build the dataset with latency off"""
+        args = self.args
+        rng = random.Random(args.seed)
+        for user in (NUTRITIONIST, CLIENT):
+            await self.repo.set('users', user['id'], dict(user, createdAt=datetime.now()))
+            self.firebase_auth.add_user(user['id'], user['email'])
+
+        # The benchmarked client, plus others sharing the nutritionist
+        await self.repo.set('clients', CLIENT['id'], {
+            'nutritionistId': NUTRITIONIST['id'],
+            'personalInfo': {'name': CLIENT['name'], 'email': CLIENT['email']},
+            'medicalHistory': {},
+            'createdAt': datetime.now(),
+        })
+        for index in range(args.clients - 1):
+            await self.clients.create_client(
+                NUTRITIONIST['id'], {'name': f"Cliente {index}", 'email': f"c{index}@bench.test"}, {}
+            )
+
+        now = datetime.now()
+        for index in range(args.appointments):
+            await self.appointments.create_appointment(
+                CLIENT['id'], NUTRITIONIST['id'],
+                now + timedelta(days=rng.randint(-180, 60), hours=rng.randint(8, 18))
+            )
+
+        # Daily history ending today
+        weight = 90.0
+        for index in range(args.measurements):
+            weight += rng.uniform(-0.4, 0.3)
+            measurement = await self.measurements.create_measurement(
+                CLIENT['id'], round(weight, 1), 170,
+                waist=round(weight * 1.05, 1), hip=round(weight * 1.15, 1)
+            )
+            # Backdate: create_measurement stamps the current time
+            date = now - timedelta(days=args.measurements - index)
+            await self._backdate(measurement['measurement'], date)
+
+        # The benchmarked client was stored directly: reconcile the counters
+        # as the stats job would, so dashboards read the counters document
+        await self.stats.rebuild_counters(NUTRITIONIST['id'])
+
+    async def _backdate(self, measurement: Dict[str, Any], date: datetime):
+        if self.measurements.bucketed:
+            buckets = self.measurements.buckets
+
+            def move(tx):
+                from services.measurement_buckets import append_row, bucket_id, new_bucket, remove_row
+                # All reads before the first write, each bucket written once
+                source_id = bucket_id(CLIENT['id'], measurement['date'])
+                target_id = bucket_id(CLIENT['id'], date)
+                source = tx.get(buckets.collection, source_id)
+                target = source if target_id == source_id else (
+                    tx.get(buckets.collection, target_id) or new_bucket(CLIENT['id'], date)
+                )
+                remove_row(source, measurement['id'])
+                append_row(target, dict(measurement, date=date))
+                for doc_id, bucket in {source_id: source, target_id: target}.items():
+                    bucket.pop('id', None)
+                    tx.set(buckets.collection, doc_id, bucket)
+            await self.repo.run_transaction(move)
+        else:
+            await self.repo.update('measurements', measurement['id'], {'date': date})
+
+    def photos(self, count: int) -> List[bytes]:
+        """Distinct synthetic JPEG photos (distinct so content dedupe cannot skip work)"""
+        from io import BytesIO
+        from PIL import Image
+
+        size = self.args.photo_size
+        base = Image.effect_noise((size, size * 4 // 3), 64).convert('RGB')
+        photos = []
+        for index in range(count):
+            image = base.copy()
+            image.putpixel((index % size, index // size), (index % 256, 0, 0))
+            buffer = BytesIO()
+            image.save(buffer, format='JPEG', quality=90)
+            photos.append(buffer.getvalue())
+        return photos
+
+
+def _summary(timings: List[float], calls: int, counts: Dict[str, float], iterations: int) -> Dict[str, Any]:
+    ordered = sorted(timings)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        'iterations': iterations,
+        'meanMs': round(statistics.fmean(ordered), 3),
+        'p50Ms': round(percentile(50), 3),
+        'p95Ms': round(percentile(95), 3),
+        'p99Ms': round(percentile(99), 3),
+        'minMs': round(ordered[0], 3),
+        'maxMs': round(ordered[-1], 3),
+        'datastoreCallsPerOp': round(calls / iterations, 2),
+        'documentsPerOp': {kind: round(value / iterations, 2) for kind, value in counts.items()},
+    }
+
+
+async def measure(
+    bench: Bench,
+    iterations: int,
+    operation: Callable[[int], Awaitable[Any]],
+    before: Optional[Callable[[], None]] = None
+) -> Dict[str, Any]:
+    """Run operation(i) iterations times, sequentially, after one warm-up call"""
+    if before:
+        before()
+    await operation(-1)
+
+    timings = []
+    calls = bench.store.calls
+    documents = {kind: metrics.datastore_documents.total(kind=kind) for kind in ('read', 'write', 'delete')}
+    for index in range(iterations):
+        if before:
+            before()
+        started = time.perf_counter()
+        await operation(index)
+        timings.append((time.perf_counter() - started) * 1000)
+    counts = {
+        kind: metrics.datastore_documents.total(kind=kind) - value for kind, value in documents.items()
+    }
+    return _summary(timings, bench.store.calls - calls, counts, iterations)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix='nutri-bench-') as media_dir:
+        bench = Bench(args, media_dir)
+        started = time.perf_counter()
+        await bench.seed()
+        seed_seconds = time.perf_counter() - started
+
+        bench.store.latency = args.latency_ms / 1000
+        bench.store.jitter = args.jitter_ms / 1000
+        bench.firebase_auth.latency = args.latency_ms / 1000
+        n = args.iterations
+        results: Dict[str, Any] = {}
+
+        async def login(_):
+            result = await bench.auth.login('bench-session', CLIENT['email'], 'x')
+            assert result['success'], result
+
+        async def login_token(_):
+            result = await bench.auth.login_with_token('bench-session', f"token:{CLIENT['id']}")
+            assert result['success'], result
+
+        results['login_cold'] = await measure(bench, n, login, before=bench.auth.profile_cache.clear)
+        results['login_warm'] = await measure(bench, n, login)
+        results['login_token_cold'] = await measure(bench, n, login_token, before=bench.auth.profile_cache.clear)
+
+        # What each dashboard loads before going live
+        async def nutritionist_dashboard(_):
+            await bench.stats.get_nutritionist_stats(NUTRITIONIST['id'])
+
+        async def client_dashboard(_):
+            await bench.appointments.get_next_appointment(CLIENT['id'])
+            await bench.measurements.get_latest_measurement(CLIENT['id'])
+
+        results['dashboard_nutritionist'] = await measure(bench, n, nutritionist_dashboard)
+        results['dashboard_client'] = await measure(bench, n, client_dashboard)
+
+        async def history_full(_):
+            await bench.measurements.get_measurements_by_client(CLIENT['id'])
+
+        async def history_page(_):
+            await bench.measurements.get_measurements_page(CLIENT['id'], page_size=20)
+
+        async def analytics(_):
+            await bench.measurements.get_progress_analytics(CLIENT['id'], goal_weight=75)
+
+        results['history_full'] = await measure(bench, n, history_full)
+        results['history_page'] = await measure(bench, n, history_page)
+        try:
+            results['progress_analytics'] = await measure(bench, n, analytics)
+        except ImportError as e:
+            results['progress_analytics'] = {'skipped': str(e)}
+
+        # Creation last: it grows the history measured above
+        async def create(_):
+            await bench.measurements.create_measurement(CLIENT['id'], 80.0, 170, waist=84, hip=98)
+
+        results['create_measurement'] = await measure(bench, n, create)
+
+        if args.photos:
+            try:
+                photos = bench.photos((n + 1) * args.photos)
+            except ImportError as e:
+                results['create_measurement_photos'] = {'skipped': str(e)}
+            else:
+                async def create_with_photos(index):
+                    start = (index + 1) * args.photos
+                    result = await bench.measurements.create_measurement(
+                        CLIENT['id'], 80.0, 170, photos=photos[start:start + args.photos]
+                    )
+                    assert result['success'], result
+
+                results['create_measurement_photos'] = await measure(bench, n, create_with_photos)
+            finally:
+                bench.measurements.pipeline.shutdown()
+
+    return {
+        'commit': _commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'seedSeconds': round(seed_seconds, 2),
+        'results': results,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print p50/p95 changes against a previous results file"""
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before or 'p50Ms' not in before or 'p50Ms' not in result:
+            continue
+        changes = []
+        for key in ('p50Ms', 'p95Ms'):
+            delta = (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            changes.append(f"{key[:3]} {before[key]:.1f} -> {result[key]:.1f} ms ({delta:+.0f}%)")
+        print(f"  {name:28} {', '.join(changes)}")
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Benchmark the services against a fake datastore with injected latency'
+    )
+    parser.add_argument('--latency-ms', type=float, default=20, help='Per-call datastore/auth latency')
+    parser.add_argument('--jitter-ms', type=float, default=5, help='Uniform extra latency per call')
+    parser.add_argument('--clients', type=int, default=50, help="Clients of the nutritionist")
+    parser.add_argument('--appointments', type=int, default=300, help='Appointments of the client')
+    parser.add_argument('--measurements', type=int, default=365, help='Measurement history of the client')
+    parser.add_argument('--iterations', type=int, default=20, help='Timed calls per scenario')
+    parser.add_argument('--photos', type=int, default=2, help='Photos per measurement (0 skips)')
+    parser.add_argument('--photo-size', type=int, default=2000, help='Synthetic photo width in pixels')
+    parser.add_argument('--photo-pool', choices=('process', 'thread'), default=os.getenv('PHOTO_POOL', 'process'))
+    parser.add_argument('--layout', choices=('flat', 'bucketed'), default=os.getenv('MEASUREMENT_LAYOUT', 'flat'))
+    parser.add_argument('--seed', type=int, default=42, help='Dataset random seed')
+    parser.add_argument('--output', help='Results file (default benchmarks/results/{timestamp}-{commit}.json)')
+    parser.add_argument('--compare', help='Previous results file to compare against')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = _parse_args(argv)
+    report = asyncio.run(run(args))
+
+    print(f"{'scenario':28} {'p50 ms':>9} {'p95 ms':>9} {'calls/op':>9} {'reads/op':>9}")
+    for name, result in report['results'].items():
+        if 'skipped' in result:
+            print(f"{name:28} skipped: {result['skipped']}")
+            continue
+        print(f"{name:28} {result['p50Ms']:9.1f} {result['p95Ms']:9.1f} "
+              f"{result['datastoreCallsPerOp']:9.1f} {result['documentsPerOp']['read']:9.1f}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit'] or 'nocommit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
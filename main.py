@@ -1,14 +1,29 @@
 """
 NutriAgenda - Main Application
 Flet-based nutrition management app
+
+Only the login screen is imported up front: the services (and Firebase,
+Firestore, Storage with them) load in a background thread while it
+renders, and the other screens are imported when first shown.
 """
+import threading
 import flet as ft
 from utils.theme import AppTheme, AppColors
 from ui.screens.login_screen import LoginScreen
-from ui.screens.register_screen import RegisterScreen
-from ui.screens.nutritionist_dashboard import NutritionistDashboard
-from ui.screens.client_dashboard import ClientDashboard
-from services.auth_service import auth_service
+
+
+def preload_services():
+    """Import the services and connect to Firebase off the main thread"""
+    def load():
+        try:
+            import ui.screens.nutritionist_dashboard
+            import ui.screens.client_dashboard
+            from services.firebase_config import firebase
+            firebase.warm_up()
+        except Exception as e:
+            print(f"⚠️  Error preloading services: {e}")
+    
+    threading.Thread(target=load, name='preload-services', daemon=True).start()
 
 
 class NutriAgendaApp:
@@ -17,6 +32,7 @@ class NutriAgendaApp:
     def __init__(self, page: ft.Page):
         self.page = page
         self.current_user = None
+        self.dashboard = None
         
         # Configure page
         self.page.title = "NutriAgenda"
@@ -26,12 +42,27 @@ class NutriAgendaApp:
         self.page.window_width = 400
         self.page.window_height = 800
         self.page.window_resizable = True
+        self.page.on_close = lambda _: self.handle_close()
         
         # Show login screen
         self.show_login()
     
+    def close_dashboard(self):
+        """Stop the live updates of the dashboard being shown, if any"""
+        if self.dashboard is not None:
+            self.dashboard.dispose()
+            self.dashboard = None
+    
+    def handle_close(self):
+        """The session ended (tab closed or expired): release its state"""
+        self.close_dashboard()
+        if self.current_user is not None:
+            from services.auth_service import auth_service
+            auth_service.logout(self.page.session_id)
+    
     def show_login(self):
         """Show login screen"""
+        self.close_dashboard()
         self.page.clean()
         login_screen = LoginScreen(
             self.page,
@@ -43,6 +74,7 @@ class NutriAgendaApp:
     
     def show_register(self):
         """Show register screen"""
+        from ui.screens.register_screen import RegisterScreen
         self.page.clean()
         register_screen = RegisterScreen(
             self.page,
@@ -69,29 +101,36 @@ class NutriAgendaApp:
     
     def show_nutritionist_dashboard(self):
         """Show nutritionist dashboard"""
+        from ui.screens.nutritionist_dashboard import NutritionistDashboard
+        self.close_dashboard()
         self.page.clean()
         dashboard = NutritionistDashboard(
             self.page,
             self.current_user,
             on_logout=self.handle_logout
         )
+        self.dashboard = dashboard
         self.page.add(dashboard.get_view())
         self.page.update()
     
     def show_client_dashboard(self):
         """Show client dashboard"""
+        from ui.screens.client_dashboard import ClientDashboard
+        self.close_dashboard()
         self.page.clean()
         dashboard = ClientDashboard(
             self.page,
             self.current_user,
             on_logout=self.handle_logout
         )
+        self.dashboard = dashboard
         self.page.add(dashboard.get_view())
         self.page.update()
     
     def handle_logout(self):
         """Handle user logout"""
-        auth_service.logout()
+        from services.auth_service import auth_service
+        auth_service.logout(self.page.session_id)
         self.current_user = None
         self.show_login()
 
@@ -110,6 +149,15 @@ if __name__ == "__main__":
     logger = logging.getLogger("flet")
     
     port = int(os.environ.get("PORT", 8551))
+    
+    # Load services and connect to Firestore while Flet starts
+    preload_services()
+    
+    # Prometheus metrics for a scraper next to the app (METRICS_PORT=0 disables)
+    from services.metrics import metrics
+    metrics_port = metrics.start_server()
+    if metrics_port:
+        logger.info(f"Serving metrics on port {metrics_port}")
     logger.info(f"Starting Flet app on port {port}")
     
     try:
@@ -1,14 +1,43 @@
-"""Init file for services package"""
-from .firebase_config import firebase
-from .auth_service import auth_service
-from .client_service import client_service
-from .appointment_service import appointment_service
-from .measurement_service import measurement_service
-
-__all__ = [
-    'firebase',
-    'auth_service',
-    'client_service',
-    'appointment_service',
-    'measurement_service',
-]
+"""
+Init file for services package
+
+The service instances are resolved on first access, so importing one
+service module does not pull in every other one (and Firebase with them).
+"""
+import importlib
+import sys
+from types import ModuleType
+
+# Exported instance -> module defining it
+_EXPORTS = {
+    'firebase': 'firebase_config',
+    'auth_service': 'auth_service',
+    'client_service': 'client_service',
+    'appointment_service': 'appointment_service',
+    'measurement_service': 'measurement_service',
+    'stats_service': 'stats_service',
+}
+
+__all__ = list(_EXPORTS)
+
+
+class _ServicesPackage(ModuleType):
+    """
+    Package module that resolves the exported instances lazily
+
+    A module-level __getattr__ (PEP 562) is not enough here: most instances
+    share their module's name, and importing `services.auth_service` binds
+    the submodule to that attribute, which would then shadow the instance.
+    """
+
+    def __getattribute__(self, name):
+        module = _EXPORTS.get(name)
+        if module is not None:
+            return getattr(importlib.import_module(f'{__name__}.{module}'), name)
+        return super().__getattribute__(name)
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(_EXPORTS))
+
+
+sys.modules[__name__].__class__ = _ServicesPackage
@@ -0,0 +1,245 @@
+"""
+Progress Analytics
+Vectorized analytics over a client's measurement history
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+FIELDS = ('weight', 'bmi', 'waist', 'hip', 'bodyFat', 'muscleMass')
+
+EPOCH = datetime(1970, 1, 1)
+
+# 1970-01-01 was a Thursday: shift so weeks start on Monday
+WEEK_OFFSET = 3
+
+# Goal dates further out than this are not projected (near-flat trends)
+PROJECTION_HORIZON_DAYS = 5 * 365
+
+
+def _days(value) -> float:
+    """Days since the epoch (naive UTC) for a date or datetime"""
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    elif value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH).total_seconds() / 86400.0
+
+
+def _to_date(days: float) -> date:
+    return (EPOCH + timedelta(days=float(days))).date()
+
+
+def _number(value) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+def _column(values: List[Any]) -> np.ndarray:
+    try:
+        # Fast path: numbers and None (which becomes NaN)
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.fromiter((_number(v) for v in values), dtype=np.float64, count=len(values))
+
+
+class MeasurementSeries:
+    """
+    Column view of a measurement history, oldest first
+
+    Each field is a float64 array aligned with `days` (days since the
+    epoch); missing values are NaN, so every computation masks them
+    instead of dropping rows.
+    """
+
+    def __init__(self, days: np.ndarray, columns: Dict[str, np.ndarray]):
+        order = np.argsort(days, kind='stable')
+        self.days = days[order]
+        self.columns = {field: values[order] for field, values in columns.items()}
+
+    @classmethod
+    def from_measurements(cls, measurements: List[Dict[str, Any]]) -> 'MeasurementSeries':
+        """Build the columns from measurement records (any order)"""
+        rows = [m for m in measurements if m.get('date') is not None]
+        return cls.from_columns({
+            field: [m.get(field) for m in rows] for field in ('date',) + FIELDS
+        })
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List[Any]]) -> 'MeasurementSeries':
+        """Build the series from parallel lists, e.g. bucketed storage columns"""
+        dates = columns['date']
+        keep = [index for index, value in enumerate(dates) if value is not None]
+        if len(keep) < len(dates):
+            columns = {field: [values[i] for i in keep] for field, values in columns.items()}
+            dates = columns['date']
+        days = np.array([_days(value) for value in dates], dtype=np.float64)
+        return cls(days, {
+            field: _column(columns.get(field) or [None] * len(dates)) for field in FIELDS
+        })
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def column(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def _valid(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        values = self.columns[field]
+        mask = ~np.isnan(values)
+        return self.days[mask], values[mask]
+
+    def waist_to_hip(self) -> np.ndarray:
+        """Waist-to-hip ratio per measurement (NaN where either is missing)"""
+        hip = self.columns['hip']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(hip > 0, self.columns['waist'] / hip, np.nan)
+
+    def rolling_mean(self, field: str, window_days: float = 7.0) -> np.ndarray:
+        """
+        Mean of each point and the points in the preceding window_days
+
+        The window is time-based, so irregular measurement intervals are
+        handled; computed with prefix sums in O(n log n).
+        """
+        values = self.columns[field]
+        valid = ~np.isnan(values)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(valid)))
+        start = np.searchsorted(self.days, self.days - window_days, side='left')
+        end = np.arange(1, len(values) + 1)
+        count = counts[end] - counts[start]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(count > 0, (sums[end] - sums[start]) / count, np.nan)
+
+    def resample(self, field: str, period: str = 'week') -> Tuple[List[date], np.ndarray]:
+        """
+        Average a field per calendar week (Monday start) or month
+
+        Returns:
+            (period start dates, mean per period), periods without data omitted
+        """
+        days, values = self._valid(field)
+        if period == 'month':
+            keys = np.floor(days).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        else:
+            keys = (np.floor(days).astype(np.int64) + WEEK_OFFSET) // 7
+        periods, inverse = np.unique(keys, return_inverse=True)
+        means = np.bincount(inverse, weights=values) / np.bincount(inverse)
+
+        if period == 'month':
+            starts = periods.astype('datetime64[M]').astype('datetime64[D]')
+        else:
+            starts = (periods * 7 - WEEK_OFFSET).astype('datetime64[D]')
+        return starts.tolist(), means
+
+    def rate_of_change(self, field: str, per_days: float = 7.0) -> np.ndarray:
+        """
+        Change between consecutive measured days, scaled to per_days (e.g. kg/week)
+
+        Measurements are averaged per calendar day first: readings hours
+        apart would otherwise scale normal daily fluctuation into a weekly rate.
+        """
+        days, values = self._valid(field)
+        measured, inverse = np.unique(np.floor(days), return_inverse=True)
+        daily = np.bincount(inverse, weights=values) / np.bincount(inverse)
+        return np.diff(daily) / np.diff(measured) * per_days
+
+    def trend(self, field: str, since_days: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """
+        Least-squares linear trend of a field
+
+        Args:
+            since_days: Only fit the last since_days of history
+
+        Returns:
+            slope (units per day), intercept (value at the first point
+            fitted) and r2, or None with fewer than two points
+        """
+        days, values = self._valid(field)
+        if since_days is not None and len(days):
+            keep = days >= days[-1] - since_days
+            days, values = days[keep], values[keep]
+        if len(days) < 2:
+            return None
+
+        x = days - days[0]
+        x_mean, y_mean = x.mean(), values.mean()
+        sxx = np.dot(x - x_mean, x - x_mean)
+        if sxx == 0:
+            return None
+        slope = np.dot(x - x_mean, values - y_mean) / sxx
+        intercept = y_mean - slope * x_mean
+        residuals = values - (intercept + slope * x)
+        total = np.dot(values - y_mean, values - y_mean)
+        r2 = 1.0 - np.dot(residuals, residuals) / total if total > 0 else 1.0
+        return {
+            'slope': float(slope),
+            'intercept': float(intercept),
+            'r2': float(r2),
+            'start': float(days[0]),
+        }
+
+    def projected_goal_date(
+        self,
+        field: str,
+        goal: float,
+        since_days: Optional[float] = 90.0
+    ) -> Optional[date]:
+        """
+        Date the linear trend reaches goal, or None if it is moving away
+
+        Recent history (since_days) is fitted so the projection follows
+        the current pace rather than the whole history. Goals more than
+        PROJECTION_HORIZON_DAYS past the latest measurement also give None.
+        """
+        fit = self.trend(field, since_days=since_days)
+        if fit is None or fit['slope'] == 0:
+            return None
+        days, values = self._valid(field)
+        latest = values[-1]
+        if (goal - latest) * fit['slope'] <= 0:
+            # Goal already reached, or trend heading the other way
+            return _to_date(days[-1]) if goal == latest else None
+        target = fit['start'] + (goal - fit['intercept']) / fit['slope']
+        if not target - days[-1] <= PROJECTION_HORIZON_DAYS:
+            return None
+        return _to_date(max(target, days[-1]))
+
+    def summary(
+        self,
+        goal_weight: Optional[float] = None,
+        window_days: float = 7.0
+    ) -> Dict[str, Any]:
+        """Plain-Python progress summary for the UI"""
+        if not len(self):
+            return {}
+
+        def latest(array: np.ndarray) -> Optional[float]:
+            valid = array[~np.isnan(array)]
+            return round(float(valid[-1]), 2) if len(valid) else None
+
+        weight_trend = self.trend('weight')
+        weekly_rate = self.rate_of_change('weight')
+        weeks, weekly_weight = self.resample('weight', 'week')
+        _, weights = self._valid('weight')
+
+        return {
+            'totalRecords': len(self),
+            'firstMeasurement': _to_date(self.days[0]),
+            'latestMeasurement': _to_date(self.days[-1]),
+            'weightChange': round(float(weights[-1] - weights[0]), 2) if len(weights) > 1 else 0,
+            'averageBMI': round(float(np.nanmean(self.columns['bmi'])), 2)
+            if not np.isnan(self.columns['bmi']).all() else 0,
+            'latest': {field: latest(self.columns[field]) for field in FIELDS},
+            'rollingWeight': latest(self.rolling_mean('weight', window_days)),
+            'waistToHip': latest(self.waist_to_hip()),
+            'weeklyWeightRate': latest(weekly_rate),
+            'weightTrendPerWeek': round(weight_trend['slope'] * 7, 3) if weight_trend else None,
+            'weeklyWeight': [
+                {'week': week, 'weight': value}
+                for week, value in zip(weeks, np.round(weekly_weight, 2).tolist())
+            ],
+            'goalWeight': goal_weight,
+            'projectedGoalDate': self.projected_goal_date('weight', goal_weight)
+            if goal_weight is not None else None,
+        }
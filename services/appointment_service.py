@@ -2,16 +2,21 @@
 Appointment Management Service
 Handles scheduling and management of appointments
 """
-from typing import List, Dict, Any, Optional
-from datetime import datetime, date
-from services.firebase_config import firebase
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional
+from datetime import datetime, date, time, timedelta
+from services.realtime import RealtimeHub, realtime_hub
+from services.metrics import instrumented
+from services.repository import Change, Repository, repository, to_datetime
+from services.stats_service import COUNTERS_COLLECTION, appointment_deltas
 
 
+@instrumented('appointment_service')
 class AppointmentService:
     """Service for managing appointments"""
     
-    def __init__(self):
-        self.db = firebase.db
+    def __init__(self, repo: Optional[Repository] = None, hub: Optional[RealtimeHub] = None):
+        self.repo = repo or repository
+        self.hub = hub or realtime_hub
         self.collection = 'appointments'
     
     async def create_appointment(
@@ -47,9 +52,17 @@ class AppointmentService:
                 'updatedAt': datetime.now()
             }
             
-            doc_ref = self.db.collection(self.collection).document()
-            appointment_data['id'] = doc_ref.id
-            doc_ref.set(appointment_data)
+            appointment_data['id'] = self.repo.new_id(self.collection)
+            
+            def write(tx):
+                tx.set(self.collection, appointment_data['id'], appointment_data)
+                tx.increment(
+                    COUNTERS_COLLECTION,
+                    nutritionist_id,
+                    appointment_deltas(appointment_date, None, 'scheduled')
+                )
+            
+            await self.repo.run_transaction(write)
             
             return {
                 'success': True,
@@ -64,55 +77,229 @@ class AppointmentService:
                 'message': f'Error al crear cita: {str(e)}'
             }
     
+    def _build_filters(
+        self,
+        owner_field: str,
+        owner_id: str,
+        status: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> List[tuple]:
+        """Filters for an owner, status and date range (a plain end date covers the whole day)"""
+        filters = [(owner_field, '==', owner_id)]
+        
+        if status:
+            filters.append(('status', '==', status))
+        if start_date:
+            filters.append(('date', '>=', start_date))
+        if end_date:
+            if isinstance(end_date, datetime):
+                filters.append(('date', '<=', end_date))
+            else:
+                filters.append(('date', '<', datetime.combine(end_date, time.min) + timedelta(days=1)))
+        return filters
+    
     async def get_appointments_by_nutritionist(
         self,
         nutritionist_id: str,
         start_date: Optional[date] = None,
-        end_date: Optional[date] = None
+        end_date: Optional[date] = None,
+        status: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Get appointments for a nutritionist, optionally filtered by date range"""
+        """
+        Get appointments for a nutritionist, ordered by date
+        
+        Status, date range, order and limit are all applied by the datastore
+        (see firestore.indexes.json for the indexes they need).
+        """
         try:
-            appointments = []
-            query = self.db.collection(self.collection)\
-                .where('nutritionistId', '==', nutritionist_id)
-            
-            if start_date:
-                query = query.where('date', '>=', start_date)
-            if end_date:
-                query = query.where('date', '<=', end_date)
-            
-            docs = query.stream()
-            
-            for doc in docs:
-                appointment_data = doc.to_dict()
-                appointment_data['id'] = doc.id
-                appointments.append(appointment_data)
-            
-            return sorted(appointments, key=lambda x: x['date'])
+            return await self.repo.query(
+                self.collection,
+                filters=self._build_filters(
+                    'nutritionistId', nutritionist_id, status, start_date, end_date
+                ),
+                order_by='date',
+                descending=descending,
+                limit=limit
+            )
             
         except Exception as e:
             print(f"Error getting appointments: {e}")
             return []
     
-    async def get_appointments_by_client(self, client_id: str) -> List[Dict[str, Any]]:
-        """Get all appointments for a specific client"""
+    async def get_appointments_by_client(
+        self,
+        client_id: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        status: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Get appointments for a specific client, ordered by date"""
         try:
-            appointments = []
-            docs = self.db.collection(self.collection)\
-                .where('clientId', '==', client_id)\
-                .stream()
-            
-            for doc in docs:
-                appointment_data = doc.to_dict()
-                appointment_data['id'] = doc.id
-                appointments.append(appointment_data)
-            
-            return sorted(appointments, key=lambda x: x['date'])
+            return await self.repo.query(
+                self.collection,
+                filters=self._build_filters('clientId', client_id, status, start_date, end_date),
+                order_by='date',
+                descending=descending,
+                limit=limit
+            )
             
         except Exception as e:
             print(f"Error getting appointments: {e}")
             return []
     
+    async def get_next_appointment(self, client_id: str) -> Optional[Dict[str, Any]]:
+        """Get the client's next scheduled appointment (a single document read)"""
+        appointments = await self.get_appointments_by_client(
+            client_id,
+            start_date=datetime.now(),
+            status='scheduled',
+            limit=1
+        )
+        return appointments[0] if appointments else None
+    
+    async def watch_appointments_by_nutritionist(
+        self,
+        nutritionist_id: str,
+        on_change: Callable[[List[Change], List[Dict[str, Any]]], Any],
+        start_date: Optional[date] = None
+    ) -> Callable[[], None]:
+        """
+        Keep a nutritionist's agenda live
+        
+        on_change(changes, appointments) is called with the current
+        appointments from start_date (default: today) on, ordered by date,
+        and then again with each incremental change. Sessions watching the
+        same agenda share one datastore listener.
+        
+        Returns:
+            Function that stops watching
+        """
+        start = to_datetime(start_date or date.today())
+        
+        def deliver(changes: List[Change], documents: List[Dict[str, Any]]):
+            return on_change(changes, sorted(documents, key=lambda a: a['date']))
+        
+        return await self.hub.subscribe_query(
+            self.repo,
+            self.collection,
+            self._build_filters('nutritionistId', nutritionist_id, start_date=start),
+            deliver
+        )
+    
+    async def watch_next_appointment(
+        self,
+        client_id: str,
+        on_change: Callable[[Optional[Dict[str, Any]]], Any]
+    ) -> Callable[[], None]:
+        """
+        Keep a client's next scheduled appointment live
+        
+        on_change(appointment) is called whenever the next appointment
+        changes (None when there is none).
+        
+        Returns:
+            Function that stops watching
+        """
+        # Watch from the start of the day so the filters are shared by every
+        # session today; appointments already past are skipped below
+        filters = self._build_filters(
+            'clientId', client_id, status='scheduled', start_date=to_datetime(date.today())
+        )
+        last: Dict[str, Any] = {}
+        
+        def deliver(changes: List[Change], documents: List[Dict[str, Any]]):
+            # Firestore returns aware UTC datetimes, local backends naive local ones
+            now = datetime.now().astimezone()
+            upcoming = [
+                a for a in documents
+                if (a['date'] if a['date'].tzinfo else a['date'].astimezone()) >= now
+            ]
+            appointment = min(upcoming, key=lambda a: a['date']) if upcoming else None
+            if last and last.get('value') == appointment:
+                return None
+            last['value'] = appointment
+            return on_change(appointment)
+        
+        return await self.hub.subscribe_query(self.repo, self.collection, filters, deliver)
+    
+    async def get_appointments_page_by_nutritionist(
+        self,
+        nutritionist_id: str,
+        page_size: int = 20,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a nutritionist's appointments, by date
+        
+        Returns:
+            items and nextCursor (pass it back for the next page, None at the end)
+        """
+        return await self._get_page(
+            [('nutritionistId', '==', nutritionist_id)], page_size, cursor
+        )
+    
+    async def get_appointments_page_by_client(
+        self,
+        client_id: str,
+        page_size: int = 20,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a client's appointments, by date
+        
+        Returns:
+            items and nextCursor (pass it back for the next page, None at the end)
+        """
+        return await self._get_page([('clientId', '==', client_id)], page_size, cursor)
+    
+    async def _get_page(self, filters, page_size: int, cursor: Optional[str]) -> Dict[str, Any]:
+        try:
+            items, next_cursor = await self.repo.query_page(
+                self.collection,
+                filters=filters,
+                order_by='date',
+                page_size=page_size,
+                cursor=cursor
+            )
+            return {'items': items, 'nextCursor': next_cursor}
+            
+        except Exception as e:
+            print(f"Error getting appointments: {e}")
+            return {'items': [], 'nextCursor': None}
+    
+    async def iter_appointments_by_nutritionist(
+        self,
+        nutritionist_id: str,
+        page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a nutritionist's appointments by date, one page in memory at a time"""
+        async for appointment in self.repo.stream(
+            self.collection,
+            filters=[('nutritionistId', '==', nutritionist_id)],
+            order_by='date',
+            page_size=page_size
+        ):
+            yield appointment
+    
+    async def iter_appointments_by_client(
+        self,
+        client_id: str,
+        page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a client's appointments by date, one page in memory at a time"""
+        async for appointment in self.repo.stream(
+            self.collection,
+            filters=[('clientId', '==', client_id)],
+            order_by='date',
+            page_size=page_size
+        ):
+            yield appointment
+    
     async def update_appointment_status(
         self,
         appointment_id: str,
@@ -120,10 +307,24 @@ class AppointmentService:
     ) -> Dict[str, Any]:
         """Update appointment status"""
         try:
-            self.db.collection(self.collection).document(appointment_id).update({
-                'status': status,
-                'updatedAt': datetime.now()
-            })
+            def write(tx):
+                appointment = tx.get(self.collection, appointment_id)
+                if appointment is None:
+                    raise ValueError('La cita no existe')
+                
+                tx.update(self.collection, appointment_id, {
+                    'status': status,
+                    'updatedAt': datetime.now()
+                })
+                deltas = appointment_deltas(
+                    appointment.get('date'),
+                    appointment.get('status'),
+                    status
+                )
+                if deltas and appointment.get('nutritionistId'):
+                    tx.increment(COUNTERS_COLLECTION, appointment['nutritionistId'], deltas)
+            
+            await self.repo.run_transaction(write)
             
             return {
                 'success': True,
@@ -2,18 +2,47 @@
 Authentication Service
 Handles user login, registration, and session management
 """
+import asyncio
+import os
 from typing import Optional, Dict, Any
 from datetime import datetime
+from services.cache import MISSING, TTLCache
 from services.firebase_config import firebase
+from services.io_executor import io_executor
+from services.metrics import instrumented
+from services.repository import Repository, repository
+from services.session_registry import SessionRegistry, session_registry
+from services.tracing import tracer
 
 
+@instrumented('auth_service')
 class AuthService:
-    """Service for user authentication"""
+    """
+    Service for user authentication
     
-    def __init__(self):
-        self.db = firebase.db
-        self.current_user = None
-        self.demo_mode = firebase.demo_mode
+    Auth state is kept per Flet session (page.session_id) in the session
+    registry, so concurrent sessions on one instance never see each
+    other's user.
+    """
+    
+    def __init__(
+        self,
+        repo: Optional[Repository] = None,
+        sessions: Optional[SessionRegistry] = None,
+        auth: Optional[Any] = None
+    ):
+        self.repo = repo or repository
+        self.sessions = sessions or session_registry
+        # Firebase Auth API (firebase_admin.auth or a stand-in with the same calls)
+        self.auth = auth or firebase.auth
+        
+        # User profiles by uid and by email; short TTL so role changes apply soon
+        self.profile_cache = TTLCache(
+            int(os.getenv('PROFILE_CACHE_SIZE', '1024')),
+            float(os.getenv('PROFILE_CACHE_TTL', '300')),
+            name='profiles'
+        )
+        self.demo_mode = firebase.demo_mode if auth is None else False
         
         # Demo users for testing
         self.demo_users = {
@@ -62,7 +91,8 @@ class AuthService:
         """
         try:
             # Create user in Firebase Auth
-            user = firebase.auth.create_user(
+            user = await io_executor.run(
+                self.auth.create_user,
                 email=email,
                 password=password,
                 display_name=name
@@ -79,7 +109,8 @@ class AuthService:
                 'updatedAt': datetime.now()
             }
             
-            self.db.collection('users').document(user.uid).set(user_data)
+            await self.repo.set('users', user.uid, user_data)
+            self.cache_profile(user_data)
             
             return {
                 'success': True,
@@ -94,10 +125,15 @@ class AuthService:
                 'message': f'Error al registrar usuario: {str(e)}'
             }
     
-    async def login(self, email: str, password: str) -> Dict[str, Any]:
+    async def login(self, session_id: str, email: str, password: str) -> Dict[str, Any]:
         """
         Login user (simplified version - requires Firebase REST API for full auth)
         
+        Args:
+            session_id: Flet session the user logs in on (page.session_id)
+            email: User email
+            password: User password
+        
         Note: Firebase Admin SDK doesn't support email/password login directly.
         For production, use Firebase REST API or Firebase Client SDK.
         """
@@ -108,7 +144,7 @@ class AuthService:
                     demo_user = self.demo_users[email]
                     if demo_user['password'] == password:
                         user_data = {k: v for k, v in demo_user.items() if k != 'password'}
-                        self.current_user = user_data
+                        self.sessions.get(session_id).user = user_data
                         return {
                             'success': True,
                             'user': user_data,
@@ -121,16 +157,10 @@ class AuthService:
                 }
             
             # FIREBASE MODE: Real authentication
-            # Get user by email
-            user = firebase.auth.get_user_by_email(email)
-            
-            # Get user data from Firestore
-            user_doc = self.db.collection('users').document(user.uid).get()
+            user_data = await self.get_profile_by_email(email)
             
-            if user_doc.exists:
-                user_data = user_doc.to_dict()
-                user_data['id'] = user.uid
-                self.current_user = user_data
+            if user_data:
+                self.sessions.get(session_id).user = user_data
                 
                 return {
                     'success': True,
@@ -150,25 +180,125 @@ class AuthService:
                 'message': f'Error al iniciar sesión: {str(e)}'
             }
     
-    def logout(self):
-        """Logout current user"""
-        self.current_user = None
+    async def login_with_token(self, session_id: str, id_token: str) -> Dict[str, Any]:
+        """
+        Login with a Firebase ID token obtained by the client SDK
+        
+        The token signature is checked locally against Google's public
+        certificates, which firebase_admin caches for as long as their
+        Cache-Control allows, so a login costs at most the profile read
+        (and nothing when the profile is cached).
+        
+        Args:
+            session_id: Flet session the user logs in on (page.session_id)
+            id_token: Firebase ID token (JWT)
+        """
+        try:
+            if self.demo_mode:
+                return {
+                    'success': False,
+                    'message': 'Login con token no disponible en DEMO MODE'
+                }
+            
+            # Blocking only while the certificates are (re)fetched
+            with tracer.span('auth.verify_id_token'):
+                claims = await io_executor.run(self.auth.verify_id_token, id_token)
+            user_data = await self.get_profile(claims['uid'])
+            
+            if user_data:
+                self.sessions.get(session_id).user = user_data
+                return {
+                    'success': True,
+                    'user': user_data,
+                    'message': 'Login exitoso'
+                }
+            return {
+                'success': False,
+                'message': 'Usuario no encontrado en la base de datos'
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f'Error al iniciar sesión: {str(e)}'
+            }
+    
+    async def get_profile(self, uid: str) -> Optional[Dict[str, Any]]:
+        """Get a user profile document, cached for PROFILE_CACHE_TTL seconds"""
+        profile = self.profile_cache.get(('uid', uid))
+        if profile is MISSING:
+            profile = await self.repo.get('users', uid)
+            if profile:
+                self.cache_profile(profile)
+        return profile
+    
+    async def get_profile_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the profile of the Firebase Auth account with this email
+        
+        The account lookup confirms the user still exists in Firebase Auth.
+        On a profile cache miss the profile is queried by email at the same
+        time, so both lookups cost a single round-trip.
+        """
+        email = email.strip().lower()
+        lookup = self._get_account(email)
+        
+        profile = self.profile_cache.get(('email', email))
+        if profile is not MISSING:
+            user = await lookup
+            if profile['id'] == user.uid:
+                return profile
+            # Account re-created under a new uid
+            return await self.get_profile(user.uid)
+        
+        user, profiles = await asyncio.gather(
+            lookup,
+            self.repo.query('users', filters=[('email', '==', email)], limit=1)
+        )
+        if profiles and profiles[0]['id'] == user.uid:
+            self.cache_profile(profiles[0])
+            return profiles[0]
+        # Profile stored with a differently-cased email (or missing)
+        return await self.get_profile(user.uid)
+    
+    async def _get_account(self, email: str):
+        with tracer.span('auth.get_user_by_email'):
+            return await io_executor.run(self.auth.get_user_by_email, email)
+    
+    def cache_profile(self, profile: Dict[str, Any]):
+        """Store a profile under its uid and email"""
+        self.profile_cache.set(('uid', profile['id']), profile)
+        if profile.get('email'):
+            self.profile_cache.set(('email', profile['email'].strip().lower()), profile)
+    
+    def invalidate_profile(self, profile: Dict[str, Any]):
+        """Drop a profile from the cache after it changes"""
+        self.profile_cache.invalidate(('uid', profile['id']))
+        if profile.get('email'):
+            self.profile_cache.invalidate(('email', profile['email'].strip().lower()))
+    
+    def logout(self, session_id: str):
+        """Logout the user of a session"""
+        self.sessions.remove(session_id)
     
-    def get_current_user(self) -> Optional[Dict[str, Any]]:
-        """Get current logged in user"""
-        return self.current_user
+    def get_current_user(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get the user logged in on a session"""
+        return self.sessions.user(session_id)
     
-    def is_authenticated(self) -> bool:
-        """Check if user is authenticated"""
-        return self.current_user is not None
+    def is_authenticated(self, session_id: str) -> bool:
+        """Check if a session has a logged in user"""
+        return self.get_current_user(session_id) is not None
     
-    def is_nutritionist(self) -> bool:
-        """Check if current user is a nutritionist"""
-        return self.current_user and self.current_user.get('role') == 'nutritionist'
+    def is_nutritionist(self, session_id: str) -> bool:
+        """Check if the session's user is a nutritionist"""
+        user = self.get_current_user(session_id)
+        return bool(user) and user.get('role') == 'nutritionist'
     
-    def is_client(self) -> bool:
-        """Check if current user is a client"""
-        return self.current_user and self.current_user.get('role') == 'client'
+    def is_client(self, session_id: str) -> bool:
+        """Check if the session's user is a client"""
+        user = self.get_current_user(session_id)
+        return bool(user) and user.get('role') == 'client'
 
 
 # Global auth service instance
@@ -0,0 +1,175 @@
+"""
+Blob Storage Backends
+File storage for measurement photos (Firebase Storage or local disk)
+"""
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+from services.cache import MISSING, TTLCache
+from services.firebase_config import firebase
+from services.io_executor import io_executor
+from services.metrics import metrics
+from services.tracing import tracer
+
+# Blobs are content-addressed, so a stored path never changes content;
+# private keeps shared caches from holding on to body photos
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+
+class BlobStore:
+    """Base interface for blob storage backends, addressed by path"""
+
+    async def exists(self, path: str) -> bool:
+        """Check whether a blob is already stored"""
+        raise NotImplementedError
+
+    async def upload(self, path: str, data: bytes, content_type: str):
+        """Store a blob, overwriting any previous content"""
+        raise NotImplementedError
+
+    async def upload_file(self, path: str, local_path: str, content_type: str):
+        """Store a blob streamed from a local file"""
+        raise NotImplementedError
+
+    def url(self, path: str) -> str:
+        """URL clients can load the blob from (computed locally, no I/O)"""
+        raise NotImplementedError
+
+
+class FirebaseBlobStore(BlobStore):
+    """
+    Blob store backed by a private Firebase Storage bucket
+
+    Blobs are never made public: clients get V4 signed URLs, signed
+    locally with the service account key. A URL is reused until less
+    than SIGNED_URL_REFRESH seconds of its validity remain, so rendering
+    a gallery mints each URL once per refresh window.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.url_ttl = int(os.getenv('SIGNED_URL_TTL', '43200'))
+        refresh = min(int(os.getenv('SIGNED_URL_REFRESH', '3600')), self.url_ttl // 2)
+        self.url_cache = TTLCache(
+            maxsize=int(os.getenv('SIGNED_URL_CACHE_SIZE', '4096')),
+            ttl=self.url_ttl - refresh,
+            name='signed_urls'
+        )
+        # Resumable uploads send (and retry) one chunk at a time; the
+        # chunk size must be a multiple of 256 KiB
+        chunk_size = int(os.getenv('UPLOAD_CHUNK_SIZE', str(1024 * 1024)))
+        self.chunk_size = max(1, chunk_size // (256 * 1024)) * 256 * 1024
+        self.upload_timeout = float(os.getenv('UPLOAD_TIMEOUT', '300'))
+
+    async def exists(self, path: str) -> bool:
+        with tracer.span('storage.exists', backend='firebase', path=path):
+            return await io_executor.run(self.bucket.blob(path).exists)
+
+    async def upload(self, path: str, data: bytes, content_type: str):
+        blob = self.bucket.blob(path)
+        blob.cache_control = IMMUTABLE_CACHE_CONTROL
+        with tracer.span('storage.upload', backend='firebase', path=path, bytes=len(data)):
+            await io_executor.run(blob.upload_from_string, data, content_type=content_type)
+        metrics.uploaded('firebase', len(data))
+
+    async def upload_file(self, path: str, local_path: str, content_type: str):
+        blob = self.bucket.blob(path, chunk_size=self.chunk_size)
+        blob.cache_control = IMMUTABLE_CACHE_CONTROL
+        size = os.path.getsize(local_path)
+        with tracer.span('storage.upload', backend='firebase', path=path, bytes=size):
+            await io_executor.run(
+                self._upload_resumable, blob, local_path, content_type,
+                timeout=self.upload_timeout
+            )
+        metrics.uploaded('firebase', size)
+
+    @staticmethod
+    def _upload_resumable(blob, local_path: str, content_type: str):
+        from google.cloud.storage.retry import DEFAULT_RETRY
+        with open(local_path, 'rb') as f:
+            # With chunk_size set this is a resumable session: a failed
+            # chunk is retried from the last byte the server acknowledged
+            blob.upload_from_file(
+                f,
+                content_type=content_type,
+                size=os.fstat(f.fileno()).st_size,
+                retry=DEFAULT_RETRY
+            )
+
+    def url(self, path: str) -> str:
+        key = (path, self.url_ttl)
+        url = self.url_cache.get(key)
+        if url is MISSING:
+            url = self.bucket.blob(path).generate_signed_url(
+                version='v4',
+                expiration=timedelta(seconds=self.url_ttl),
+                method='GET'
+            )
+            self.url_cache.set(key, url)
+        return url
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store on the local filesystem (DEMO MODE and development)"""
+
+    def __init__(self, root: str = 'media'):
+        self.root = Path(root).resolve()
+
+    def _file(self, path: str) -> Path:
+        file_path = (self.root / path).resolve()
+        if self.root not in file_path.parents:
+            raise ValueError(f"Invalid blob path: {path}")
+        return file_path
+
+    async def exists(self, path: str) -> bool:
+        return await io_executor.run(self._file(path).exists)
+
+    async def upload(self, path: str, data: bytes, content_type: str):
+        with tracer.span('storage.upload', backend='local', path=path, bytes=len(data)):
+            await io_executor.run(self._write, self._file(path), data)
+        metrics.uploaded('local', len(data))
+
+    async def upload_file(self, path: str, local_path: str, content_type: str):
+        size = os.path.getsize(local_path)
+        with tracer.span('storage.upload', backend='local', path=path, bytes=size):
+            await io_executor.run(self._copy, local_path, self._file(path))
+        metrics.uploaded('local', size)
+
+    @staticmethod
+    def _write(file_path: Path, data: bytes):
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial file
+        tmp_path = file_path.with_name(file_path.name + '.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, file_path)
+
+    @staticmethod
+    def _copy(local_path: str, file_path: Path):
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_name(file_path.name + '.tmp')
+        shutil.copyfile(local_path, tmp_path)
+        os.replace(tmp_path, file_path)
+
+    def url(self, path: str) -> str:
+        return self._file(path).as_uri()
+
+
+def create_blob_store() -> BlobStore:
+    """
+    Create the blob store selected by BLOB_BACKEND
+
+    firebase (default with Firebase configured) or local (default in
+    DEMO MODE, rooted at LOCAL_BLOB_PATH).
+    """
+    backend = os.getenv('BLOB_BACKEND', '').lower()
+    if not backend:
+        backend = 'local' if firebase.demo_mode else 'firebase'
+
+    if backend == 'firebase':
+        return FirebaseBlobStore(firebase.storage)
+    return LocalBlobStore(os.getenv('LOCAL_BLOB_PATH', 'media'))
+
+
+# Global blob store instance
+blob_store = create_blob_store()
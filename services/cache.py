@@ -0,0 +1,113 @@
+"""
+TTL Cache
+Bounded LRU cache with per-entry expiry and hit/miss counters
+"""
+import copy
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Optional, Tuple
+from services.metrics import Family, metrics
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after ttl seconds
+
+    Values are deep-copied on the way in and out so callers can mutate
+    what they get back without corrupting the cache. The cache is
+    per-process: other instances only see a write once their copy
+    expires, so keep the TTL short for data edited concurrently.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, name: str = 'cache'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches.add(self)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Get a cached value, or default (MISSING) on a miss or expiry"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value without touching LRU order or counters"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return copy.deepcopy(entry[1])
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop a single entry"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Every live cache, reported by the metrics endpoint
+_caches: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+
+
+def _cache_metrics() -> Iterator[Family]:
+    stats = [cache.stats() for cache in list(_caches)]
+    for key, name, metric_type, help in (
+        ('hits', 'nutri_cache_hits_total', 'counter', 'Cache lookups served from the cache'),
+        ('misses', 'nutri_cache_misses_total', 'counter', 'Cache lookups that missed or expired'),
+        ('evictions', 'nutri_cache_evictions_total', 'counter', 'Entries evicted to stay under maxsize'),
+        ('size', 'nutri_cache_size', 'gauge', 'Entries currently cached'),
+        ('hitRate', 'nutri_cache_hit_ratio', 'gauge', 'Lifetime hit rate'),
+    ):
+        yield name, metric_type, help, [({'cache': s['name']}, s[key]) for s in stats]
+
+
+metrics.register_collector(_cache_metrics)
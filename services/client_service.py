@@ -2,17 +2,28 @@
 Client Management Service
 Handles CRUD operations for clients
 """
-from typing import List, Dict, Any, Optional
+import os
+from typing import AsyncIterator, List, Dict, Any, Optional
 from datetime import datetime
-from services.firebase_config import firebase
+from services.cache import MISSING, TTLCache
+from services.metrics import instrumented
+from services.repository import Repository, repository
+from services.stats_service import COUNTERS_COLLECTION, client_deltas
 
 
+@instrumented('client_service')
 class ClientService:
     """Service for managing nutrition clients"""
     
-    def __init__(self):
-        self.db = firebase.db
+    def __init__(self, repo: Optional[Repository] = None):
+        self.repo = repo or repository
         self.collection = 'clients'
+        
+        # Read-through caches, invalidated by every write in this service
+        cache_size = int(os.getenv('CLIENT_CACHE_SIZE', '1024'))
+        cache_ttl = float(os.getenv('CLIENT_CACHE_TTL', '60'))
+        self.client_cache = TTLCache(cache_size, cache_ttl, name='clients')
+        self.list_cache = TTLCache(cache_size, cache_ttl, name='client_lists')
     
     async def create_client(
         self,
@@ -40,10 +51,15 @@ class ClientService:
                 'updatedAt': datetime.now()
             }
             
-            # Add to Firestore
-            doc_ref = self.db.collection(self.collection).document()
-            client_data['id'] = doc_ref.id
-            doc_ref.set(client_data)
+            # Add the client and bump the nutritionist's counters atomically
+            client_data['id'] = self.repo.new_id(self.collection)
+            
+            def write(tx):
+                tx.set(self.collection, client_data['id'], client_data)
+                tx.increment(COUNTERS_COLLECTION, nutritionist_id, client_deltas(1))
+            
+            await self.repo.run_transaction(write)
+            self.list_cache.invalidate(nutritionist_id)
             
             return {
                 'success': True,
@@ -61,15 +77,13 @@ class ClientService:
     async def get_clients_by_nutritionist(self, nutritionist_id: str) -> List[Dict[str, Any]]:
         """Get all clients for a specific nutritionist"""
         try:
-            clients = []
-            docs = self.db.collection(self.collection)\
-                .where('nutritionistId', '==', nutritionist_id)\
-                .stream()
-            
-            for doc in docs:
-                client_data = doc.to_dict()
-                client_data['id'] = doc.id
-                clients.append(client_data)
+            clients = self.list_cache.get(nutritionist_id)
+            if clients is MISSING:
+                clients = await self.repo.query(
+                    self.collection,
+                    filters=[('nutritionistId', '==', nutritionist_id)]
+                )
+                self.list_cache.set(nutritionist_id, clients)
             
             return clients
             
@@ -77,17 +91,54 @@ class ClientService:
             print(f"Error getting clients: {e}")
             return []
     
+    async def get_clients_page(
+        self,
+        nutritionist_id: str,
+        page_size: int = 20,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a nutritionist's clients
+        
+        Returns:
+            items and nextCursor (pass it back for the next page, None at the end)
+        """
+        try:
+            items, next_cursor = await self.repo.query_page(
+                self.collection,
+                filters=[('nutritionistId', '==', nutritionist_id)],
+                page_size=page_size,
+                cursor=cursor
+            )
+            return {'items': items, 'nextCursor': next_cursor}
+            
+        except Exception as e:
+            print(f"Error getting clients: {e}")
+            return {'items': [], 'nextCursor': None}
+    
+    async def iter_clients(
+        self,
+        nutritionist_id: str,
+        page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a nutritionist's clients, one page in memory at a time"""
+        async for client in self.repo.stream(
+            self.collection,
+            filters=[('nutritionistId', '==', nutritionist_id)],
+            page_size=page_size
+        ):
+            yield client
+    
     async def get_client_by_id(self, client_id: str) -> Optional[Dict[str, Any]]:
         """Get a specific client by ID"""
         try:
-            doc = self.db.collection(self.collection).document(client_id).get()
+            client = self.client_cache.get(client_id)
+            if client is MISSING:
+                client = await self.repo.get(self.collection, client_id)
+                if client is not None:
+                    self.client_cache.set(client_id, client)
             
-            if doc.exists:
-                client_data = doc.to_dict()
-                client_data['id'] = doc.id
-                return client_data
-            
-            return None
+            return client
             
         except Exception as e:
             print(f"Error getting client: {e}")
@@ -102,7 +153,8 @@ class ClientService:
         try:
             updates['updatedAt'] = datetime.now()
             
-            self.db.collection(self.collection).document(client_id).update(updates)
+            await self.repo.update(self.collection, client_id, updates)
+            self.invalidate_client(client_id, updates.get('nutritionistId'))
             
             return {
                 'success': True,
@@ -119,7 +171,17 @@ class ClientService:
     async def delete_client(self, client_id: str) -> Dict[str, Any]:
         """Delete a client"""
         try:
-            self.db.collection(self.collection).document(client_id).delete()
+            def remove(tx):
+                client = tx.get(self.collection, client_id)
+                if client is None:
+                    return None
+                tx.delete(self.collection, client_id)
+                if client.get('nutritionistId'):
+                    tx.increment(COUNTERS_COLLECTION, client['nutritionistId'], client_deltas(-1))
+                return client
+            
+            client = await self.repo.run_transaction(remove)
+            self.invalidate_client(client_id, client.get('nutritionistId') if client else None)
             
             return {
                 'success': True,
@@ -133,6 +195,24 @@ class ClientService:
                 'message': f'Error al eliminar cliente: {str(e)}'
             }
     
+    def invalidate_client(self, client_id: str, nutritionist_id: Optional[str] = None):
+        """Drop a client and the client lists it may appear in from the caches"""
+        cached = self.client_cache.peek(client_id)
+        self.client_cache.invalidate(client_id)
+        
+        nutritionist_ids = {nutritionist_id, cached.get('nutritionistId') if cached else None}
+        nutritionist_ids.discard(None)
+        if nutritionist_ids:
+            for key in nutritionist_ids:
+                self.list_cache.invalidate(key)
+        else:
+            # Owner unknown: any cached list may hold this client
+            self.list_cache.clear()
+    
+    def cache_stats(self) -> List[Dict[str, Any]]:
+        """Hit/miss counters of the client caches"""
+        return [self.client_cache.stats(), self.list_cache.stats()]
+    
     def calculate_age(self, birth_date: datetime) -> int:
         """Calculate age from birth date"""
         today = datetime.now()
@@ -1,7 +1,10 @@
 """
 Firebase Configuration and Initialization
 """
+import atexit
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,13 +15,33 @@ DEMO_MODE = os.getenv('DEMO_MODE', 'true').lower() == 'true'
 
 if not DEMO_MODE:
     try:
+        # Auth, Firestore and Storage are imported on first use
         import firebase_admin
-        from firebase_admin import credentials, auth, firestore, storage
     except ImportError:
         print("Warning: firebase_admin not installed")
         DEMO_MODE = True
 
 
+def channel_options() -> dict:
+    """
+    gRPC options of the Firestore channel
+
+    Keepalive pings keep the connection (and the snapshot listeners on
+    it) alive through idle periods instead of paying a reconnect on the
+    next call. Concurrent streams per connection are set by the server
+    (100 for Firestore); FIRESTORE_MAX_STREAMS is what the app plans for.
+    """
+    return {
+        'grpc.keepalive_time_ms': int(os.getenv('FIRESTORE_KEEPALIVE_MS', '30000')),
+        'grpc.keepalive_timeout_ms': int(os.getenv('FIRESTORE_KEEPALIVE_TIMEOUT_MS', '10000')),
+        'grpc.keepalive_permit_without_calls': 1,
+        'grpc.http2.max_pings_without_data': 0,
+        # Same as the SDK's own channel: no message size limits
+        'grpc.max_send_message_length': -1,
+        'grpc.max_receive_message_length': -1,
+    }
+
+
 class FirebaseConfig:
     """Firebase configuration singleton"""
     
@@ -33,8 +56,14 @@ class FirebaseConfig:
     
     def __init__(self):
         if not self._initialized:
+            self._lock = threading.Lock()
+            self._db = None
+            self._bucket = None
+            self._channel = None
+            self._credential = None
             if not self.demo_mode:
                 self._initialize_firebase()
+                atexit.register(self.close)
             else:
                 print("⚠️  Running in DEMO MODE - Firebase not configured")
                 print("   To use Firebase, create .env file with credentials")
@@ -47,6 +76,8 @@ class FirebaseConfig:
             firebase_admin.get_app()
         except ValueError:
             try:
+                from firebase_admin import credentials
+                
                 # Priority 1: Environment variable with JSON content (Cloud Run)
                 firebase_cred_json = os.getenv('FIREBASE_CREDENTIALS')
                 
@@ -98,21 +129,110 @@ class FirebaseConfig:
         """Get Firebase Auth instance"""
         if self.demo_mode:
             return None
+        from firebase_admin import auth
         return auth
     
     @property
     def db(self):
-        """Get Firestore instance"""
+        """Get the process-wide Firestore client (created on first use)"""
         if self.demo_mode:
             return None
-        return firestore.client()
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._db = self._create_firestore_client()
+        return self._db
     
     @property
     def storage(self):
-        """Get Storage instance"""
+        """Get the process-wide Storage bucket handle"""
         if self.demo_mode:
             return None
-        return storage.bucket()
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    from firebase_admin import storage
+                    self._bucket = storage.bucket()
+        return self._bucket
+    
+    def _create_firestore_client(self):
+        """Firestore client on one explicitly configured gRPC channel"""
+        if os.getenv('FIRESTORE_EMULATOR_HOST'):
+            # The emulator needs the SDK's insecure channel
+            from firebase_admin import firestore
+            return firestore.client()
+        
+        from google.cloud.firestore_v1 import Client
+        from google.cloud.firestore_v1.services.firestore import client as firestore_client
+        from google.cloud.firestore_v1.services.firestore.transports import grpc as firestore_grpc
+        
+        app = firebase_admin.get_app()
+        self._credential = app.credential.get_credential()
+        client = Client(project=app.project_id, credentials=self._credential)
+        
+        max_streams = int(os.getenv('FIRESTORE_MAX_STREAMS', '100'))
+        pool_size = int(os.getenv('IO_POOL_SIZE', '16'))
+        if pool_size > max_streams:
+            print(f"⚠️  IO_POOL_SIZE={pool_size} exceeds FIRESTORE_MAX_STREAMS={max_streams}: "
+                  "calls beyond it queue on the channel")
+        
+        # The client has no public option for its channel: it builds its API
+        # stub lazily into _firestore_api_internal (google-cloud-firestore
+        # 2.x, pinned in requirements.txt). Giving it one up front makes every
+        # call share this channel; other versions keep the default channel.
+        if getattr(client, '_firestore_api_internal', False) is not None:
+            print("⚠️  Unsupported google-cloud-firestore version: using its default channel")
+            return client
+        
+        target = firestore_client.FirestoreClient.DEFAULT_ENDPOINT
+        self._channel = firestore_grpc.FirestoreGrpcTransport.create_channel(
+            target,
+            credentials=self._credential,
+            options=list(channel_options().items())
+        )
+        transport = firestore_grpc.FirestoreGrpcTransport(host=target, channel=self._channel)
+        client._transport = transport
+        client._firestore_api_internal = firestore_client.FirestoreClient(transport=transport)
+        return client
+    
+    def warm_up(self):
+        """
+        Connect to Firestore in the background
+        
+        Fetches the OAuth access token and completes the TCP/TLS/HTTP2
+        handshake while the app starts, so the first request after a cold
+        start does not pay for them. No document is read.
+        """
+        if self.demo_mode:
+            return
+        threading.Thread(target=self._warm_up, name='firestore-warmup', daemon=True).start()
+    
+    def _warm_up(self):
+        started = time.perf_counter()
+        try:
+            self.db
+            self.storage
+            if self._channel is not None:
+                import grpc
+                from google.auth.transport.requests import Request
+                self._credential.refresh(Request())
+                grpc.channel_ready_future(self._channel).result(
+                    timeout=float(os.getenv('FIRESTORE_WARMUP_TIMEOUT', '10'))
+                )
+            print(f"✅ Firestore channel ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            print(f"⚠️  Firestore warm-up failed: {e}")
+    
+    def close(self):
+        """Close the Firestore channel (registered to run at exit)"""
+        with self._lock:
+            channel, self._channel = self._channel, None
+            self._db = None
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception as e:
+                print(f"Error closing Firestore channel: {e}")
 
 
 # Global instance
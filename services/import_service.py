@@ -0,0 +1,418 @@
+"""
+Bulk Import Service
+Streams clients and measurements from CSV/JSON files into batched writes
+"""
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from services.repository import Repository, Write, repository
+from services.measurement_service import MeasurementService
+from services.metrics import instrumented
+from services.stats_service import StatsService
+
+# Firestore caps a write batch at 500 operations
+MAX_BATCH_SIZE = 500
+
+PERSONAL_FIELDS = ('name', 'email', 'phone', 'birthDate', 'gender')
+MEASUREMENT_FIELDS = ('waist', 'hip', 'bodyFat', 'muscleMass')
+
+
+class RowError(ValueError):
+    """A row that failed validation"""
+
+
+def iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream rows from a .csv, .jsonl/.ndjson or .json file
+
+    CSV and JSON Lines are read one row at a time; a .json file must hold
+    an array and is loaded whole, so prefer JSON Lines for large imports.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension in ('.jsonl', '.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif extension == '.json':
+            yield from json.load(f)
+        else:
+            raise ValueError(f"Formato no soportado: {extension}")
+
+
+def parse_date(value: Any) -> datetime:
+    """Parse ISO 8601 or DD/MM/YYYY dates"""
+    if isinstance(value, datetime):
+        return value
+    text = str(value or '').strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text, '%d/%m/%Y')
+    except ValueError:
+        raise RowError(f"Fecha inválida: {value!r}")
+
+
+def parse_number(value: Any, field: str, required: bool = False) -> Optional[float]:
+    """Parse a number, accepting decimal commas; blank means None"""
+    if value is None or str(value).strip() == '':
+        if required:
+            raise RowError(f"Falta el campo {field}")
+        return None
+    try:
+        return float(str(value).strip().replace(',', '.'))
+    except ValueError:
+        raise RowError(f"Valor numérico inválido en {field}: {value!r}")
+
+
+class _Checkpoint:
+    """Highest contiguous committed row, persisted so an import can resume"""
+
+    def __init__(self, path: Optional[str], source: str, kind: str):
+        self.path = path
+        self.source = source
+        self.kind = kind
+        self.rows_committed = 0
+        # Batches that finished out of order: first row -> row after last
+        self._done: Dict[int, int] = {}
+
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('source') == source and state.get('kind') == kind:
+                self.rows_committed = int(state.get('rowsCommitted', 0))
+
+    def mark_done(self, first_row: int, end_row: int):
+        self._done[first_row] = end_row
+        advanced = False
+        while self.rows_committed in self._done:
+            self.rows_committed = self._done.pop(self.rows_committed)
+            advanced = True
+        if advanced:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': self.source,
+                'kind': self.kind,
+                'rowsCommitted': self.rows_committed,
+                'updatedAt': datetime.now().isoformat(),
+            }, f)
+        os.replace(tmp_path, self.path)
+
+
+@instrumented('import_service')
+class ImportService:
+    """Service for bulk-importing clients and measurements"""
+
+    def __init__(
+        self,
+        repo: Optional[Repository] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.repo = repo or repository
+        self.batch_size = min(batch_size or int(os.getenv('IMPORT_BATCH_SIZE', '500')), MAX_BATCH_SIZE)
+        self.concurrency = concurrency or int(os.getenv('IMPORT_CONCURRENCY', '4'))
+        self.measurements = MeasurementService(self.repo)
+        self.stats = StatsService(self.repo)
+
+    def _document_id(self, source: str, kind: str, row_number: int, row: Dict[str, Any]) -> str:
+        """Explicit 'id' column, or an ID derived from the row position so re-runs overwrite"""
+        if row.get('id'):
+            return str(row['id'])
+        digest = hashlib.sha1(f"{kind}:{source}:{row_number}".encode('utf-8')).hexdigest()
+        return digest[:20]
+
+    def client_write(
+        self,
+        row: Dict[str, Any],
+        doc_id: str,
+        nutritionist_id: Optional[str] = None
+    ) -> Write:
+        """Validate a client row and turn it into a write"""
+        owner = row.get('nutritionistId') or nutritionist_id
+        if not owner:
+            raise RowError("Falta nutritionistId")
+
+        personal_info = row.get('personalInfo')
+        if not isinstance(personal_info, dict):
+            personal_info = {
+                field: row[field] for field in PERSONAL_FIELDS if row.get(field) not in (None, '')
+            }
+        if not personal_info.get('name'):
+            raise RowError("Falta el nombre del cliente")
+
+        medical_history = row.get('medicalHistory')
+        if not isinstance(medical_history, dict):
+            # Flat files carry medical history as medical_<field> columns
+            medical_history = {
+                key[len('medical_'):]: value
+                for key, value in row.items()
+                if key.startswith('medical_') and value not in (None, '')
+            }
+
+        now = datetime.now()
+        return ('set', 'clients', doc_id, {
+            'id': doc_id,
+            'nutritionistId': owner,
+            'personalInfo': personal_info,
+            'medicalHistory': medical_history,
+            'createdAt': now,
+            'updatedAt': now,
+        })
+
+    def measurement_write(self, row: Dict[str, Any], doc_id: str) -> Write:
+        """Validate a measurement row and turn it into a write"""
+        client_id = row.get('clientId')
+        if not client_id:
+            raise RowError("Falta clientId")
+
+        weight = parse_number(row.get('weight'), 'weight', required=True)
+        height = parse_number(row.get('height'), 'height', required=True)
+        if weight <= 0 or height <= 0:
+            raise RowError("El peso y la altura deben ser positivos")
+
+        data = {
+            'id': doc_id,
+            'clientId': client_id,
+            'date': parse_date(row.get('date')),
+            'weight': weight,
+            'height': height,
+            'bmi': self.measurements.calculate_bmi(weight, height),
+            'notes': row.get('notes') or '',
+            'photos': [],
+            'photoVariants': [],
+            'createdAt': datetime.now(),
+        }
+        for field in MEASUREMENT_FIELDS:
+            data[field] = parse_number(row.get(field), field)
+        return ('set', 'measurements', doc_id, data)
+
+    async def import_clients(
+        self,
+        path: str,
+        nutritionist_id: Optional[str] = None,
+        checkpoint_path: Optional[str] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Import clients from a file
+
+        Args:
+            path: CSV/JSON Lines/JSON file
+            nutritionist_id: Owner for rows without a nutritionistId column
+            checkpoint_path: File recording progress; an interrupted import
+                resumes from it
+            on_progress: Called with the running report after each batch
+
+        Returns:
+            Import report
+        """
+        owners = set()
+
+        def build(row: Dict[str, Any], doc_id: str) -> Write:
+            write = self.client_write(row, doc_id, nutritionist_id)
+            owners.add(write[3]['nutritionistId'])
+            return write
+
+        report = await self._run('clients', path, build, checkpoint_path, on_progress)
+
+        # Re-runs overwrite rows, so counters are rebuilt rather than incremented
+        for owner in owners:
+            await self.stats.rebuild_counters(owner)
+        return report
+
+    async def import_measurements(
+        self,
+        path: str,
+        checkpoint_path: Optional[str] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Import measurements from a file
+
+        Args:
+            path: CSV/JSON Lines/JSON file
+            checkpoint_path: File recording progress; an interrupted import
+                resumes from it
+            on_progress: Called with the running report after each batch
+
+        Returns:
+            Import report
+        """
+        clients = set()
+
+        def build(row: Dict[str, Any], doc_id: str) -> Write:
+            write = self.measurement_write(row, doc_id)
+            clients.add(write[3]['clientId'])
+            return write
+
+        report = await self._run('measurements', path, build, checkpoint_path, on_progress)
+
+        # Refresh the denormalized latestMeasurement of every touched client
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(client_id: str):
+            async with semaphore:
+                if self.measurements.bucketed:
+                    # Rows are written flat in batches, then folded into buckets
+                    await self.measurements.buckets.migrate_client(client_id, prune=True)
+                await self.measurements.refresh_latest_summary(client_id)
+
+        await asyncio.gather(*(refresh(client_id) for client_id in clients))
+        return report
+
+    async def _run(
+        self,
+        kind: str,
+        path: str,
+        build: Callable[[Dict[str, Any], str], Write],
+        checkpoint_path: Optional[str],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> Dict[str, Any]:
+        """
+        Read, validate and write rows in batches with bounded parallelism
+
+        build() is called for every row, including rows skipped because a
+        previous run committed them; only the writes of new rows are sent.
+        """
+        source = os.path.abspath(path)
+        checkpoint = _Checkpoint(checkpoint_path, source, kind)
+        started = time.monotonic()
+        report: Dict[str, Any] = {
+            'kind': kind,
+            'source': source,
+            'rowsRead': 0,
+            'imported': 0,
+            'skipped': checkpoint.rows_committed,
+            'invalid': 0,
+            'errors': [],
+        }
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        failure: List[BaseException] = []
+
+        async def commit(first_row: int, end_row: int, writes: List[Write]):
+            try:
+                if writes:
+                    await self.repo.write_batch(writes)
+                report['imported'] += len(writes)
+                checkpoint.mark_done(first_row, end_row)
+                self._progress(report, started, on_progress)
+            except Exception as e:
+                failure.append(e)
+            finally:
+                semaphore.release()
+
+        async def submit(first_row: int, end_row: int, writes: List[Write]) -> bool:
+            # Blocks while `concurrency` batches are in flight
+            await semaphore.acquire()
+            if failure:
+                semaphore.release()
+                return False
+            task = asyncio.create_task(commit(first_row, end_row, writes))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            await asyncio.sleep(0)
+            return True
+
+        batch: List[Write] = []
+        first_row = end_row = checkpoint.rows_committed
+        for row_number, row in enumerate(iter_rows(path)):
+            if row_number < checkpoint.rows_committed:
+                # Committed before a resume: build() still sees the row (its
+                # write is dropped) so callers collect the IDs it touched
+                try:
+                    build(row, self._document_id(source, kind, row_number, row))
+                except (RowError, ValueError, TypeError):
+                    pass
+                continue
+            report['rowsRead'] += 1
+            end_row = row_number + 1
+            try:
+                batch.append(build(row, self._document_id(source, kind, row_number, row)))
+            except (RowError, ValueError, TypeError) as e:
+                report['invalid'] += 1
+                if len(report['errors']) < 100:
+                    report['errors'].append({'row': row_number + 1, 'error': str(e)})
+
+            if len(batch) >= self.batch_size:
+                if not await submit(first_row, end_row, batch):
+                    break
+                batch, first_row = [], end_row
+        else:
+            # Final partial batch (also checkpoints trailing invalid rows)
+            if first_row < end_row:
+                await submit(first_row, end_row, batch)
+
+        if pending:
+            await asyncio.gather(*pending)
+        if failure:
+            raise failure[0]
+
+        self._progress(report, started, None)
+        return report
+
+    def _progress(
+        self,
+        report: Dict[str, Any],
+        started: float,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ):
+        elapsed = time.monotonic() - started
+        report['elapsedSeconds'] = round(elapsed, 2)
+        report['rowsPerSecond'] = round(report['imported'] / elapsed, 1) if elapsed else 0.0
+        if on_progress:
+            on_progress(dict(report))
+
+
+# Global import service instance
+import_service = ImportService()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Importación masiva de clientes y mediciones")
+    parser.add_argument('kind', choices=['clients', 'measurements'])
+    parser.add_argument('path', help="Archivo .csv, .jsonl o .json")
+    parser.add_argument('--nutritionist-id', help="Nutricionista para filas sin nutritionistId")
+    parser.add_argument('--checkpoint', help="Archivo de checkpoint (por defecto <path>.checkpoint)")
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--concurrency', type=int)
+    args = parser.parse_args()
+
+    service = ImportService(batch_size=args.batch_size, concurrency=args.concurrency)
+    checkpoint_file = args.checkpoint or f"{args.path}.checkpoint"
+
+    def print_progress(report: Dict[str, Any]):
+        print(
+            f"  {report['imported']} importadas, {report['invalid']} inválidas "
+            f"({report['rowsPerSecond']} filas/s)",
+            flush=True
+        )
+
+    if args.kind == 'clients':
+        result = asyncio.run(service.import_clients(
+            args.path, args.nutritionist_id, checkpoint_file, print_progress
+        ))
+    else:
+        result = asyncio.run(service.import_measurements(
+            args.path, checkpoint_file, print_progress
+        ))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,76 @@
+"""
+Index Manifest
+Single source of truth for the indexes behind the services' queries:
+generates firestore.indexes.json and the local backends' secondary indexes
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Composite indexes: collection -> equality fields followed by the
+# range/order field. Each is generated in both date directions because
+# services order ascending (agendas) and descending (histories).
+COMPOSITE_INDEXES: List[Tuple[str, List[str], str]] = [
+    ('appointments', ['nutritionistId'], 'date'),
+    ('appointments', ['nutritionistId', 'status'], 'date'),
+    ('appointments', ['clientId'], 'date'),
+    ('appointments', ['clientId', 'status'], 'date'),
+    ('measurements', ['clientId'], 'date'),
+    ('measurementBuckets', ['clientId'], 'start'),
+]
+
+# Equality-only lookups, served in Firestore by automatic single-field indexes
+SINGLE_FIELD_INDEXES: Dict[str, List[str]] = {
+    'users': ['email', 'role'],
+    'clients': ['nutritionistId'],
+}
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'firestore.indexes.json')
+
+
+def firestore_manifest() -> Dict[str, Any]:
+    """Build the firestore.indexes.json document (Firebase CLI format)"""
+    indexes = []
+    for collection, eq_fields, order_field in COMPOSITE_INDEXES:
+        for order in ('ASCENDING', 'DESCENDING'):
+            indexes.append({
+                'collectionGroup': collection,
+                'queryScope': 'COLLECTION',
+                'fields': [
+                    {'fieldPath': field, 'order': 'ASCENDING'} for field in eq_fields
+                ] + [{'fieldPath': order_field, 'order': order}],
+            })
+    return {'indexes': indexes, 'fieldOverrides': []}
+
+
+def local_indexes() -> Dict[str, List[Tuple[str, Optional[str]]]]:
+    """
+    Secondary indexes for the memory and SQLite backends
+
+    Local indexes are (equality field, sort field) pairs: a composite
+    index contributes its leading equality field and its order field;
+    further equality fields are filtered while scanning.
+    """
+    specs: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+    for collection, fields in SINGLE_FIELD_INDEXES.items():
+        for field in fields:
+            specs.setdefault(collection, []).append((field, None))
+    for collection, eq_fields, order_field in COMPOSITE_INDEXES:
+        spec = (eq_fields[0], order_field)
+        if spec not in specs.setdefault(collection, []):
+            specs[collection].append(spec)
+    return specs
+
+
+def write_manifest(path: str = MANIFEST_PATH):
+    """Regenerate firestore.indexes.json"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(firestore_manifest(), f, indent=2)
+        f.write('\n')
+
+
+if __name__ == "__main__":
+    # Regenerate with: python -m services.indexes
+    # Deploy with:     firebase deploy --only firestore:indexes
+    write_manifest()
+    print(f"✅ Index manifest written to {MANIFEST_PATH}")
@@ -0,0 +1,70 @@
+"""
+I/O Executor
+Runs blocking Firebase SDK calls off the Flet event loop
+"""
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+
+class IOExecutor:
+    """Bounded thread pool shared by every service for blocking I/O"""
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = None):
+        self.max_workers = max_workers or int(os.getenv('IO_POOL_SIZE', '16'))
+        # Per-call timeout in seconds (0 disables it)
+        self.timeout = timeout if timeout is not None else float(os.getenv('IO_TIMEOUT', '30'))
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Get the underlying thread pool, creating it on first use"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='nutri-io'
+            )
+        return self._executor
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run a blocking callable in the pool and await its result
+
+        Args:
+            func: Blocking callable (Firestore, Storage or Auth SDK call)
+            timeout: Seconds to wait before raising asyncio.TimeoutError,
+                defaults to IO_TIMEOUT
+
+        Returns:
+            Whatever func returns
+        """
+        loop = asyncio.get_running_loop()
+        # Carry context variables (screen labels, trace spans) into the worker
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self.executor, partial(context.run, func, *args, **kwargs))
+
+        limit = self.timeout if timeout is None else timeout
+        if limit and limit > 0:
+            # The worker thread keeps running until the SDK call returns,
+            # but the caller (and the event loop) are released right away
+            return await asyncio.wait_for(future, limit)
+        return await future
+
+    def shutdown(self, wait: bool = True):
+        """Stop the pool (used on application shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# Global I/O executor instance
+io_executor = IOExecutor()
@@ -0,0 +1,756 @@
+"""
+Local Repository Backends
+In-memory and SQLite document stores with real secondary indexes,
+used in DEMO MODE, for tests and for offline benchmarks
+"""
+import copy
+import sqlite3
+import threading
+import uuid
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from services.indexes import local_indexes
+from services.io_executor import io_executor
+from services.repository_base import (
+    Change, DocumentNotFound, Filter, Repository, T, Transaction, apply_increments, dumps, loads, sort_key
+)
+
+# Secondary indexes per collection: (equality field, sort field or None),
+# derived from the same manifest as firestore.indexes.json
+LOCAL_INDEXES: Dict[str, List[Tuple[str, Optional[str]]]] = local_indexes()
+
+RANGE_OPS = ('<', '<=', '>', '>=')
+
+
+def matches(doc: Dict[str, Any], filters: Sequence[Filter]) -> bool:
+    """Check a document against a list of filters"""
+    for field, op, value in filters:
+        if field not in doc:
+            return False
+        left, right = sort_key(doc[field]), sort_key(value)
+        if op == '==':
+            ok = left == right
+        elif op == '<':
+            ok = left[0] == right[0] and left < right
+        elif op == '<=':
+            ok = left[0] == right[0] and left <= right
+        elif op == '>':
+            ok = left[0] == right[0] and left > right
+        elif op == '>=':
+            ok = left[0] == right[0] and left >= right
+        else:
+            raise ValueError(f"Unsupported operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+def pick_index(
+    indexes: Sequence[Tuple[str, Optional[str]]],
+    filters: Sequence[Filter],
+    order_by: Optional[str]
+) -> Optional[Tuple[str, Optional[str]]]:
+    """Choose the index that serves a query best, if any"""
+    eq_fields = {f for f, op, _ in filters if op == '=='}
+    range_fields = {f for f, op, _ in filters if op in RANGE_OPS}
+
+    best, best_score = None, -1
+    for index in indexes:
+        eq_field, sort_field = index
+        if eq_field not in eq_fields:
+            continue
+        score = 0
+        if sort_field and sort_field in range_fields:
+            score += 2
+        if sort_field and sort_field == order_by:
+            score += 1
+        if score > best_score:
+            best, best_score = index, score
+    return best
+
+
+def new_document_id() -> str:
+    """Firestore-style 20 character document ID"""
+    return uuid.uuid4().hex[:20]
+
+
+class LocalTransaction(Transaction):
+    """Stages writes as final document states until the backend commits them"""
+
+    def __init__(self, read: Callable[[str, str], Optional[Dict[str, Any]]]):
+        self._read = read
+        # (collection, id) -> staged document, None means delete
+        self.pending: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+
+    def _current(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        key = (collection, doc_id)
+        if key in self.pending:
+            return self.pending[key]
+        return self._read(collection, doc_id)
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._current(collection, doc_id))
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        current = self._current(collection, doc_id) if merge else None
+        doc = copy.deepcopy(current) if current else {}
+        doc.update(copy.deepcopy(data))
+        doc['id'] = doc_id
+        self.pending[(collection, doc_id)] = doc
+
+    def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        current = self._current(collection, doc_id)
+        if current is None:
+            raise DocumentNotFound(f"{collection}/{doc_id}")
+        doc = copy.deepcopy(current)
+        doc.update(copy.deepcopy(updates))
+        self.pending[(collection, doc_id)] = doc
+
+    def delete(self, collection: str, doc_id: str):
+        self.pending[(collection, doc_id)] = None
+
+    def increment(self, collection: str, doc_id: str, deltas: Dict[str, float]):
+        doc = copy.deepcopy(self._current(collection, doc_id)) or {'id': doc_id}
+        apply_increments(doc, deltas)
+        self.pending[(collection, doc_id)] = doc
+
+
+class _SortedIndex:
+    """Equality field -> entries sorted by (sort key, document id)"""
+
+    def __init__(self, eq_field: str, sort_field: Optional[str]):
+        self.eq_field = eq_field
+        self.sort_field = sort_field
+        self.entries: Dict[Tuple, List[Tuple[Tuple, str]]] = {}
+
+    def _entry(self, doc: Dict[str, Any]) -> Optional[Tuple[Tuple, Tuple]]:
+        if self.eq_field not in doc:
+            return None
+        if self.sort_field and self.sort_field not in doc:
+            return None
+        key = sort_key(doc[self.sort_field]) if self.sort_field else ()
+        return sort_key(doc[self.eq_field]), (key, doc['id'])
+
+    def add(self, doc: Dict[str, Any]):
+        entry = self._entry(doc)
+        if entry:
+            bucket = self.entries.setdefault(entry[0], [])
+            bucket.insert(bisect_left(bucket, entry[1]), entry[1])
+
+    def remove(self, doc: Dict[str, Any]):
+        entry = self._entry(doc)
+        if entry and entry[0] in self.entries:
+            bucket = self.entries[entry[0]]
+            pos = bisect_left(bucket, entry[1])
+            if pos < len(bucket) and bucket[pos] == entry[1]:
+                bucket.pop(pos)
+
+    def scan(
+        self,
+        eq_value: Any,
+        filters: Sequence[Filter],
+        cursor: Optional[Tuple[Tuple, str]] = None,
+        descending: bool = False
+    ) -> Iterator[str]:
+        """
+        IDs for eq_value in sort order, narrowed by range filters on the
+        sort field and by a (sort key, id) cursor
+        """
+        bucket = self.entries.get(sort_key(eq_value), [])
+        lo, hi = 0, len(bucket)
+        for field, op, value in filters:
+            if field != self.sort_field or op not in RANGE_OPS:
+                continue
+            key = sort_key(value)
+            if op == '>=':
+                lo = max(lo, bisect_left(bucket, key, key=lambda e: e[0]))
+            elif op == '>':
+                lo = max(lo, bisect_right(bucket, key, key=lambda e: e[0]))
+            elif op == '<=':
+                hi = min(hi, bisect_right(bucket, key, key=lambda e: e[0]))
+            elif op == '<':
+                hi = min(hi, bisect_left(bucket, key, key=lambda e: e[0]))
+
+        if cursor is not None:
+            if descending:
+                hi = min(hi, bisect_left(bucket, cursor))
+            else:
+                lo = max(lo, bisect_right(bucket, cursor))
+
+        positions = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        return (bucket[pos][1] for pos in positions)
+
+
+class _Listener:
+    """A registered query listener; limited queries keep their current result"""
+
+    def __init__(
+        self,
+        filters: Sequence[Filter],
+        on_changes: Callable[[List[Change]], None],
+        requery: Optional[Callable[[], List[Dict[str, Any]]]] = None
+    ):
+        self.filters = list(filters)
+        self.on_changes = on_changes
+        self.requery = requery
+        self.current: Dict[str, Dict[str, Any]] = {}
+
+    def changes(self, writes: List[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> List[Change]:
+        """Changes a batch of (old, new) writes makes to this listener's result"""
+        if self.requery is not None:
+            # Ordered + limited: a write can push documents in or out of the
+            # window, so re-run the (indexed) query and diff the result
+            if not any(
+                (old is not None and matches(old, self.filters))
+                or (new is not None and matches(new, self.filters))
+                for old, new in writes
+            ):
+                return []
+            result = {doc['id']: doc for doc in self.requery()}
+            changes = [('removed', doc) for doc_id, doc in self.current.items() if doc_id not in result]
+            for doc_id, doc in result.items():
+                if doc_id not in self.current:
+                    changes.append(('added', doc))
+                elif doc != self.current[doc_id]:
+                    changes.append(('modified', doc))
+            self.current = result
+            return copy.deepcopy(changes)
+
+        changes = []
+        for old, new in writes:
+            was = old is not None and matches(old, self.filters)
+            now = new is not None and matches(new, self.filters)
+            if now:
+                changes.append(('modified' if was else 'added', copy.deepcopy(new)))
+            elif was:
+                changes.append(('removed', copy.deepcopy(old)))
+        return changes
+
+
+class LocalWatchers:
+    """Query listeners of a local backend, notified after each committed write"""
+
+    def __init__(self):
+        self._listeners: Dict[str, Dict[int, _Listener]] = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+
+    def active(self, collection: str) -> bool:
+        return bool(self._listeners.get(collection))
+
+    def add(self, collection: str, listener: _Listener) -> Callable[[], None]:
+        with self._lock:
+            self._next_token += 1
+            token = self._next_token
+            self._listeners.setdefault(collection, {})[token] = listener
+
+        def stop():
+            with self._lock:
+                self._listeners.get(collection, {}).pop(token, None)
+
+        return stop
+
+    def start(
+        self,
+        collection: str,
+        filters: Sequence[Filter],
+        on_changes: Callable[[List[Change]], None],
+        query: Callable[[], List[Dict[str, Any]]],
+        limited: bool
+    ) -> Callable[[], None]:
+        """
+        Register a listener and deliver its initial snapshot
+
+        The backend must hold its write lock, so no change is missed
+        between the snapshot and the registration.
+        """
+        listener = _Listener(filters, on_changes, query if limited else None)
+        initial = query()
+        listener.current = {doc['id']: doc for doc in initial}
+        stop = self.add(collection, listener)
+        on_changes(copy.deepcopy([('added', doc) for doc in initial]))
+        return stop
+
+    def notify(self, writes: List[Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]):
+        """Dispatch (collection, old document, new document) writes to listeners"""
+        with self._lock:
+            listeners = {
+                collection: list(self._listeners.get(collection, {}).values())
+                for collection in {write[0] for write in writes}
+            }
+        for collection, collection_listeners in listeners.items():
+            collection_writes = [(old, new) for c, old, new in writes if c == collection]
+            for listener in collection_listeners:
+                changes = listener.changes(collection_writes)
+                if not changes:
+                    continue
+                try:
+                    listener.on_changes(changes)
+                except Exception as e:
+                    print(f"Error notifying listener: {e}")
+
+
+class MemoryRepository(Repository):
+    """Process-local repository with secondary indexes"""
+
+    def __init__(self, indexes: Optional[Dict[str, List[Tuple[str, Optional[str]]]]] = None):
+        self.index_specs = indexes if indexes is not None else LOCAL_INDEXES
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.indexes: Dict[str, List[_SortedIndex]] = {}
+        self.watchers = LocalWatchers()
+        self._lock = threading.RLock()
+
+    def new_id(self, collection: str) -> str:
+        return new_document_id()
+
+    def _collection(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        if collection not in self.collections:
+            self.collections[collection] = {}
+            self.indexes[collection] = [
+                _SortedIndex(eq_field, sort_field)
+                for eq_field, sort_field in self.index_specs.get(collection, [])
+            ]
+        return self.collections[collection]
+
+    def _put(self, collection: str, doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        docs = self._collection(collection)
+        old = docs.get(doc['id'])
+        for index in self.indexes[collection]:
+            if old is not None:
+                index.remove(old)
+            index.add(doc)
+        docs[doc['id']] = doc
+        return old
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        with self._lock:
+            docs = self._collection(collection)
+            doc = dict(docs[doc_id]) if merge and doc_id in docs else {}
+            doc.update(copy.deepcopy(data))
+            doc['id'] = doc_id
+            old = self._put(collection, doc)
+            self.watchers.notify([(collection, old, doc)])
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            doc = self._collection(collection).get(doc_id)
+            return copy.deepcopy(doc) if doc is not None else None
+
+    async def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        with self._lock:
+            docs = self._collection(collection)
+            if doc_id not in docs:
+                raise DocumentNotFound(f"{collection}/{doc_id}")
+            doc = dict(docs[doc_id])
+            doc.update(copy.deepcopy(updates))
+            old = self._put(collection, doc)
+            self.watchers.notify([(collection, old, doc)])
+
+    def _remove(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        docs = self._collection(collection)
+        old = docs.pop(doc_id, None)
+        if old is not None:
+            for index in self.indexes[collection]:
+                index.remove(old)
+        return old
+
+    async def delete(self, collection: str, doc_id: str):
+        with self._lock:
+            old = self._remove(collection, doc_id)
+            self.watchers.notify([(collection, old, None)])
+
+    async def run_transaction(self, func: Callable[[Transaction], T]) -> T:
+        with self._lock:
+            transaction = LocalTransaction(
+                lambda collection, doc_id: self._collection(collection).get(doc_id)
+            )
+            result = func(transaction)
+            writes = []
+            for (collection, doc_id), doc in transaction.pending.items():
+                if doc is None:
+                    writes.append((collection, self._remove(collection, doc_id), None))
+                else:
+                    writes.append((collection, self._put(collection, doc), doc))
+            self.watchers.notify(writes)
+            return result
+
+    def watch(
+        self,
+        collection: str,
+        filters: Sequence[Filter],
+        on_changes: Callable[[List[Change]], None],
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
+    ) -> Callable[[], None]:
+        with self._lock:
+            return self.watchers.start(
+                collection,
+                filters,
+                on_changes,
+                lambda: self._select(collection, filters, order_by, descending, limit),
+                limited=bool(limit)
+            )
+
+    def _select(
+        self,
+        collection: str,
+        filters: Sequence[Filter],
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[Any, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Matching stored documents (not copies); caller must hold the lock"""
+        docs = self._collection(collection)
+        index_spec = pick_index(self.index_specs.get(collection, []), filters, order_by)
+
+        cursor = None
+        if start_after is not None:
+            cursor = (sort_key(start_after[0]) if order_by else (), start_after[1])
+
+        presorted = False
+        if index_spec:
+            index = next(
+                i for i in self.indexes[collection]
+                if (i.eq_field, i.sort_field) == index_spec
+            )
+            eq_value = next(v for f, op, v in filters if f == index.eq_field and op == '==')
+            # Index entries are ordered by (sort field, id), which is exactly
+            # the query order when order_by is the sort field (or both are None)
+            presorted = order_by == index.sort_field
+            ids = index.scan(
+                eq_value,
+                filters,
+                cursor if presorted else None,
+                descending if presorted else False
+            )
+            candidates = (docs[doc_id] for doc_id in ids)
+        else:
+            candidates = iter(docs.values())
+
+        matching = (doc for doc in candidates if matches(doc, filters))
+
+        if presorted:
+            # Stream from the index and stop as soon as the page is full
+            return list(islice(matching, limit)) if limit else list(matching)
+
+        if not (order_by or cursor or limit):
+            return list(matching)
+
+        if order_by:
+            matching = (doc for doc in matching if order_by in doc)
+            position = lambda d: (sort_key(d[order_by]), d['id'])
+        else:
+            position = lambda d: ((), d['id'])
+
+        results = sorted(matching, key=position, reverse=descending)
+        if cursor is not None:
+            results = [
+                doc for doc in results
+                if (position(doc) < cursor if descending else position(doc) > cursor)
+            ]
+        if limit:
+            results = results[:limit]
+        return results
+
+    async def query(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[Any, str]] = None
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            return copy.deepcopy(
+                self._select(collection, filters, order_by, descending, limit, start_after)
+            )
+
+    async def count(self, collection: str, filters: Sequence[Filter] = ()) -> int:
+        with self._lock:
+            return len(self._select(collection, filters))
+
+
+def _column_value(value: Any) -> Any:
+    """Encode a field for an indexed column so SQL ordering matches sort_key"""
+    key = sort_key(value)
+    if key[0] == 4:
+        return key[1].isoformat()
+    if key[0] in (1, 2, 3):
+        return key[1]
+    return None
+
+
+def _column(field: str) -> str:
+    return f'"f_{field}"'
+
+
+class SQLiteRepository(Repository):
+    """Single-file SQLite repository with one indexed table per collection"""
+
+    def __init__(
+        self,
+        path: str = ':memory:',
+        indexes: Optional[Dict[str, List[Tuple[str, Optional[str]]]]] = None
+    ):
+        self.path = path
+        self.index_specs = indexes if indexes is not None else LOCAL_INDEXES
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._lock = threading.RLock()
+        self._tables: Dict[str, List[str]] = {}
+        self.watchers = LocalWatchers()
+
+    def new_id(self, collection: str) -> str:
+        return new_document_id()
+
+    def _indexed_fields(self, collection: str) -> List[str]:
+        fields = []
+        for eq_field, sort_field in self.index_specs.get(collection, []):
+            for field in (eq_field, sort_field):
+                if field and field not in fields:
+                    fields.append(field)
+        return fields
+
+    def _table(self, collection: str) -> List[str]:
+        """Create the table and its indexes on first use, return indexed fields"""
+        if collection not in self._tables:
+            fields = self._indexed_fields(collection)
+            columns = ''.join(f', {_column(f)}' for f in fields)
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{collection}" '
+                f'(id TEXT PRIMARY KEY, data TEXT NOT NULL{columns})'
+            )
+            for eq_field, sort_field in self.index_specs.get(collection, []):
+                name = f'ix_{collection}_{eq_field}' + (f'_{sort_field}' if sort_field else '')
+                cols = _column(eq_field) + (f', {_column(sort_field)}' if sort_field else '')
+                self._conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{name}" ON "{collection}" ({cols}, id)'
+                )
+            self._conn.commit()
+            self._tables[collection] = fields
+        return self._tables[collection]
+
+    def _write(self, collection: str, doc: Dict[str, Any]):
+        fields = self._table(collection)
+        columns = ''.join(f', {_column(f)}' for f in fields)
+        params = ', ?' * len(fields)
+        self._conn.execute(
+            f'INSERT OR REPLACE INTO "{collection}" (id, data{columns}) VALUES (?, ?{params})',
+            [doc['id'], dumps(doc)] + [_column_value(doc.get(f)) for f in fields]
+        )
+
+    def _read(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        self._table(collection)
+        row = self._conn.execute(
+            f'SELECT data FROM "{collection}" WHERE id = ?', (doc_id,)
+        ).fetchone()
+        return loads(row[0]) if row else None
+
+    def _previous(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        # Old versions are only read when someone listens to the collection
+        return self._read(collection, doc_id) if self.watchers.active(collection) else None
+
+    def _set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool):
+        with self._lock:
+            old = self._read(collection, doc_id) if merge else self._previous(collection, doc_id)
+            doc = dict(old or {}) if merge else {}
+            doc.update(data)
+            doc['id'] = doc_id
+            self._write(collection, doc)
+            self._conn.commit()
+            self.watchers.notify([(collection, old, doc)])
+
+    def _update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        with self._lock:
+            old = self._read(collection, doc_id)
+            if old is None:
+                raise DocumentNotFound(f"{collection}/{doc_id}")
+            doc = dict(old)
+            doc.update(updates)
+            self._write(collection, doc)
+            self._conn.commit()
+            self.watchers.notify([(collection, old, doc)])
+
+    def _delete(self, collection: str, doc_id: str):
+        with self._lock:
+            self._table(collection)
+            old = self._previous(collection, doc_id)
+            self._conn.execute(f'DELETE FROM "{collection}" WHERE id = ?', (doc_id,))
+            self._conn.commit()
+            self.watchers.notify([(collection, old, None)])
+
+    def _get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read(collection, doc_id)
+
+    def _where(
+        self,
+        fields: List[str],
+        filters: Sequence[Filter]
+    ) -> Tuple[List[str], List[Any], List[Filter]]:
+        """Split filters into SQL clauses on indexed columns and residual filters"""
+        clauses, params, residual = [], [], []
+        for field, op, value in filters:
+            if op not in ('==',) + RANGE_OPS:
+                raise ValueError(f"Unsupported operator: {op}")
+            if field in fields:
+                clauses.append(f"{_column(field)} {'=' if op == '==' else op} ?")
+                params.append(_column_value(value))
+            else:
+                residual.append((field, op, value))
+        return clauses, params, residual
+
+    def _query(
+        self,
+        collection: str,
+        filters: Sequence[Filter],
+        order_by: Optional[str],
+        descending: bool,
+        limit: Optional[int],
+        start_after: Optional[Tuple[Any, str]] = None
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            fields = self._table(collection)
+            clauses, params, residual = self._where(fields, filters)
+
+            direction = 'DESC' if descending else 'ASC'
+            if order_by in fields:
+                order_column = _column(order_by)
+                clauses.append(f'{order_column} IS NOT NULL')
+            sorted_in_sql = order_by is None or order_by in fields
+
+            if start_after is not None and sorted_in_sql:
+                op = '<' if descending else '>'
+                if order_by:
+                    value = _column_value(start_after[0])
+                    clauses.append(
+                        f'({order_column} {op} ? OR ({order_column} = ? AND id {op} ?))'
+                    )
+                    params.extend([value, value, start_after[1]])
+                else:
+                    clauses.append(f'id {op} ?')
+                    params.append(start_after[1])
+
+            sql = f'SELECT data FROM "{collection}"'
+            if clauses:
+                sql += ' WHERE ' + ' AND '.join(clauses)
+            if order_by in fields:
+                sql += f' ORDER BY {order_column} {direction}, id {direction}'
+            elif order_by is None:
+                sql += f' ORDER BY id {direction}'
+            if limit and sorted_in_sql and not residual:
+                sql += f' LIMIT {int(limit)}'
+
+            rows = self._conn.execute(sql, params).fetchall()
+
+        results = [doc for doc in (loads(row[0]) for row in rows) if matches(doc, residual)]
+        if not sorted_in_sql:
+            position = lambda d: (sort_key(d[order_by]), d['id'])
+            results = [doc for doc in results if order_by in doc]
+            results.sort(key=position, reverse=descending)
+            if start_after is not None:
+                cursor = (sort_key(start_after[0]), start_after[1])
+                results = [
+                    doc for doc in results
+                    if (position(doc) < cursor if descending else position(doc) > cursor)
+                ]
+        if limit:
+            results = results[:limit]
+        return results
+
+    def _count(self, collection: str, filters: Sequence[Filter]) -> int:
+        with self._lock:
+            fields = self._table(collection)
+            clauses, params, residual = self._where(fields, filters)
+            if residual:
+                return len(self._query(collection, filters, None, False, None))
+
+            sql = f'SELECT COUNT(*) FROM "{collection}"'
+            if clauses:
+                sql += ' WHERE ' + ' AND '.join(clauses)
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def _transaction(self, func: Callable[[Transaction], Any]) -> Any:
+        with self._lock:
+            transaction = LocalTransaction(self._read)
+            result = func(transaction)
+            # Create tables up front: DDL commits implicitly
+            for collection, _ in transaction.pending:
+                self._table(collection)
+            writes = [
+                (collection, self._previous(collection, doc_id), doc)
+                for (collection, doc_id), doc in transaction.pending.items()
+            ]
+            try:
+                for (collection, doc_id), doc in transaction.pending.items():
+                    if doc is None:
+                        self._conn.execute(
+                            f'DELETE FROM "{collection}" WHERE id = ?', (doc_id,)
+                        )
+                    else:
+                        self._write(collection, doc)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self.watchers.notify(writes)
+            return result
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        await io_executor.run(self._set, collection, doc_id, data, merge)
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        return await io_executor.run(self._get, collection, doc_id)
+
+    async def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        await io_executor.run(self._update, collection, doc_id, updates)
+
+    async def delete(self, collection: str, doc_id: str):
+        await io_executor.run(self._delete, collection, doc_id)
+
+    async def query(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[Any, str]] = None
+    ) -> List[Dict[str, Any]]:
+        return await io_executor.run(
+            self._query, collection, list(filters), order_by, descending, limit, start_after
+        )
+
+    async def count(self, collection: str, filters: Sequence[Filter] = ()) -> int:
+        return await io_executor.run(self._count, collection, list(filters))
+
+    async def run_transaction(self, func: Callable[[Transaction], T]) -> T:
+        return await io_executor.run(self._transaction, func)
+
+    def watch(
+        self,
+        collection: str,
+        filters: Sequence[Filter],
+        on_changes: Callable[[List[Change]], None],
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
+    ) -> Callable[[], None]:
+        # Only writes made through this instance are seen (no cross-process notification)
+        with self._lock:
+            return self.watchers.start(
+                collection,
+                filters,
+                on_changes,
+                lambda: self._query(collection, list(filters), order_by, descending, limit),
+                limited=bool(limit)
+            )
+
+    def close(self):
+        """Close the underlying connection"""
+        with self._lock:
+            self._conn.close()
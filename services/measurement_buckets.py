@@ -0,0 +1,328 @@
+"""
+Measurement Buckets
+Columnar storage of measurements, one document per client and month
+"""
+import argparse
+import asyncio
+import bisect
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from services.repository import repository
+from services.repository_base import (
+    Repository, Transaction, decode_cursor, encode_cursor, sort_key, to_datetime
+)
+
+BUCKETS_COLLECTION = 'measurementBuckets'
+
+# Scalar fields, stored as one array per field
+COLUMNS = (
+    'id', 'date', 'weight', 'height', 'bmi', 'waist', 'hip',
+    'bodyFat', 'muscleMass', 'notes', 'createdAt',
+)
+
+# Per-row lists: Firestore arrays cannot hold arrays, so these are kept
+# together in a 'media' column of maps
+MEDIA_FIELDS = ('photos', 'photoVariants')
+
+
+def month_start(value) -> datetime:
+    """First instant of the month a date/datetime falls in"""
+    return datetime(value.year, value.month, 1)
+
+
+def bucket_id(client_id: str, value) -> str:
+    """Bucket document ID, e.g. {clientId}_2024-05"""
+    return f"{client_id}_{value.year:04d}-{value.month:02d}"
+
+
+def new_bucket(client_id: str, value) -> Dict[str, Any]:
+    """Empty bucket for the month of value"""
+    return {
+        'clientId': client_id,
+        'month': f"{value.year:04d}-{value.month:02d}",
+        'start': month_start(value),
+        'count': 0,
+        'columns': {column: [] for column in COLUMNS + ('media',)},
+    }
+
+
+def _position(measurement: Dict[str, Any]) -> Tuple:
+    return (sort_key(measurement.get('date')), measurement['id'])
+
+
+def append_row(bucket: Dict[str, Any], measurement: Dict[str, Any]):
+    """
+    Add a measurement to a bucket, keeping rows ordered by (date, id)
+
+    A row with the same ID is replaced, so appends are idempotent.
+    """
+    columns = bucket['columns']
+    if measurement['id'] in columns['id']:
+        remove_row(bucket, measurement['id'])
+
+    keys = [(sort_key(d), i) for d, i in zip(columns['date'], columns['id'])]
+    index = bisect.bisect(keys, _position(measurement))
+    for column in COLUMNS:
+        columns[column].insert(index, measurement.get(column))
+    columns['media'].insert(index, {field: measurement.get(field) or [] for field in MEDIA_FIELDS})
+    bucket['count'] = len(columns['id'])
+
+
+def remove_row(bucket: Dict[str, Any], measurement_id: str):
+    """Drop a measurement from a bucket (no-op if absent)"""
+    columns = bucket['columns']
+    if measurement_id not in columns['id']:
+        return
+    index = columns['id'].index(measurement_id)
+    for column in COLUMNS + ('media',):
+        del columns[column][index]
+    bucket['count'] = len(columns['id'])
+
+
+def bucket_rows(bucket: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Expand a bucket into measurement records, oldest first"""
+    columns = bucket['columns']
+    rows = []
+    for index in range(len(columns['id'])):
+        row = {column: columns[column][index] for column in COLUMNS}
+        row.update(columns['media'][index])
+        row['clientId'] = bucket['clientId']
+        rows.append(row)
+    return rows
+
+
+class MeasurementBuckets:
+    """
+    Reads and writes of the bucketed layout (MEASUREMENT_LAYOUT=bucketed)
+
+    A client's history costs one document read per month it spans, and
+    range reads only touch the months overlapping the range.
+    """
+
+    def __init__(self, repo: Optional[Repository] = None):
+        self.repo = repo or repository
+        self.collection = BUCKETS_COLLECTION
+
+    def append(self, tx: Transaction, measurement: Dict[str, Any]):
+        """
+        Append one measurement to its bucket inside a transaction
+
+        Reads the bucket, so it must come before the transaction's first
+        write; several rows of one bucket go through append_row on a
+        single read instead (see migrate_client).
+        """
+        client_id = measurement['clientId']
+        doc_id = bucket_id(client_id, measurement['date'])
+        bucket = tx.get(self.collection, doc_id) or new_bucket(client_id, measurement['date'])
+        bucket.pop('id', None)
+        append_row(bucket, measurement)
+        tx.set(self.collection, doc_id, bucket)
+
+    async def stream_buckets(
+        self,
+        client_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        descending: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Buckets overlapping [start_date, end_date), in month order"""
+        filters: List[Tuple[str, str, Any]] = [('clientId', '==', client_id)]
+        if start_date is not None:
+            filters.append(('start', '>=', month_start(start_date)))
+        if end_date is not None:
+            filters.append(('start', '<', to_datetime(end_date)))
+        async for bucket in self.repo.stream(
+            self.collection,
+            filters=filters,
+            order_by='start',
+            descending=descending,
+            page_size=12
+        ):
+            yield bucket
+
+    async def iter_rows(
+        self,
+        client_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        descending: bool = True,
+        after: Optional[Tuple[Any, str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Measurements in [start_date, end_date), one bucket in memory at a time
+
+        Args:
+            after: (date, id) position to continue after, in iteration order
+        """
+        start_date = to_datetime(start_date) if start_date is not None else None
+        end_date = to_datetime(end_date) if end_date is not None else None
+        low = sort_key(start_date) if start_date is not None else None
+        high = sort_key(end_date) if end_date is not None else None
+        resume = (sort_key(after[0]), after[1]) if after else None
+
+        if after and descending:
+            # Later months cannot contain rows before the cursor
+            cursor_month = month_start(after[0])
+            next_month = datetime(
+                cursor_month.year + cursor_month.month // 12,
+                cursor_month.month % 12 + 1,
+                1
+            )
+            if end_date is None or next_month < end_date:
+                end_date = next_month
+        elif after:
+            start_date = max(start_date, month_start(after[0])) if start_date else month_start(after[0])
+
+        async for bucket in self.stream_buckets(client_id, start_date, end_date, descending):
+            rows = bucket_rows(bucket)
+            for row in (reversed(rows) if descending else rows):
+                key = sort_key(row.get('date'))
+                if low is not None and key < low:
+                    continue
+                if high is not None and key >= high:
+                    continue
+                if resume is not None:
+                    position = (key, row['id'])
+                    if (position >= resume) if descending else (position <= resume):
+                        continue
+                yield row
+
+    async def query(
+        self,
+        client_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        descending: bool = True,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Measurements in [start_date, end_date)"""
+        rows = []
+        async for row in self.iter_rows(client_id, start_date, end_date, descending):
+            rows.append(row)
+            if limit and len(rows) >= limit:
+                break
+        return rows
+
+    async def query_page(
+        self,
+        client_id: str,
+        page_size: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of measurements, newest first, with the same cursors as the flat layout"""
+        after = decode_cursor(cursor) if cursor else None
+        rows = []
+        async for row in self.iter_rows(client_id, after=after):
+            rows.append(row)
+            if len(rows) > page_size:
+                break
+        if len(rows) > page_size:
+            return rows[:page_size], encode_cursor(rows[page_size - 1], 'date')
+        return rows, None
+
+    async def columns(
+        self,
+        client_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, List[Any]]:
+        """Concatenated columns of the buckets in range, oldest first (for analytics)"""
+        merged: Dict[str, List[Any]] = {column: [] for column in COLUMNS}
+        low = sort_key(start_date) if start_date is not None else None
+        high = sort_key(end_date) if end_date is not None else None
+        async for bucket in self.stream_buckets(client_id, start_date, end_date, descending=False):
+            columns = bucket['columns']
+            keep = [
+                index for index, value in enumerate(columns['date'])
+                if (low is None or sort_key(value) >= low) and (high is None or sort_key(value) < high)
+            ]
+            for column in COLUMNS:
+                values = columns[column]
+                merged[column].extend(values if len(keep) == len(values) else [values[i] for i in keep])
+        return merged
+
+    async def migrate_client(self, client_id: str, prune: bool = False) -> int:
+        """
+        Merge a client's flat `measurements` documents into buckets
+
+        Rows already in a bucket are replaced by ID, so re-running is safe
+        and measurements appended to buckets since are kept.
+
+        Args:
+            prune: Delete the flat documents once their bucket is written
+
+        Returns:
+            Number of measurements merged
+        """
+        months: Dict[str, List[Dict[str, Any]]] = {}
+        async for measurement in self.repo.stream(
+            'measurements',
+            filters=[('clientId', '==', client_id)],
+            order_by='date'
+        ):
+            months.setdefault(bucket_id(client_id, measurement['date']), []).append(measurement)
+
+        for doc_id, measurements in months.items():
+            def merge(tx, doc_id=doc_id, measurements=measurements):
+                # Firestore transactions read before any write and do not
+                # see their own writes: one read, all rows, one write
+                bucket = tx.get(self.collection, doc_id) or new_bucket(client_id, measurements[0]['date'])
+                bucket.pop('id', None)
+                for measurement in measurements:
+                    append_row(bucket, measurement)
+                tx.set(self.collection, doc_id, bucket)
+            # One transaction per month: it reads and writes a single bucket
+            await self.repo.run_transaction(merge)
+            if prune:
+                await self.repo.write_batch([
+                    ('delete', 'measurements', measurement['id'], None)
+                    for measurement in measurements
+                ])
+
+        return sum(len(measurements) for measurements in months.values())
+
+    async def migrate_all(self, prune: bool = False, concurrency: int = 4) -> Dict[str, int]:
+        """Migrate every client's measurements; returns {clientId: count}"""
+        semaphore = asyncio.Semaphore(concurrency)
+        migrated: Dict[str, int] = {}
+
+        async def migrate(client_id: str):
+            async with semaphore:
+                migrated[client_id] = await self.migrate_client(client_id, prune)
+
+        tasks = []
+        async for client in self.repo.stream('clients', page_size=200):
+            tasks.append(asyncio.create_task(migrate(client['id'])))
+        await asyncio.gather(*tasks)
+        return migrated
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m services.measurement_buckets',
+        description='Migrate measurements from the flat collection into monthly buckets'
+    )
+    parser.add_argument('--client', help='Only migrate this client ID')
+    parser.add_argument('--prune', action='store_true',
+                        help='Delete flat measurement documents once bucketed')
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace):
+    from services.measurement_service import measurement_service
+
+    buckets = MeasurementBuckets()
+    if args.client:
+        migrated = {args.client: await buckets.migrate_client(args.client, args.prune)}
+    else:
+        migrated = await buckets.migrate_all(args.prune)
+
+    for client_id, count in migrated.items():
+        if count:
+            await measurement_service.refresh_latest_summary(client_id)
+    print(f"✅ {sum(migrated.values())} measurements of {len(migrated)} clients migrated to {BUCKETS_COLLECTION}")
+
+
+if __name__ == "__main__":
+    # Set MEASUREMENT_LAYOUT=bucketed once migrated
+    asyncio.run(_main(_parse_args()))
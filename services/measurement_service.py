@@ -2,20 +2,47 @@
 Measurement Service
 Handles body measurements and progress tracking
 """
-from typing import List, Dict, Any, Optional
+import asyncio
+import os
+import tempfile
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from services.firebase_config import firebase
-import io
-from PIL import Image
+from services.blob_store import BlobStore, blob_store
+from services.measurement_buckets import MeasurementBuckets, bucket_rows
+from services.metrics import instrumented
+from services.realtime import RealtimeHub, realtime_hub
+from services.repository import Repository, repository
+from services.client_service import client_service
+from services.photo_pipeline import PhotoPipeline, PhotoSource, photo_pipeline
+from utils.images import CONTENT_TYPES, EXTENSIONS
 
 
+@instrumented('measurement_service')
 class MeasurementService:
     """Service for managing body measurements"""
     
-    def __init__(self):
-        self.db = firebase.db
-        self.storage = firebase.storage
+    def __init__(
+        self,
+        repo: Optional[Repository] = None,
+        pipeline: Optional[PhotoPipeline] = None,
+        blobs: Optional[BlobStore] = None,
+        layout: Optional[str] = None,
+        hub: Optional[RealtimeHub] = None
+    ):
+        self.repo = repo or repository
+        self.hub = hub or realtime_hub
+        self.blobs = blobs or blob_store
+        self.pipeline = pipeline or photo_pipeline
+        self.upload_concurrency = int(os.getenv('PHOTO_UPLOAD_CONCURRENCY', '4'))
         self.collection = 'measurements'
+        self.clients_collection = 'clients'
+        # flat: one document per measurement; bucketed: one per client-month
+        self.layout = (layout or os.getenv('MEASUREMENT_LAYOUT', 'flat')).lower()
+        self.buckets = MeasurementBuckets(self.repo)
+    
+    @property
+    def bucketed(self) -> bool:
+        return self.layout == 'bucketed'
     
     def calculate_bmi(self, weight: float, height: float) -> float:
         """Calculate BMI (Body Mass Index)"""
@@ -23,22 +50,133 @@ class MeasurementService:
             return 0.0
         return round(weight / ((height / 100) ** 2), 2)
     
-    async def upload_photo(self, photo_bytes: bytes, client_id: str) -> Optional[str]:
-        """Upload measurement photo to Firebase Storage"""
+    def photo_paths(self, client_id: str, digest: str) -> Dict[Tuple[str, str], str]:
+        """
+        Storage paths of every variant of a photo, keyed by (variant, format)
+        
+        Paths are derived from the SHA-256 of the original upload, e.g.
+        measurements/{client_id}/{sha256}.jpg, {sha256}_thumb.webp
+        """
+        stem = f"measurements/{client_id}/{digest}"
+        paths = {}
+        for variant, _, formats in self.pipeline.variants:
+            suffix = '' if variant == 'original' else f"_{variant}"
+            for image_format in formats:
+                paths[(variant, image_format)] = f"{stem}{suffix}.{EXTENSIONS[image_format]}"
+        return paths
+    
+    def group_paths(self, paths: Dict[Tuple[str, str], str]) -> Dict[str, Dict[str, str]]:
+        """Map (variant, format) paths to {variant: {format: path}}"""
+        variants: Dict[str, Dict[str, str]] = {}
+        for (variant, image_format), path in paths.items():
+            variants.setdefault(variant, {})[image_format] = path
+        return variants
+    
+    def photo_url(self, path: str) -> str:
+        """URL for a stored photo path (records from before signed URLs hold URLs)"""
+        return path if '://' in path else self.blobs.url(path)
+    
+    def with_photo_urls(self, measurement: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resolve a measurement's stored photo paths into URLs
+        
+        Records keep storage paths because signed URLs expire; URLs are
+        minted (from a local cache) when the record is read.
+        """
+        if not measurement.get('photos') and not measurement.get('photoVariants'):
+            return measurement
+        resolved = dict(measurement)
+        resolved['photos'] = [self.photo_url(path) for path in measurement.get('photos') or []]
+        resolved['photoVariants'] = [
+            {
+                variant: {image_format: self.photo_url(path) for image_format, path in formats.items()}
+                for variant, formats in variants.items()
+            }
+            for variants in measurement.get('photoVariants') or []
+        ]
+        return resolved
+    
+    async def _upload(
+        self,
+        path: str,
+        local_path: str,
+        content_type: str,
+        semaphore: asyncio.Semaphore
+    ):
+        async with semaphore:
+            await self.blobs.upload_file(path, local_path, content_type)
+    
+    async def upload_photo(
+        self,
+        photo: PhotoSource,
+        client_id: str,
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Optional[Dict[str, Dict[str, str]]]:
+        """
+        Render and upload every variant of a measurement photo
+        
+        The photo (bytes, a binary file object or an async chunk iterator)
+        is spooled to a scratch file while hashed, and variants are streamed
+        from disk, so memory use does not grow with the photo size.
+        
+        Photos are content-addressed: if the same bytes were stored before
+        (a retried or re-submitted measurement) nothing is rendered or
+        transferred. The original is uploaded last, so its presence means
+        every variant is stored too; without it, every variant is uploaded
+        again (one existence check per photo, not per variant).
+        
+        Returns:
+            {variant: {format: storage path}}, or None if the photo could not be stored
+        """
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"measurements/{client_id}/{timestamp}.jpg"
-            
-            blob = self.storage.blob(filename)
-            blob.upload_from_string(photo_bytes, content_type='image/jpeg')
-            blob.make_public()
-            
-            return blob.public_url
+            with tempfile.TemporaryDirectory(prefix='nutri-photo-', dir=self.pipeline.spool_dir) as workdir:
+                source_path, digest = await self.pipeline.spool(photo, workdir)
+                paths = self.photo_paths(client_id, digest)
+                original_path = paths[('original', 'jpeg')]
+                
+                if await self.blobs.exists(original_path):
+                    return self.group_paths(paths)
+                
+                renditions = await self.pipeline.render(source_path, workdir)
+                semaphore = semaphore or asyncio.Semaphore(self.upload_concurrency)
+                
+                # Variants left over from an interrupted attempt are overwritten
+                await asyncio.gather(*(
+                    self._upload(path, renditions[variant][image_format], CONTENT_TYPES[image_format], semaphore)
+                    for (variant, image_format), path in paths.items()
+                    if path != original_path
+                ))
+                async with semaphore:
+                    await self.blobs.upload_file(original_path, renditions['original']['jpeg'], CONTENT_TYPES['jpeg'])
+                
+                return self.group_paths(paths)
             
         except Exception as e:
             print(f"Error uploading photo: {e}")
             return None
     
+    async def upload_photos(
+        self,
+        photos: List[PhotoSource],
+        client_id: str
+    ) -> List[Dict[str, Dict[str, str]]]:
+        """
+        Process and upload several photos concurrently
+        
+        Each photo is rendered in the photo pipeline and its variants are
+        uploaded with at most PHOTO_UPLOAD_CONCURRENCY uploads in flight.
+        Identical photos in the same submission are stored once.
+        
+        Returns:
+            Variant paths of the photos that were uploaded, in input order
+        """
+        unique = list(dict.fromkeys(photos))
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+        results = await asyncio.gather(
+            *(self.upload_photo(photo, client_id, semaphore) for photo in unique)
+        )
+        return [variants for variants in results if variants]
+    
     async def create_measurement(
         self,
         client_id: str,
@@ -49,7 +187,7 @@ class MeasurementService:
         body_fat: Optional[float] = None,
         muscle_mass: Optional[float] = None,
         notes: str = "",
-        photos: Optional[List[bytes]] = None
+        photos: Optional[List[PhotoSource]] = None
     ) -> Dict[str, Any]:
         """
         Create a new measurement record
@@ -63,7 +201,7 @@ class MeasurementService:
             body_fat: Body fat percentage
             muscle_mass: Muscle mass percentage
             notes: Additional notes
-            photos: List of photo bytes
+            photos: Photos as bytes, binary file objects or async chunk iterators
         
         Returns:
             Created measurement data
@@ -73,12 +211,7 @@ class MeasurementService:
             bmi = self.calculate_bmi(weight, height)
             
             # Upload photos if provided
-            photo_urls = []
-            if photos:
-                for photo in photos:
-                    url = await self.upload_photo(photo, client_id)
-                    if url:
-                        photo_urls.append(url)
+            photo_variants = await self.upload_photos(photos, client_id) if photos else []
             
             measurement_data = {
                 'clientId': client_id,
@@ -91,17 +224,33 @@ class MeasurementService:
                 'bodyFat': body_fat,
                 'muscleMass': muscle_mass,
                 'notes': notes,
-                'photos': photo_urls,
+                # Storage paths of the full-size photos; list and comparison
+                # views read photoVariants (both are resolved to URLs on read)
+                'photos': [variants['original']['jpeg'] for variants in photo_variants],
+                'photoVariants': photo_variants,
                 'createdAt': datetime.now()
             }
             
-            doc_ref = self.db.collection(self.collection).document()
-            measurement_data['id'] = doc_ref.id
-            doc_ref.set(measurement_data)
+            measurement_data['id'] = self.repo.new_id(self.collection)
+            summary = self.summarize(measurement_data)
+            
+            def write(tx):
+                # Keep the denormalized summary on the client record current
+                client = tx.get(self.clients_collection, client_id)
+                if self.bucketed:
+                    self.buckets.append(tx, measurement_data)
+                else:
+                    tx.set(self.collection, measurement_data['id'], measurement_data)
+                if client is not None:
+                    tx.update(self.clients_collection, client_id, {'latestMeasurement': summary})
+                return client is not None
+            
+            if await self.repo.run_transaction(write):
+                client_service.invalidate_client(client_id)
             
             return {
                 'success': True,
-                'measurement': measurement_data,
+                'measurement': self.with_photo_urls(measurement_data),
                 'message': 'Medición registrada exitosamente'
             }
             
@@ -112,30 +261,227 @@ class MeasurementService:
                 'message': f'Error al registrar medición: {str(e)}'
             }
     
-    async def get_measurements_by_client(self, client_id: str) -> List[Dict[str, Any]]:
-        """Get all measurements for a specific client"""
+    async def get_measurements_by_client(
+        self,
+        client_id: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a client's measurements, newest first
+        
+        Args:
+            client_id: ID of the client
+            start_date: Only measurements from this date on
+            end_date: Only measurements before this date
+        """
         try:
-            measurements = []
-            docs = self.db.collection(self.collection)\
-                .where('clientId', '==', client_id)\
-                .order_by('date', direction='DESCENDING')\
-                .stream()
-            
-            for doc in docs:
-                measurement_data = doc.to_dict()
-                measurement_data['id'] = doc.id
-                measurements.append(measurement_data)
-            
-            return measurements
+            if self.bucketed:
+                measurements = await self.buckets.query(client_id, start_date, end_date)
+            else:
+                filters = [('clientId', '==', client_id)]
+                if start_date is not None:
+                    filters.append(('date', '>=', start_date))
+                if end_date is not None:
+                    filters.append(('date', '<', end_date))
+                measurements = await self.repo.query(
+                    self.collection,
+                    filters=filters,
+                    order_by='date',
+                    descending=True
+                )
+            return [self.with_photo_urls(m) for m in measurements]
             
         except Exception as e:
             print(f"Error getting measurements: {e}")
             return []
     
-    async def get_latest_measurement(self, client_id: str) -> Optional[Dict[str, Any]]:
-        """Get the most recent measurement for a client"""
-        measurements = await self.get_measurements_by_client(client_id)
-        return measurements[0] if measurements else None
+    async def get_measurements_page(
+        self,
+        client_id: str,
+        page_size: int = 20,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a client's measurements, newest first
+        
+        Returns:
+            items and nextCursor (pass it back for the next page, None at the end)
+        """
+        try:
+            if self.bucketed:
+                items, next_cursor = await self.buckets.query_page(client_id, page_size, cursor)
+            else:
+                items, next_cursor = await self.repo.query_page(
+                    self.collection,
+                    filters=[('clientId', '==', client_id)],
+                    order_by='date',
+                    descending=True,
+                    page_size=page_size,
+                    cursor=cursor
+                )
+            return {'items': [self.with_photo_urls(m) for m in items], 'nextCursor': next_cursor}
+            
+        except Exception as e:
+            print(f"Error getting measurements: {e}")
+            return {'items': [], 'nextCursor': None}
+    
+    async def iter_measurements(
+        self,
+        client_id: str,
+        page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a client's measurements, newest first, one page in memory at a time"""
+        if self.bucketed:
+            async for measurement in self.buckets.iter_rows(client_id):
+                yield self.with_photo_urls(measurement)
+            return
+        
+        async for measurement in self.repo.stream(
+            self.collection,
+            filters=[('clientId', '==', client_id)],
+            order_by='date',
+            descending=True,
+            page_size=page_size
+        ):
+            yield self.with_photo_urls(measurement)
+    
+    async def get_latest_measurement(
+        self,
+        client_id: str,
+        client: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the most recent measurement for a client
+        
+        Args:
+            client_id: ID of the client
+            client: Client record already in hand; its latestMeasurement
+                summary is returned without any read
+        
+        Returns:
+            The measurement (or its summary), None if there is none
+        """
+        if client and client.get('latestMeasurement'):
+            return client['latestMeasurement']
+        
+        try:
+            if self.bucketed:
+                measurements = await self.buckets.query(client_id, limit=1)
+            else:
+                measurements = await self.repo.query(
+                    self.collection,
+                    filters=[('clientId', '==', client_id)],
+                    order_by='date',
+                    descending=True,
+                    limit=1
+                )
+            return self.with_photo_urls(measurements[0]) if measurements else None
+            
+        except Exception as e:
+            print(f"Error getting latest measurement: {e}")
+            return None
+    
+    async def watch_latest_measurement(
+        self,
+        client_id: str,
+        on_change: Callable[[Dict[str, Any]], Any]
+    ) -> Callable[[], None]:
+        """
+        Keep a client's latest measurement live
+        
+        Listens to a limit-1 query (the newest measurement, or the newest
+        bucket in the bucketed layout), so each new measurement costs one
+        document read. on_change(measurement) is only called with a
+        measurement, never None.
+        
+        Returns:
+            Function that stops watching
+        """
+        last: Dict[str, Any] = {}
+        
+        def deliver(changes, documents):
+            if not documents:
+                return None
+            if self.bucketed:
+                rows = bucket_rows(documents[0])
+                if not rows:
+                    return None
+                measurement = rows[-1]
+            else:
+                measurement = documents[0]
+            if last.get('id') == measurement['id'] and last.get('value') == measurement:
+                return None
+            last.update(id=measurement['id'], value=measurement)
+            return on_change(self.with_photo_urls(measurement))
+        
+        if self.bucketed:
+            collection, order_by = self.buckets.collection, 'start'
+        else:
+            collection, order_by = self.collection, 'date'
+        return await self.hub.subscribe_query(
+            self.repo,
+            collection,
+            [('clientId', '==', client_id)],
+            deliver,
+            order_by=order_by,
+            descending=True,
+            limit=1
+        )
+    
+    async def refresh_latest_summary(self, client_id: str) -> Optional[Dict[str, Any]]:
+        """Recompute a client's latestMeasurement summary (e.g. after a bulk import)"""
+        latest = await self.get_latest_measurement(client_id)
+        if latest is None:
+            return None
+        
+        summary = self.summarize(latest)
+        
+        def write(tx):
+            if tx.get(self.clients_collection, client_id) is not None:
+                tx.update(self.clients_collection, client_id, {'latestMeasurement': summary})
+        
+        await self.repo.run_transaction(write)
+        client_service.invalidate_client(client_id)
+        return summary
+    
+    def summarize(self, measurement: Dict[str, Any]) -> Dict[str, Any]:
+        """Compact summary of a measurement stored on the client record"""
+        return {
+            key: measurement.get(key)
+            for key in ('id', 'date', 'weight', 'height', 'bmi', 'waist', 'hip', 'bodyFat', 'muscleMass')
+        }
+    
+    async def get_progress_analytics(
+        self,
+        client_id: str,
+        goal_weight: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Progress analytics for a client's full history
+        
+        Rolling averages, weekly averages, trend and projected goal date,
+        waist-to-hip ratio and rate of change (see services.analytics).
+        """
+        try:
+            # NumPy is only loaded by the screens that need it
+            from services.analytics import MeasurementSeries
+            
+            if self.bucketed:
+                # Bucket columns feed the arrays directly, no per-record dicts
+                series = MeasurementSeries.from_columns(await self.buckets.columns(client_id))
+            else:
+                measurements = await self.repo.query(
+                    self.collection,
+                    filters=[('clientId', '==', client_id)],
+                    order_by='date'
+                )
+                series = MeasurementSeries.from_measurements(measurements)
+            return series.summary(goal_weight)
+            
+        except Exception as e:
+            print(f"Error getting progress analytics: {e}")
+            return {}
     
     def get_measurement_stats(self, measurements: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Calculate statistics from measurements"""
@@ -0,0 +1,334 @@
+"""
+Metrics
+In-process counters and latency histograms, served in Prometheus text format
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from services.tracing import tracer
+
+# Screen the current call originates from (set by @track_screen)
+current_screen: ContextVar[str] = ContextVar('current_screen', default='background')
+
+# Latency buckets in seconds: local backends answer in microseconds,
+# Firestore in tens of milliseconds, photo uploads in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Collector output: (name, type, help, [(labels, value)])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def total(self, **labels: str) -> float:
+        """Sum of the series matching the given labels (others summed over)"""
+        positions = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            return sum(
+                value for key, value in self._values.items()
+                if all(key[index] == wanted for index, wanted in positions)
+            )
+
+    def expose(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # key -> [count per bucket (not cumulative)..., sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * len(self.buckets) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            return int(sum(series[:-1])) if series else 0
+
+    def expose(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = 'le="' + _number(bound) + '"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {int(cumulative)}')
+                lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(series[-1])}')
+                lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {int(cumulative)}')
+        return lines
+
+
+class Metrics:
+    """
+    The app's metrics
+
+    Everything is labelled with the screen the work was triggered from,
+    so read quota and latency can be traced back to a page of the UI.
+    Datastore document counts are what Firestore bills: a query costs
+    one read per document returned (at least one), a listener one read
+    per document added or modified.
+    """
+
+    def __init__(self):
+        self.service_latency = Histogram(
+            'nutri_service_latency_seconds', 'Latency of service method calls',
+            ('service', 'method', 'screen')
+        )
+        self.service_errors = Counter(
+            'nutri_service_errors_total', 'Service calls that raised or returned success=False',
+            ('service', 'method', 'screen')
+        )
+        self.datastore_latency = Histogram(
+            'nutri_datastore_latency_seconds', 'Latency of repository operations',
+            ('operation', 'collection', 'screen')
+        )
+        self.datastore_documents = Counter(
+            'nutri_datastore_documents_total', 'Documents read, written or deleted',
+            ('kind', 'collection', 'screen')
+        )
+        self.datastore_errors = Counter(
+            'nutri_datastore_errors_total', 'Repository operations that raised',
+            ('operation', 'collection', 'screen')
+        )
+        self.storage_bytes = Counter(
+            'nutri_storage_uploaded_bytes_total', 'Bytes uploaded to blob storage',
+            ('backend', 'screen')
+        )
+        self.storage_uploads = Counter(
+            'nutri_storage_uploads_total', 'Blobs uploaded to blob storage',
+            ('backend', 'screen')
+        )
+        self._families = [
+            self.service_latency, self.service_errors,
+            self.datastore_latency, self.datastore_documents, self.datastore_errors,
+            self.storage_bytes, self.storage_uploads,
+        ]
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._server = None
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Add a callable producing metric families at scrape time (gauges, cache stats)"""
+        self._collectors.append(collector)
+
+    def documents(self, kind: str, collection: str, count: int = 1):
+        """Count documents read/written/deleted for the current screen"""
+        if count:
+            self.datastore_documents.inc(count, kind=kind, collection=collection, screen=current_screen.get())
+
+    def uploaded(self, backend: str, size: int):
+        """Count a blob upload for the current screen"""
+        screen = current_screen.get()
+        self.storage_uploads.inc(backend=backend, screen=screen)
+        self.storage_bytes.inc(size, backend=backend, screen=screen)
+
+    def expose(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        lines: List[str] = []
+        for family in self._families:
+            lines.extend(family.expose())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, metric_type, help, samples in families:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(list(labels), list(labels.values()))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def start_server(self, port: Optional[int] = None, host: Optional[str] = None) -> Optional[int]:
+        """
+        Serve /metrics from a daemon thread (METRICS_PORT, 0 disables)
+
+        Binds to METRICS_HOST (loopback by default): the endpoint is for a
+        scraper running next to the app, not for the public port.
+
+        Returns:
+            The port listened on, or None when disabled
+        """
+        port = port if port is not None else int(os.getenv('METRICS_PORT', '9464'))
+        host = host or os.getenv('METRICS_HOST', '127.0.0.1')
+        if not port or self._server is not None:
+            return None
+
+        # Imported here: the UI imports this module on the login screen's path
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.expose().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would flood the app log
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True).start()
+        return self._server.server_address[1]
+
+
+def _failed(result: Any) -> bool:
+    return isinstance(result, dict) and result.get('success') is False
+
+
+def instrumented(service: str):
+    """
+    Class decorator timing every public coroutine method of a service
+
+    Calls are recorded in nutri_service_latency_seconds; calls raising or
+    returning {'success': False} also count as errors. Inside a sampled
+    trace each call is also a span.
+    """
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if name.startswith('_') or not inspect.iscoroutinefunction(method):
+                continue
+            setattr(cls, name, _timed(service, name, method))
+        return cls
+    return decorate
+
+
+def _timed(service: str, name: str, method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        screen = current_screen.get()
+        started = time.perf_counter()
+        failed = True
+        try:
+            with tracer.span(f'{service}.{name}') as span:
+                result = await method(*args, **kwargs)
+                failed = _failed(result)
+                if failed:
+                    span.set('success', False)
+            return result
+        finally:
+            metrics.service_latency.observe(
+                time.perf_counter() - started, service=service, method=name, screen=screen
+            )
+            if failed:
+                metrics.service_errors.inc(service=service, method=name, screen=screen)
+    return wrapper
+
+
+def track_screen(screen: str):
+    """
+    Class decorator labelling everything a UI screen triggers with its name
+
+    Wraps the screen's methods (event handlers included) so services and
+    datastore calls made from them, and tasks they start, see the screen
+    in current_screen. A method entered outside any trace (called by Flet:
+    a handler, a task, a realtime callback) also starts a trace.
+    """
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if name.startswith('__') or not inspect.isfunction(method):
+                continue
+            setattr(cls, name, _on_screen(screen, method))
+        return cls
+    return decorate
+
+
+def _on_screen(screen: str, method):
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(*args, **kwargs):
+            token = current_screen.set(screen)
+            try:
+                with tracer.root_span(f'{screen}.{method.__name__}', screen=screen):
+                    return await method(*args, **kwargs)
+            finally:
+                current_screen.reset(token)
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        token = current_screen.set(screen)
+        try:
+            with tracer.root_span(f'{screen}.{method.__name__}', screen=screen):
+                return method(*args, **kwargs)
+        finally:
+            current_screen.reset(token)
+    return wrapper
+
+
+# Global metrics instance
+metrics = Metrics()
@@ -0,0 +1,125 @@
+"""
+Photo Pipeline
+Renders measurement photo variants in a process pool
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Dict, List, Optional, Tuple, Union
+from services.io_executor import io_executor
+from utils.images import Variant, render_variants
+
+# A photo as received: in-memory bytes, a binary file object or async chunks
+PhotoSource = Union[bytes, BinaryIO, AsyncIterator[bytes]]
+
+SPOOL_CHUNK_SIZE = 256 * 1024
+
+
+class PhotoPipeline:
+    """
+    CPU-bound photo processing off the event loop
+
+    PHOTO_POOL=process (default) uses worker processes started with
+    'spawn' (forking a process that holds gRPC channels is unsafe);
+    PHOTO_POOL=thread trades parallelism headroom for memory on small
+    instances - Pillow releases the GIL while decoding, resizing and
+    encoding, so threads still run in parallel.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_dimension: Optional[int] = None,
+        quality: Optional[int] = None,
+        pool: Optional[str] = None
+    ):
+        self.max_workers = max_workers or int(os.getenv('PHOTO_WORKERS', '2'))
+        self.max_dimension = max_dimension or int(os.getenv('PHOTO_MAX_DIMENSION', '1600'))
+        self.quality = quality or int(os.getenv('PHOTO_JPEG_QUALITY', '82'))
+        self.pool = (pool or os.getenv('PHOTO_POOL', 'process')).lower()
+        # Scratch space for spooled uploads and rendered variants (system
+        # temp dir by default; on Cloud Run /tmp is memory-backed)
+        self.spool_dir = os.getenv('PHOTO_SPOOL_DIR') or None
+        self._executor: Optional[Executor] = None
+
+        # The original is kept as JPEG only; list and comparison views
+        # use the smaller variants, WebP where the client supports it
+        self.variants: List[Variant] = [
+            ('original', self.max_dimension, ('jpeg',)),
+            ('medium', int(os.getenv('PHOTO_MEDIUM_DIMENSION', '800')), ('jpeg', 'webp')),
+            ('thumb', int(os.getenv('PHOTO_THUMB_DIMENSION', '256')), ('jpeg', 'webp')),
+        ]
+
+    @property
+    def executor(self) -> Executor:
+        """Get the worker pool, creating it on first use"""
+        if self._executor is None:
+            if self.pool == 'thread':
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='nutri-photo'
+                )
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+        return self._executor
+
+    async def spool(self, source: PhotoSource, directory: str) -> Tuple[str, str]:
+        """
+        Write an incoming photo to disk, hashing it on the way
+
+        At most SPOOL_CHUNK_SIZE bytes of a file object or chunk iterator
+        are held in memory at a time.
+
+        Returns:
+            (spooled file path, SHA-256 hex digest)
+        """
+        path = os.path.join(directory, 'source')
+        digest = hashlib.sha256()
+        with open(path, 'wb') as spooled:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                digest.update(source)
+                await io_executor.run(spooled.write, source)
+            elif hasattr(source, 'read'):
+                while True:
+                    chunk = await io_executor.run(source.read, SPOOL_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    await io_executor.run(spooled.write, chunk)
+            else:
+                async for chunk in source:
+                    digest.update(chunk)
+                    await io_executor.run(spooled.write, chunk)
+        return path, digest.hexdigest()
+
+    async def render(self, source_path: str, output_dir: str) -> Dict[str, Dict[str, str]]:
+        """
+        Orient, strip metadata and render every variant of one photo
+
+        Returns:
+            {variant name: {format: rendered file path}}
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            render_variants,
+            source_path,
+            self.variants,
+            self.quality,
+            output_dir
+        )
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pool (used on application shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# Global photo pipeline instance
+photo_pipeline = PhotoPipeline()
@@ -0,0 +1,203 @@
+"""
+Realtime Hub
+Shares datastore listeners between every session watching the same data
+"""
+import asyncio
+import contextvars
+import inspect
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+from services.io_executor import io_executor
+from services.metrics import Family, metrics
+from services.repository import Change, Filter, Repository
+
+# Subscriber callback: (changes, current documents) - documents are shared
+# between subscribers and must be treated as read-only
+Subscriber = Callable[[List[Change], List[Dict[str, Any]]], Any]
+
+
+class _Channel:
+    """One datastore listener and the sessions subscribed to it"""
+
+    def __init__(self):
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.subscribers: Dict[int, Tuple[asyncio.AbstractEventLoop, Subscriber]] = {}
+        self.loaded = False
+        self.closed = False
+        self.stop: Optional[Callable[[], None]] = None
+
+
+class RealtimeHub:
+    """
+    Reference-counted fan-out of snapshot listeners
+
+    The first subscriber to a query opens its listener; later subscribers
+    (other sessions of the same nutritionist, say) get the documents the
+    hub already holds and share the incremental changes. The listener is
+    closed when the last subscriber leaves. Callbacks run on the event
+    loop of the subscriber and may be coroutine functions.
+    """
+
+    def __init__(self):
+        self._channels: Dict[Hashable, _Channel] = {}
+        self._lock = threading.Lock()
+        self._next_token = 0
+
+    async def subscribe_query(
+        self,
+        repo: Repository,
+        collection: str,
+        filters: Sequence[Filter],
+        callback: Subscriber,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
+    ) -> Callable[[], None]:
+        """Subscribe to a query; returns the unsubscribe function"""
+        key = (id(repo), collection, tuple(filters), order_by, descending, limit)
+        return await self._subscribe(
+            key,
+            lambda emit: repo.watch(collection, filters, emit, order_by, descending, limit),
+            callback
+        )
+
+    async def subscribe_document(
+        self,
+        repo: Repository,
+        collection: str,
+        doc_id: str,
+        callback: Subscriber
+    ) -> Callable[[], None]:
+        """Subscribe to one document; returns the unsubscribe function"""
+        key = (id(repo), collection, doc_id)
+        return await self._subscribe(
+            key, lambda emit: repo.watch_document(collection, doc_id, emit), callback
+        )
+
+    async def _subscribe(
+        self,
+        key: Hashable,
+        start: Callable[[Callable[[List[Change]], None]], Callable[[], None]],
+        callback: Subscriber
+    ) -> Callable[[], None]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            channel = self._channels.get(key)
+            opening = channel is None
+            if opening:
+                channel = self._channels[key] = _Channel()
+            self._next_token += 1
+            token = self._next_token
+            channel.subscribers[token] = (loop, callback)
+            if channel.loaded:
+                # Late joiner: replay the current state, queued before any
+                # change another thread could broadcast after this lock
+                documents = list(channel.documents.values())
+                loop.call_soon_threadsafe(
+                    self._deliver, channel, token, [('added', doc) for doc in documents], documents,
+                    context=contextvars.Context()
+                )
+
+        def unsubscribe():
+            self._unsubscribe(key, channel, token)
+
+        if opening:
+            try:
+                stop = await io_executor.run(start, lambda changes: self._on_changes(channel, changes))
+            except Exception:
+                unsubscribe()
+                raise
+            with self._lock:
+                channel.stop = stop
+                closed = channel.closed
+            if closed:
+                # Everyone left while the listener was starting
+                self._close(stop)
+
+        return unsubscribe
+
+    def _unsubscribe(self, key: Hashable, channel: _Channel, token: int):
+        with self._lock:
+            channel.subscribers.pop(token, None)
+            if channel.subscribers or channel.closed:
+                return
+            channel.closed = True
+            if self._channels.get(key) is channel:
+                del self._channels[key]
+            stop = channel.stop
+        if stop is not None:
+            self._close(stop)
+
+    @staticmethod
+    def _close(stop: Callable[[], None]):
+        # Closing a Firestore listener blocks briefly; callers may be sync UI handlers
+        io_executor.executor.submit(stop)
+
+    def _on_changes(self, channel: _Channel, changes: List[Change]):
+        """Listener callback (any thread): apply changes and fan them out"""
+        with self._lock:
+            if channel.closed:
+                return
+            for change_type, doc in changes:
+                if change_type == 'removed':
+                    channel.documents.pop(doc['id'], None)
+                else:
+                    channel.documents[doc['id']] = doc
+            channel.loaded = True
+            documents = list(channel.documents.values())
+            for token, (loop, _) in channel.subscribers.items():
+                try:
+                    # Fresh context: the change may come from another session's
+                    # write, whose screen label and trace must not leak into this one
+                    loop.call_soon_threadsafe(
+                        self._deliver, channel, token, changes, documents,
+                        context=contextvars.Context()
+                    )
+                except RuntimeError:
+                    # The subscriber's loop is closed (session gone)
+                    pass
+
+    def _deliver(
+        self,
+        channel: _Channel,
+        token: int,
+        changes: List[Change],
+        documents: List[Dict[str, Any]]
+    ):
+        with self._lock:
+            subscriber = channel.subscribers.get(token)
+        if subscriber is None:
+            # Unsubscribed after this delivery was queued
+            return
+        try:
+            result = subscriber[1](changes, documents)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(RealtimeHub._await(result))
+        except Exception as e:
+            print(f"Error in realtime subscriber: {e}")
+
+    @staticmethod
+    async def _await(result):
+        try:
+            await result
+        except Exception as e:
+            print(f"Error in realtime subscriber: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Open listeners and subscribers"""
+        with self._lock:
+            return {
+                'listeners': len(self._channels),
+                'subscribers': sum(len(c.subscribers) for c in self._channels.values()),
+            }
+
+
+def _realtime_metrics() -> Iterator[Family]:
+    stats = realtime_hub.stats()
+    yield 'nutri_realtime_listeners', 'gauge', 'Open datastore listeners', [({}, stats['listeners'])]
+    yield 'nutri_realtime_subscribers', 'gauge', 'Sessions subscribed to listeners', [({}, stats['subscribers'])]
+
+
+# Global realtime hub instance
+realtime_hub = RealtimeHub()
+metrics.register_collector(_realtime_metrics)
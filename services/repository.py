@@ -0,0 +1,377 @@
+"""
+Repository Backends
+Storage-agnostic document access shared by every service
+"""
+import os
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from services.firebase_config import firebase
+from services.io_executor import io_executor
+from services.metrics import current_screen, metrics
+from services.repository_base import (  # noqa: F401 - re-exported for the services
+    Change, DocumentNotFound, Filter, Repository, T, Transaction, Write,
+    apply_increments, decode_cursor, dumps, encode_cursor, loads, nest, sort_key, to_datetime
+)
+from services.tracing import tracer
+
+
+class _FirestoreTransaction(Transaction):
+    """Transaction adapter over google.cloud.firestore.Transaction"""
+
+    def __init__(self, db, transaction):
+        self.db = db
+        self.transaction = transaction
+
+    def _ref(self, collection: str, doc_id: str):
+        return self.db.collection(collection).document(doc_id)
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = self._ref(collection, doc_id).get(transaction=self.transaction)
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        data['id'] = doc.id
+        return data
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        self.transaction.set(self._ref(collection, doc_id), data, merge=merge)
+
+    def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        self.transaction.update(self._ref(collection, doc_id), updates)
+
+    def delete(self, collection: str, doc_id: str):
+        self.transaction.delete(self._ref(collection, doc_id))
+
+    def increment(self, collection: str, doc_id: str, deltas: Dict[str, float]):
+        from firebase_admin import firestore
+        self.transaction.set(
+            self._ref(collection, doc_id),
+            nest({path: firestore.Increment(delta) for path, delta in deltas.items()}),
+            merge=True
+        )
+
+
+class FirestoreRepository(Repository):
+    """Repository backed by Cloud Firestore"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def new_id(self, collection: str) -> str:
+        return self.db.collection(collection).document().id
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        doc_ref = self.db.collection(collection).document(doc_id)
+        await io_executor.run(doc_ref.set, data, merge=merge)
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = await io_executor.run(self.db.collection(collection).document(doc_id).get)
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        data['id'] = doc.id
+        return data
+
+    async def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        doc_ref = self.db.collection(collection).document(doc_id)
+        await io_executor.run(doc_ref.update, updates)
+
+    async def delete(self, collection: str, doc_id: str):
+        await io_executor.run(self.db.collection(collection).document(doc_id).delete)
+
+    def _build_query(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[Any, str]] = None
+    ):
+        """Translate repository arguments into a Firestore query"""
+        query = self.db.collection(collection)
+        direction = 'DESCENDING' if descending else 'ASCENDING'
+        for field, op, value in filters:
+            query = query.where(field, op, to_datetime(value))
+        if order_by:
+            query = query.order_by(order_by, direction=direction)
+        if start_after is not None:
+            # Explicit document-name tie-breaker so the cursor is unambiguous
+            value, doc_id = start_after
+            query = query.order_by('__name__', direction=direction)
+            position = {'__name__': self.db.collection(collection).document(doc_id)}
+            if order_by:
+                position[order_by] = to_datetime(value)
+            query = query.start_after(position)
+        if limit:
+            query = query.limit(limit)
+        return query
+
+    async def query(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[Any, str]] = None
+    ) -> List[Dict[str, Any]]:
+        query = self._build_query(collection, filters, order_by, descending, limit, start_after)
+        docs = await io_executor.run(lambda: list(query.stream()))
+
+        results = []
+        for doc in docs:
+            data = doc.to_dict()
+            data['id'] = doc.id
+            results.append(data)
+        return results
+
+    def watch(
+        self,
+        collection: str,
+        filters: Sequence[Filter],
+        on_changes: Callable[[List[Change]], None],
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
+    ) -> Callable[[], None]:
+        # Snapshot listener: one long-lived stream, billed per changed document
+        def on_snapshot(docs, changes, read_time):
+            batch = []
+            for change in changes:
+                data = change.document.to_dict()
+                data['id'] = change.document.id
+                batch.append((change.type.name.lower(), data))
+            on_changes(batch)
+
+        query = self._build_query(collection, filters, order_by, descending, limit)
+        return query.on_snapshot(on_snapshot).unsubscribe
+
+    def watch_document(
+        self,
+        collection: str,
+        doc_id: str,
+        on_changes: Callable[[List[Change]], None]
+    ) -> Callable[[], None]:
+        state = {'exists': False}
+
+        def on_snapshot(docs, changes, read_time):
+            batch = []
+            for doc in docs:
+                if doc.exists:
+                    data = doc.to_dict()
+                    data['id'] = doc.id
+                    batch.append(('modified' if state['exists'] else 'added', data))
+                elif state['exists']:
+                    batch.append(('removed', {'id': doc.id}))
+                state['exists'] = doc.exists
+            on_changes(batch)
+
+        ref = self.db.collection(collection).document(doc_id)
+        return ref.on_snapshot(on_snapshot).unsubscribe
+
+    async def count(self, collection: str, filters: Sequence[Filter] = ()) -> int:
+        # Server-side count aggregation: billed per 1000 index entries, no documents sent
+        query = self._build_query(collection, filters).count()
+        results = await io_executor.run(query.get)
+        return int(results[0][0].value)
+
+    async def run_transaction(self, func: Callable[[Transaction], T]) -> T:
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def body(transaction):
+            return func(_FirestoreTransaction(self.db, transaction))
+
+        return await io_executor.run(lambda: body(self.db.transaction()))
+
+    async def write_batch(self, writes: Sequence[Write]):
+        # Firestore caps a batch at 500 writes
+        from firebase_admin import firestore
+
+        batch = self.db.batch()
+        for operation, collection, doc_id, data in writes:
+            ref = self.db.collection(collection).document(doc_id)
+            if operation == 'set':
+                batch.set(ref, data)
+            elif operation == 'update':
+                batch.update(ref, data)
+            elif operation == 'delete':
+                batch.delete(ref)
+            elif operation == 'increment':
+                batch.set(
+                    ref,
+                    nest({path: firestore.Increment(delta) for path, delta in data.items()}),
+                    merge=True
+                )
+            else:
+                raise ValueError(f"Unsupported write: {operation}")
+        await io_executor.run(batch.commit)
+
+
+class _CountingTransaction(Transaction):
+    """Transaction proxy counting the documents it reads and writes"""
+
+    def __init__(self, transaction: Transaction):
+        self.transaction = transaction
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        metrics.documents('read', collection)
+        return self.transaction.get(collection, doc_id)
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        metrics.documents('write', collection)
+        self.transaction.set(collection, doc_id, data, merge)
+
+    def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        metrics.documents('write', collection)
+        self.transaction.update(collection, doc_id, updates)
+
+    def delete(self, collection: str, doc_id: str):
+        metrics.documents('delete', collection)
+        self.transaction.delete(collection, doc_id)
+
+    def increment(self, collection: str, doc_id: str, deltas: Dict[str, float]):
+        metrics.documents('write', collection)
+        self.transaction.increment(collection, doc_id, deltas)
+
+
+class InstrumentedRepository(Repository):
+    """
+    Repository wrapper recording latency and document counts in services.metrics
+
+    Wraps whichever backend DATA_BACKEND selects, so the local backends
+    report the reads and writes the same calls would cost on Firestore.
+    Backend-specific attributes are passed through.
+    """
+
+    def __init__(self, inner: Repository):
+        self.inner = inner
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    async def _timed(self, operation: str, collection: str, call) -> Any:
+        screen = current_screen.get()
+        started = perf_counter()
+        try:
+            with tracer.span(f'datastore.{operation}', collection=collection):
+                return await call
+        except Exception:
+            metrics.datastore_errors.inc(operation=operation, collection=collection, screen=screen)
+            raise
+        finally:
+            metrics.datastore_latency.observe(
+                perf_counter() - started, operation=operation, collection=collection, screen=screen
+            )
+
+    def new_id(self, collection: str) -> str:
+        return self.inner.new_id(collection)
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        await self._timed('set', collection, self.inner.set(collection, doc_id, data, merge))
+        metrics.documents('write', collection)
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self._timed('get', collection, self.inner.get(collection, doc_id))
+        # A missing document is billed as a read too
+        metrics.documents('read', collection)
+        return doc
+
+    async def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        await self._timed('update', collection, self.inner.update(collection, doc_id, updates))
+        metrics.documents('write', collection)
+
+    async def delete(self, collection: str, doc_id: str):
+        await self._timed('delete', collection, self.inner.delete(collection, doc_id))
+        metrics.documents('delete', collection)
+
+    async def query(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[Any, str]] = None
+    ) -> List[Dict[str, Any]]:
+        docs = await self._timed('query', collection, self.inner.query(
+            collection, filters, order_by, descending, limit, start_after
+        ))
+        # An empty result still costs one read
+        metrics.documents('read', collection, max(1, len(docs)))
+        return docs
+
+    async def count(self, collection: str, filters: Sequence[Filter] = ()) -> int:
+        total = await self._timed('count', collection, self.inner.count(collection, filters))
+        # Aggregations cost one read per 1000 index entries
+        metrics.documents('read', collection, max(1, -(-total // 1000)))
+        return total
+
+    async def run_transaction(self, func: Callable[[Transaction], T]) -> T:
+        return await self._timed(
+            'transaction', '*', self.inner.run_transaction(lambda tx: func(_CountingTransaction(tx)))
+        )
+
+    async def write_batch(self, writes: Sequence[Write]):
+        await self._timed('batch', '*', self.inner.write_batch(writes))
+        for operation, collection, _, _ in writes:
+            metrics.documents('delete' if operation == 'delete' else 'write', collection)
+
+    def _counted(self, collection: str, on_changes: Callable[[List[Change]], None]):
+        # Listener callbacks run on SDK threads: bill them to the screen
+        # that opened the listener
+        screen = current_screen.get()
+
+        def counted(changes: List[Change]):
+            reads = sum(1 for change_type, _ in changes if change_type != 'removed')
+            if reads:
+                metrics.datastore_documents.inc(reads, kind='read', collection=collection, screen=screen)
+            on_changes(changes)
+        return counted
+
+    def watch(
+        self,
+        collection: str,
+        filters: Sequence[Filter],
+        on_changes: Callable[[List[Change]], None],
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
+    ) -> Callable[[], None]:
+        return self.inner.watch(
+            collection, filters, self._counted(collection, on_changes), order_by, descending, limit
+        )
+
+    def watch_document(
+        self,
+        collection: str,
+        doc_id: str,
+        on_changes: Callable[[List[Change]], None]
+    ) -> Callable[[], None]:
+        return self.inner.watch_document(collection, doc_id, self._counted(collection, on_changes))
+
+
+def create_repository() -> Repository:
+    """
+    Create the repository selected by DATA_BACKEND
+
+    firestore (default with Firebase configured), memory (default in
+    DEMO MODE) or sqlite (file given by SQLITE_PATH), instrumented for
+    metrics.
+    """
+    backend = os.getenv('DATA_BACKEND', '').lower()
+    if not backend:
+        backend = 'memory' if firebase.demo_mode else 'firestore'
+
+    if backend == 'firestore':
+        return InstrumentedRepository(FirestoreRepository(firebase.db))
+
+    from services.local_repository import MemoryRepository, SQLiteRepository
+    if backend == 'sqlite':
+        return InstrumentedRepository(SQLiteRepository(os.getenv('SQLITE_PATH', 'nutri_agenda.db')))
+    return InstrumentedRepository(MemoryRepository())
+
+
+# Global repository instance
+repository = create_repository()
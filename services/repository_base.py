@@ -0,0 +1,318 @@
+"""
+Repository Interface
+Document model, transactions and the backend base class, with no backend attached
+
+Backends (services.repository, services.local_repository) build on this
+module; importing it never configures or connects to a datastore.
+"""
+import base64
+import json
+from datetime import date, datetime, time, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+# (field, operator, value) - operators: ==, <, <=, >, >=
+Filter = Tuple[str, str, Any]
+
+# (operation, collection, document ID, data) - operations: set, update, delete, increment
+Write = Tuple[str, str, str, Optional[Dict[str, Any]]]
+
+# (change type, document) delivered to listeners - types: added, modified, removed
+Change = Tuple[str, Dict[str, Any]]
+
+T = TypeVar('T')
+
+
+class DocumentNotFound(Exception):
+    """Raised when updating a document that does not exist"""
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _json_object_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if '$dt' in obj:
+            return datetime.fromisoformat(obj['$dt'])
+        if '$date' in obj:
+            return date.fromisoformat(obj['$date'])
+    return obj
+
+
+def dumps(data: Any) -> str:
+    """Serialize document data, keeping datetimes round-trippable"""
+    return json.dumps(data, default=_json_default, ensure_ascii=False)
+
+
+def loads(text: str) -> Any:
+    """Inverse of dumps"""
+    return json.loads(text, object_hook=_json_object_hook)
+
+
+def encode_cursor(doc: Dict[str, Any], order_by: Optional[str]) -> str:
+    """Opaque continuation token pointing just after doc"""
+    position = [doc.get(order_by) if order_by else None, doc['id']]
+    return base64.urlsafe_b64encode(dumps(position).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token: str) -> Tuple[Any, str]:
+    """Inverse of encode_cursor: (order field value, document ID)"""
+    try:
+        value, doc_id = loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError('Invalid pagination cursor')
+    return value, doc_id
+
+
+class Transaction:
+    """
+    Atomic unit of work handed to Repository.run_transaction
+
+    All reads must happen before the first write, as Firestore requires.
+    Increment deltas use dotted paths for nested counters,
+    e.g. {'appointments.scheduled': 1}.
+    """
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        raise NotImplementedError
+
+    def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        raise NotImplementedError
+
+    def delete(self, collection: str, doc_id: str):
+        raise NotImplementedError
+
+    def increment(self, collection: str, doc_id: str, deltas: Dict[str, float]):
+        """Atomically add deltas to numeric fields, creating the document if needed"""
+        raise NotImplementedError
+
+
+def nest(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn dotted keys into nested dicts: {'a.b': 1} -> {'a': {'b': 1}}"""
+    nested: Dict[str, Any] = {}
+    for path, value in flat.items():
+        target = nested
+        *parents, leaf = path.split('.')
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[leaf] = value
+    return nested
+
+
+def apply_increments(doc: Dict[str, Any], deltas: Dict[str, float]):
+    """Apply dotted-path increments to a document in place"""
+    for path, delta in deltas.items():
+        target = doc
+        *parents, leaf = path.split('.')
+        for key in parents:
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            target = target[key]
+        target[leaf] = (target.get(leaf) or 0) + delta
+
+
+class Repository:
+    """
+    Base interface for document storage backends
+
+    Documents are plain dicts; every document returned by a backend
+    carries its ID under the 'id' key, like the services always did.
+    """
+
+    def new_id(self, collection: str) -> str:
+        """Generate a new document ID for a collection"""
+        raise NotImplementedError
+
+    async def add(self, collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a new document under a generated ID and return it"""
+        data['id'] = self.new_id(collection)
+        await self.set(collection, data['id'], data)
+        return data
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        """Create or overwrite a document"""
+        raise NotImplementedError
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get a document by ID, or None if it does not exist"""
+        raise NotImplementedError
+
+    async def update(self, collection: str, doc_id: str, updates: Dict[str, Any]):
+        """Update fields of an existing document"""
+        raise NotImplementedError
+
+    async def delete(self, collection: str, doc_id: str):
+        """Delete a document (no-op if it does not exist)"""
+        raise NotImplementedError
+
+    async def query(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        start_after: Optional[Tuple[Any, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a filtered, optionally ordered and limited query
+
+        Results are ordered by (order_by, id), or by id alone when
+        order_by is None.
+
+        Args:
+            collection: Collection name
+            filters: Equality and range filters, all combined with AND
+            order_by: Field to order by
+            descending: Order direction
+            limit: Maximum number of documents to return
+            start_after: (order_by value, id) position to resume after
+
+        Returns:
+            Matching documents
+        """
+        raise NotImplementedError
+
+    async def query_page(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        page_size: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Fetch one page of a query
+
+        Returns:
+            (documents, cursor for the next page or None on the last page)
+        """
+        start_after = decode_cursor(cursor) if cursor else None
+        # One extra document tells whether another page exists
+        docs = await self.query(
+            collection,
+            filters,
+            order_by,
+            descending,
+            limit=page_size + 1,
+            start_after=start_after
+        )
+        if len(docs) <= page_size:
+            return docs, None
+        docs = docs[:page_size]
+        return docs, encode_cursor(docs[-1], order_by)
+
+    async def stream(
+        self,
+        collection: str,
+        filters: Sequence[Filter] = (),
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over every matching document, one page in memory at a time"""
+        cursor = None
+        while True:
+            docs, cursor = await self.query_page(
+                collection, filters, order_by, descending, page_size, cursor
+            )
+            for doc in docs:
+                yield doc
+            if not cursor:
+                return
+
+    async def count(self, collection: str, filters: Sequence[Filter] = ()) -> int:
+        """Count matching documents without transferring them"""
+        raise NotImplementedError
+
+    async def run_transaction(self, func: Callable[[Transaction], T]) -> T:
+        """
+        Run func atomically and return its result
+
+        func is a plain (blocking) callable receiving a Transaction; it may
+        be retried on contention, so it must not have side effects other
+        than the transaction's own reads and writes.
+        """
+        raise NotImplementedError
+
+    async def write_batch(self, writes: Sequence[Write]):
+        """
+        Apply a list of blind writes atomically
+
+        Unlike run_transaction there are no reads, so nothing is locked
+        and the whole batch costs a single round-trip.
+        """
+        def apply(tx: Transaction):
+            for operation, collection, doc_id, data in writes:
+                if operation == 'delete':
+                    tx.delete(collection, doc_id)
+                else:
+                    getattr(tx, operation)(collection, doc_id, data)
+
+        await self.run_transaction(apply)
+
+    def watch(
+        self,
+        collection: str,
+        filters: Sequence[Filter],
+        on_changes: Callable[[List[Change]], None],
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None
+    ) -> Callable[[], None]:
+        """
+        Listen to the documents matching a query
+
+        on_changes first receives every matching document as 'added'
+        (possibly an empty list), then each committed batch of changes.
+        With a limit, documents leaving the window arrive as 'removed'.
+        It may be called from a background thread and must not block.
+        This call itself blocks, so run it through the I/O executor.
+
+        Returns:
+            Function that stops the listener
+        """
+        raise NotImplementedError
+
+    def watch_document(
+        self,
+        collection: str,
+        doc_id: str,
+        on_changes: Callable[[List[Change]], None]
+    ) -> Callable[[], None]:
+        """Listen to a single document, with the same contract as watch"""
+        return self.watch(collection, [('id', '==', doc_id)], on_changes)
+
+
+def to_datetime(value: Any) -> Any:
+    """Promote plain dates to midnight datetimes (Firestore has no date type)"""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime.combine(value, time.min)
+    return value
+
+
+def sort_key(value: Any) -> Tuple:
+    """Total ordering key across the value types stored in documents"""
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (4, value)
+    if isinstance(value, date):
+        return (4, datetime(value.year, value.month, value.day))
+    return (5, str(value))
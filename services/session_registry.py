@@ -0,0 +1,122 @@
+"""
+Session Registry
+Per-session auth state for concurrent Flet sessions on one instance
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+from services.metrics import Family, metrics
+
+
+class Session:
+    """Auth state of one Flet session (browser tab)"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.user: Optional[Dict[str, Any]] = None
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+
+    @property
+    def idle(self) -> float:
+        """Seconds since the session was last used"""
+        return time.monotonic() - self.last_seen
+
+
+class SessionRegistry:
+    """
+    Bounded map of Flet session ID -> Session
+
+    Sessions are kept in least-recently-used order: past SESSION_MAX the
+    oldest are dropped, and sessions idle for SESSION_IDLE_TIMEOUT seconds
+    are swept on access, so tabs closed without a clean disconnect do not
+    pile up. A dropped session simply has to log in again.
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, idle_timeout: Optional[float] = None):
+        self.max_sessions = max_sessions or int(os.getenv('SESSION_MAX', '1000'))
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(
+            os.getenv('SESSION_IDLE_TIMEOUT', '1800')
+        )
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.created = 0
+        self.closed = 0
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+        self.peak = 0
+
+    def get(self, session_id: str, create: bool = True) -> Optional[Session]:
+        """Get (by default creating) a session and mark it as used"""
+        with self._lock:
+            self._sweep()
+            session = self._sessions.get(session_id)
+            if session is None:
+                if not create:
+                    return None
+                session = self._sessions[session_id] = Session(session_id)
+                self.created += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted_capacity += 1
+                self.peak = max(self.peak, len(self._sessions))
+            session.last_seen = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def user(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """User logged in on a session, if any"""
+        session = self.get(session_id, create=False)
+        return session.user if session else None
+
+    def remove(self, session_id: str):
+        """Forget a session (logout or closed page)"""
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None:
+                self.closed += 1
+
+    def _sweep(self):
+        # Called with the lock held; at most every idle_timeout / 10 seconds
+        now = time.monotonic()
+        if self.idle_timeout <= 0 or now - self._last_sweep < self.idle_timeout / 10:
+            return
+        self._last_sweep = now
+        # LRU order: idle sessions are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen < self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted_idle += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Active sessions and lifetime counters"""
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'authenticated': sum(1 for s in self._sessions.values() if s.user is not None),
+                'maxSessions': self.max_sessions,
+                'peak': self.peak,
+                'created': self.created,
+                'closed': self.closed,
+                'evictedIdle': self.evicted_idle,
+                'evictedCapacity': self.evicted_capacity,
+            }
+
+
+def _session_metrics() -> Iterator[Family]:
+    stats = session_registry.stats()
+    yield 'nutri_sessions_active', 'gauge', 'Sessions in the registry', [({}, stats['active'])]
+    yield 'nutri_sessions_authenticated', 'gauge', 'Sessions with a logged in user', [({}, stats['authenticated'])]
+    yield 'nutri_sessions_evicted_total', 'counter', 'Sessions dropped by the registry', [
+        ({'reason': 'idle'}, stats['evictedIdle']),
+        ({'reason': 'capacity'}, stats['evictedCapacity']),
+    ]
+
+
+# Global session registry instance
+session_registry = SessionRegistry()
+metrics.register_collector(_session_metrics)
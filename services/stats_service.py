@@ -0,0 +1,276 @@
+"""
+Statistics Service
+Per-nutritionist counters maintained on write, with count-query fallback
+"""
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+from datetime import date, datetime, time, timedelta
+from services.realtime import RealtimeHub, realtime_hub
+from services.metrics import instrumented
+from services.repository import Repository, repository
+
+# One counters document per nutritionist, keyed by nutritionist ID:
+# {
+#     'clients': 12,
+#     'appointments': {'scheduled': 4, 'completed': 30, 'cancelled': 2, 'no-show': 1},
+#     'days': {'2026-10-18': {'total': 3, 'scheduled': 2}, ...},
+#     'rebuiltAt': datetime,
+# }
+# Writes only increment, so the totals are right only from a rebuild on:
+# documents without rebuiltAt (never rebuilt, or created by the first
+# increment after data already existed) are served from count queries
+# until the reconciliation job rebuilds them.
+COUNTERS_COLLECTION = 'nutritionistStats'
+
+APPOINTMENT_STATUSES = ('scheduled', 'completed', 'cancelled', 'no-show')
+
+# Rebuilds give up after this many counters writes raced with them
+REBUILD_ATTEMPTS = 5
+
+
+def day_key(value: Any) -> Optional[str]:
+    """Per-day bucket key (YYYY-MM-DD) for an appointment date"""
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return None
+
+
+def client_deltas(sign: int) -> Dict[str, int]:
+    """Counter deltas for creating (+1) or deleting (-1) a client"""
+    return {'clients': sign}
+
+
+def appointment_deltas(
+    appointment_date: Any,
+    old_status: Optional[str],
+    new_status: Optional[str]
+) -> Dict[str, int]:
+    """
+    Counter deltas for an appointment moving between statuses
+
+    old_status is None for a new appointment; new_status is None for a
+    removed one.
+    """
+    deltas: Dict[str, int] = {}
+    if old_status == new_status:
+        return deltas
+
+    day = day_key(appointment_date)
+    if old_status:
+        deltas[f'appointments.{old_status}'] = -1
+        if old_status == 'scheduled' and day:
+            deltas[f'days.{day}.scheduled'] = -1
+    if new_status:
+        deltas[f'appointments.{new_status}'] = 1
+        if new_status == 'scheduled' and day:
+            deltas[f'days.{day}.scheduled'] = 1
+
+    if day and old_status is None:
+        deltas[f'days.{day}.total'] = 1
+    elif day and new_status is None:
+        deltas[f'days.{day}.total'] = -1
+    return deltas
+
+
+@instrumented('stats_service')
+class StatsService:
+    """Service for dashboard statistics"""
+
+    def __init__(self, repo: Optional[Repository] = None, hub: Optional[RealtimeHub] = None):
+        self.repo = repo or repository
+        self.hub = hub or realtime_hub
+
+    async def get_nutritionist_stats(
+        self,
+        nutritionist_id: str,
+        today: Optional[date] = None
+    ) -> Dict[str, int]:
+        """
+        Get the nutritionist dashboard figures
+
+        Reads the counters document (one read). Counters never rebuilt
+        from the source collections (see rebuilt) fall back to
+        count_nutritionist_stats.
+
+        Args:
+            nutritionist_id: ID of the nutritionist
+            today: Reference day (defaults to the current date)
+
+        Returns:
+            totalClients, appointmentsToday and upcomingAppointments
+        """
+        today = today or date.today()
+        counters = await self.repo.get(COUNTERS_COLLECTION, nutritionist_id)
+        if not self.rebuilt(counters):
+            return await self.count_nutritionist_stats(nutritionist_id, today)
+        return self.figures(counters, today)
+
+    @staticmethod
+    def rebuilt(counters: Optional[Dict[str, Any]]) -> bool:
+        """Whether a counters document holds totals (not just increments)"""
+        return counters is not None and counters.get('rebuiltAt') is not None
+
+    def figures(self, counters: Dict[str, Any], today: date) -> Dict[str, int]:
+        """Dashboard figures from a counters document"""
+        today_key = day_key(today)
+        days = counters.get('days', {})
+        return {
+            'totalClients': max(int(counters.get('clients', 0)), 0),
+            'appointmentsToday': max(int(days.get(today_key, {}).get('total', 0)), 0),
+            'upcomingAppointments': max(sum(
+                int(bucket.get('scheduled', 0))
+                for key, bucket in days.items()
+                if key >= today_key
+            ), 0),
+        }
+
+    async def watch_nutritionist_stats(
+        self,
+        nutritionist_id: str,
+        on_change: Callable[[Dict[str, int]], Any]
+    ) -> Callable[[], None]:
+        """
+        Keep the dashboard figures live
+
+        Listens to the counters document, so every client or appointment
+        write pushes new figures (one document per change, shared by all
+        sessions of the nutritionist).
+
+        Returns:
+            Function that stops watching
+        """
+        async def count():
+            on_change(await self.count_nutritionist_stats(nutritionist_id))
+
+        def deliver(changes, documents):
+            if documents and self.rebuilt(documents[0]):
+                return on_change(self.figures(documents[0], date.today()))
+            # Partial or missing counters: the write still signals a change
+            return count()
+
+        return await self.hub.subscribe_document(
+            self.repo, COUNTERS_COLLECTION, nutritionist_id, deliver
+        )
+
+    async def count_nutritionist_stats(
+        self,
+        nutritionist_id: str,
+        today: Optional[date] = None
+    ) -> Dict[str, int]:
+        """
+        Compute the dashboard figures from the source collections
+
+        The three counts run concurrently as count aggregations over
+        bounded queries, so the cost does not grow with the
+        nutritionist's appointment history.
+        """
+        today = today or date.today()
+        day_start = datetime.combine(today, time.min)
+        day_end = day_start + timedelta(days=1)
+
+        total_clients, appointments_today, upcoming = await asyncio.gather(
+            self.repo.count('clients', [
+                ('nutritionistId', '==', nutritionist_id),
+            ]),
+            self.repo.count('appointments', [
+                ('nutritionistId', '==', nutritionist_id),
+                ('date', '>=', day_start),
+                ('date', '<', day_end),
+            ]),
+            self.repo.count('appointments', [
+                ('nutritionistId', '==', nutritionist_id),
+                ('status', '==', 'scheduled'),
+                ('date', '>=', day_start),
+            ]),
+        )
+
+        return {
+            'totalClients': total_clients,
+            'appointmentsToday': appointments_today,
+            'upcomingAppointments': upcoming,
+        }
+
+    async def rebuild_counters(self, nutritionist_id: str) -> Dict[str, Any]:
+        """
+        Rebuild a nutritionist's counters document from the source collections
+
+        Run by the reconciliation job (for counters without rebuiltAt and
+        for drift, e.g. documents edited by hand in the console) and after
+        imports; never on the read path, as it reads the whole appointment
+        history.
+
+        Client and appointment writes increment the counters in the same
+        transaction as the source document, so the counters document is
+        read before counting and only replaced if no increment landed
+        since; otherwise the rebuild starts over (up to REBUILD_ATTEMPTS).
+
+        Returns:
+            The rebuilt counters, or None if every attempt raced a write
+        """
+        for _ in range(REBUILD_ATTEMPTS):
+            before = await self.repo.get(COUNTERS_COLLECTION, nutritionist_id)
+            counters = await self.compute_counters(nutritionist_id)
+
+            def replace(tx, before=before, counters=counters):
+                if tx.get(COUNTERS_COLLECTION, nutritionist_id) != before:
+                    return False
+                tx.set(COUNTERS_COLLECTION, nutritionist_id, counters)
+                return True
+
+            if await self.repo.run_transaction(replace):
+                return counters
+
+        print(f"Error rebuilding counters for {nutritionist_id}: concurrent writes")
+        return None
+
+    async def compute_counters(self, nutritionist_id: str) -> Dict[str, Any]:
+        """Counters document computed from the source collections"""
+        total_clients, appointments = await asyncio.gather(
+            self.repo.count('clients', [('nutritionistId', '==', nutritionist_id)]),
+            self.repo.query('appointments', filters=[('nutritionistId', '==', nutritionist_id)]),
+        )
+
+        counters: Dict[str, Any] = {
+            'clients': total_clients,
+            'appointments': {status: 0 for status in APPOINTMENT_STATUSES},
+            'days': {},
+        }
+        for appointment in appointments:
+            status = appointment.get('status', 'scheduled')
+            counters['appointments'][status] = counters['appointments'].get(status, 0) + 1
+
+            day = day_key(appointment.get('date'))
+            if day:
+                bucket = counters['days'].setdefault(day, {'total': 0, 'scheduled': 0})
+                bucket['total'] += 1
+                if status == 'scheduled':
+                    bucket['scheduled'] += 1
+
+        counters['updatedAt'] = counters['rebuiltAt'] = datetime.now()
+        return counters
+
+    async def rebuild_all_counters(self) -> List[str]:
+        """Rebuild counters for every nutritionist, returning their IDs"""
+        nutritionists = await self.repo.query('users', filters=[('role', '==', 'nutritionist')])
+        for nutritionist in nutritionists:
+            await self.rebuild_counters(nutritionist['id'])
+        return [n['id'] for n in nutritionists]
+
+
+# Global stats service instance
+stats_service = StatsService()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Reconciliation job: python -m services.stats_service [nutritionist_id ...]
+    async def _reconcile(ids: List[str]):
+        if ids:
+            for nutritionist_id in ids:
+                await stats_service.rebuild_counters(nutritionist_id)
+        else:
+            ids = await stats_service.rebuild_all_counters()
+        print(f"✅ Counters rebuilt for {len(ids)} nutritionist(s)")
+
+    asyncio.run(_reconcile(sys.argv[1:]))
@@ -0,0 +1,323 @@
+"""
+Tracing
+Sampled spans from UI event handlers down to datastore and storage calls
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any):
+        """Set an attribute"""
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentId': self.parent_id,
+            'name': self.name,
+            'start': self.start_ns,
+            'durationMs': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+# Marks a context inside a trace that was not sampled
+_UNSAMPLED = object()
+
+# Active span of the current task/thread (io_executor carries it into workers)
+current_span: ContextVar[Any] = ContextVar('current_span', default=None)
+
+
+class _NoopScope:
+    """Scope of a span that is not recorded"""
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopScope()
+
+
+class _Scope:
+    """Makes a span (or the unsampled marker) current while the block runs"""
+
+    def __init__(self, tracer: 'Tracer', span: Any):
+        self.tracer = tracer
+        self.span = span
+        self.token = None
+
+    def set(self, key: str, value: Any):
+        if self.span is not _UNSAMPLED:
+            self.span.set(key, value)
+
+    def __enter__(self):
+        self.token = current_span.set(self.span)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current_span.reset(self.token)
+        if self.span is not _UNSAMPLED:
+            self.span.end_ns = time.time_ns()
+            if exc is not None:
+                self.span.error = f"{type(exc).__name__}: {exc}"
+            self.tracer.processor.submit(self.span)
+        return False
+
+
+class FileExporter:
+    """Appends spans to a JSON Lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+
+class OtlpExporter:
+    """Posts spans to an OTLP/HTTP collector (JSON encoding)"""
+
+    def __init__(self, endpoint: str, service_name: str, headers: Optional[Dict[str, str]] = None):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+
+    @staticmethod
+    def _value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {'boolValue': value}
+        if isinstance(value, int):
+            return {'intValue': str(value)}
+        if isinstance(value, float):
+            return {'doubleValue': value}
+        return {'stringValue': str(value)}
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        data = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': [{'key': k, 'value': self._value(v)} for k, v in span.attributes.items()],
+            # STATUS_CODE_ERROR / STATUS_CODE_UNSET
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 0},
+        }
+        if span.parent_id:
+            data['parentSpanId'] = span.parent_id
+        return data
+
+    def export(self, spans: List[Span]):
+        import urllib.request
+
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    {'key': 'service.name', 'value': {'stringValue': self.service_name}}
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': 'nutri_agenda'},
+                    'spans': [self._span(span) for span in spans],
+                }],
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode('utf-8'), headers=self.headers, method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+
+class BatchProcessor:
+    """
+    Exports finished spans in batches from a background thread
+
+    Ending a span only queues it; when the queue is full (exporter too
+    slow or down) spans are dropped and counted rather than blocking the app.
+    """
+
+    def __init__(self, exporter, max_queue: int = 2048, batch_size: int = 256, interval: float = 5.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trace-export', daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self):
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                span = False
+            if span is None:
+                self._export(batch)
+                return
+            if span:
+                batch.append(span)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + self.interval
+
+    def _export(self, batch: List[Span]):
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"Error exporting traces: {e}")
+
+    def shutdown(self, timeout: float = 5.0):
+        """Flush queued spans and stop the export thread"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+class Tracer:
+    """
+    Creates spans and decides which traces are recorded
+
+    A trace starts at a UI entry point (an event handler, a task or a
+    realtime callback, see metrics.track_screen) and is kept with
+    probability TRACE_SAMPLE_RATE. Service, datastore and storage calls
+    become child spans only inside a sampled trace, so everything else
+    costs one context variable lookup. Time in a handler span not covered
+    by its children is spent in the UI itself (building controls,
+    page.update()).
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[str] = None,
+        sample_rate: Optional[float] = None
+    ):
+        exporter = (exporter or os.getenv('TRACE_EXPORTER', 'none')).lower()
+        self.sample_rate = sample_rate if sample_rate is not None else float(
+            os.getenv('TRACE_SAMPLE_RATE', '0.01')
+        )
+        self.processor: Optional[BatchProcessor] = None
+
+        if exporter == 'file':
+            backend = FileExporter(os.getenv('TRACE_FILE', 'traces.jsonl'))
+        elif exporter == 'otlp':
+            headers = dict(
+                pair.split('=', 1) for pair in os.getenv('TRACE_OTLP_HEADERS', '').split(',') if '=' in pair
+            )
+            backend = OtlpExporter(
+                os.getenv('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'),
+                os.getenv('TRACE_SERVICE_NAME', 'nutri-agenda'),
+                headers
+            )
+        else:
+            backend = None
+
+        if backend is not None:
+            self.processor = BatchProcessor(
+                backend,
+                max_queue=int(os.getenv('TRACE_QUEUE_SIZE', '2048')),
+                interval=float(os.getenv('TRACE_FLUSH_INTERVAL', '5'))
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None and self.sample_rate > 0
+
+    def root_span(self, name: str, **attributes: Any):
+        """
+        Start a trace unless one is already active
+
+        Use at entry points that may also be called from inside a trace
+        (a handler calling another handler): nested calls add nothing.
+        """
+        if not self.enabled or current_span.get() is not None:
+            return _NOOP
+        if random.random() >= self.sample_rate:
+            return _Scope(self, _UNSAMPLED)
+        return _Scope(self, Span(name, secrets.token_hex(16), None, attributes))
+
+    def span(self, name: str, **attributes: Any):
+        """Start a child span of the active span (no-op outside a sampled trace)"""
+        parent = current_span.get()
+        if parent is None or parent is _UNSAMPLED:
+            return _NOOP
+        return _Scope(self, Span(name, parent.trace_id, parent.span_id, attributes))
+
+    def stats(self) -> Dict[str, Any]:
+        """Export counters"""
+        if self.processor is None:
+            return {'enabled': False}
+        return {
+            'enabled': self.enabled,
+            'sampleRate': self.sample_rate,
+            'exported': self.processor.exported,
+            'dropped': self.processor.dropped,
+        }
+
+
+# Global tracer instance
+tracer = Tracer()
@@ -0,0 +1,24 @@
+"""
+Test Configuration
+Local backends for the service tests, without Firebase
+"""
+import os
+
+import pytest
+
+# Before any service import: the global repository is built on import
+os.environ.setdefault('DEMO_MODE', 'true')
+os.environ.setdefault('DATA_BACKEND', 'memory')
+
+from services.local_repository import MemoryRepository, SQLiteRepository
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def repo(request):
+    """Each local backend, empty"""
+    if request.param == 'memory':
+        yield MemoryRepository()
+        return
+    sqlite = SQLiteRepository(':memory:')
+    yield sqlite
+    sqlite.close()
@@ -0,0 +1,67 @@
+"""
+Analytics Tests
+Edge cases of the measurement series computations
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from services.analytics import PROJECTION_HORIZON_DAYS, MeasurementSeries
+
+START = datetime(2026, 1, 5, 8)
+
+
+def series(weights, step=timedelta(days=1), **extra):
+    return MeasurementSeries.from_measurements([
+        dict({'date': START + step * i, 'weight': weight}, **extra)
+        for i, weight in enumerate(weights)
+    ])
+
+
+def test_projected_goal_date_follows_the_trend():
+    history = series([80 - 0.1 * i for i in range(30)])
+    assert history.projected_goal_date('weight', 75) == date(2026, 2, 24)
+
+
+def test_projected_goal_date_none_for_a_near_flat_trend():
+    history = series([80 - 1e-7 * i for i in range(30)])
+    assert history.projected_goal_date('weight', 70) is None
+
+
+def test_projected_goal_date_none_past_the_horizon():
+    # 0.001 kg/day needs 10000 days to lose 10 kg
+    history = series([80 - 0.001 * i for i in range(30)])
+    assert 10 / 0.001 > PROJECTION_HORIZON_DAYS
+    assert history.projected_goal_date('weight', 70) is None
+
+
+def test_projected_goal_date_none_when_moving_away():
+    history = series([70 + 0.1 * i for i in range(30)])
+    assert history.projected_goal_date('weight', 65) is None
+
+
+def test_rate_of_change_averages_readings_of_the_same_day():
+    history = MeasurementSeries.from_measurements([
+        {'date': START, 'weight': 80.0},
+        {'date': START + timedelta(hours=2), 'weight': 80.6},
+        {'date': START + timedelta(days=7), 'weight': 79.3},
+    ])
+    np.testing.assert_allclose(history.rate_of_change('weight'), [-1.0])
+
+
+def test_rate_of_change_skips_missing_values():
+    history = MeasurementSeries.from_measurements([
+        {'date': START, 'weight': 80.0},
+        {'date': START + timedelta(days=7), 'weight': None},
+        {'date': START + timedelta(days=14), 'weight': 79.0},
+    ])
+    np.testing.assert_allclose(history.rate_of_change('weight'), [-0.5])
+
+
+@pytest.mark.parametrize('weights', [[], [80.0]])
+def test_short_histories(weights):
+    history = series(weights)
+    assert len(history.rate_of_change('weight')) == 0
+    assert history.trend('weight') is None
+    assert history.projected_goal_date('weight', 70) is None
@@ -0,0 +1,88 @@
+"""
+Import Tests
+Interrupted imports resuming from their checkpoint
+"""
+import asyncio
+import csv
+import json
+
+import pytest
+
+from services.import_service import ImportService
+from services.stats_service import COUNTERS_COLLECTION
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def fail_on_batch(repo, number):
+    """Make the repository's write_batch fail on its number-th call"""
+    write_batch, calls = repo.write_batch, []
+
+    async def failing(writes):
+        calls.append(len(writes))
+        if len(calls) == number:
+            raise ConnectionError('connection lost')
+        await write_batch(writes)
+
+    repo.write_batch = failing
+    return lambda: setattr(repo, 'write_batch', write_batch)
+
+
+def test_client_import_resumes_and_rebuilds_every_owner(repo, tmp_path):
+    # n1's rows all land in the batch committed before the interruption
+    path = write_csv(tmp_path / 'clients.csv', [
+        {'id': f'c{i}', 'name': f'Cliente {i}', 'nutritionistId': 'n1' if i < 2 else 'n2'}
+        for i in range(6)
+    ])
+    checkpoint = str(tmp_path / 'clients.checkpoint')
+    service = ImportService(repo, batch_size=2, concurrency=1)
+
+    async def scenario():
+        restore = fail_on_batch(repo, 2)
+        with pytest.raises(ConnectionError):
+            await service.import_clients(path, checkpoint_path=checkpoint)
+        restore()
+        report = await service.import_clients(path, checkpoint_path=checkpoint)
+        counters = [await repo.get(COUNTERS_COLLECTION, owner) for owner in ('n1', 'n2')]
+        return report, counters
+
+    report, (n1, n2) = asyncio.run(scenario())
+    with open(checkpoint) as f:
+        assert json.load(f)['rowsCommitted'] == 6
+    assert (report['skipped'], report['imported']) == (2, 4)
+    assert (n1['clients'], n2['clients']) == (2, 4)
+
+
+def test_measurement_import_resume_buckets_every_client(repo, tmp_path, monkeypatch):
+    monkeypatch.setenv('MEASUREMENT_LAYOUT', 'bucketed')
+    path = write_csv(tmp_path / 'measurements.csv', [
+        {'clientId': 'c1' if i < 2 else 'c2', 'date': f'2026-{6 - i:02d}-10', 'weight': 80 - i, 'height': 170}
+        for i in range(6)
+    ])
+    checkpoint = str(tmp_path / 'measurements.checkpoint')
+    service = ImportService(repo, batch_size=2, concurrency=1)
+
+    async def scenario():
+        for client_id in ('c1', 'c2'):
+            await repo.set('clients', client_id, {'nutritionistId': 'n1'})
+        restore = fail_on_batch(repo, 2)
+        with pytest.raises(ConnectionError):
+            await service.import_measurements(path, checkpoint_path=checkpoint)
+        restore()
+        await service.import_measurements(path, checkpoint_path=checkpoint)
+        return (
+            await repo.count('measurements'),
+            {client_id: await service.measurements.get_measurements_by_client(client_id) for client_id in ('c1', 'c2')},
+            [await repo.get('clients', client_id) for client_id in ('c1', 'c2')],
+        )
+
+    flat, history, clients = asyncio.run(scenario())
+    assert flat == 0
+    assert [len(history[client_id]) for client_id in ('c1', 'c2')] == [2, 4]
+    assert [client['latestMeasurement']['weight'] for client in clients] == [80.0, 78.0]
@@ -0,0 +1,84 @@
+"""
+Local Repository Tests
+Document contract of the memory and SQLite backends, and their indexes
+"""
+import asyncio
+import json
+from datetime import date, datetime
+
+import pytest
+
+from services.indexes import MANIFEST_PATH, firestore_manifest
+from services.local_repository import LOCAL_INDEXES, pick_index
+from services.repository_base import DocumentNotFound
+
+
+def test_documents_round_trip(repo):
+    async def scenario():
+        created = await repo.add('clients', {'nutritionistId': 'n1', 'born': date(1990, 5, 1)})
+        await repo.update('clients', created['id'], {'personalInfo': {'name': 'Ana'}})
+        stored = await repo.get('clients', created['id'])
+        await repo.delete('clients', created['id'])
+        return created, stored, await repo.get('clients', created['id'])
+
+    created, stored, deleted = asyncio.run(scenario())
+    assert stored == dict(created, personalInfo={'name': 'Ana'})
+    assert deleted is None
+
+
+def test_update_of_a_missing_document_raises(repo):
+    with pytest.raises(DocumentNotFound):
+        asyncio.run(repo.update('clients', 'missing', {'name': 'Ana'}))
+
+
+def test_indexed_and_scanned_queries_agree(repo):
+    dates = [datetime(2026, 10, day, hour) for day in (1, 2, 3) for hour in (9, 12)]
+
+    async def scenario():
+        for i, when in enumerate(dates):
+            doc = {'nutritionistId': f'n{i % 2}', 'status': 'scheduled' if i % 3 else 'completed', 'date': when}
+            await repo.set('appointments', f'a{i}', doc)
+            # Same documents in a collection without indexes
+            await repo.set('unindexed', f'a{i}', doc)
+
+        filters = [
+            ('nutritionistId', '==', 'n0'),
+            ('date', '>=', date(2026, 10, 2)),
+        ]
+        results = []
+        for collection in ('appointments', 'unindexed'):
+            results.append((
+                await repo.query(collection, filters, order_by='date', descending=True),
+                await repo.count(collection, filters + [('status', '==', 'scheduled')]),
+            ))
+        return results
+
+    (indexed, indexed_count), (scanned, scanned_count) = asyncio.run(scenario())
+    assert indexed == scanned
+    assert [doc['id'] for doc in indexed] == ['a4', 'a2']
+    assert indexed_count == scanned_count == 2
+
+
+def test_transaction_increments(repo):
+    async def scenario():
+        def write(tx):
+            tx.increment('nutritionistStats', 'n1', {'clients': 1, 'days.2026-10-18.total': 2})
+        await repo.run_transaction(write)
+        await repo.run_transaction(write)
+        return await repo.get('nutritionistStats', 'n1')
+
+    counters = asyncio.run(scenario())
+    assert counters['clients'] == 2
+    assert counters['days'] == {'2026-10-18': {'total': 4}}
+
+
+def test_pick_index_prefers_the_range_field():
+    indexes = LOCAL_INDEXES['appointments']
+    filters = [('nutritionistId', '==', 'n1'), ('date', '>=', datetime(2026, 1, 1))]
+    assert pick_index(indexes, filters, 'date') == ('nutritionistId', 'date')
+    assert pick_index(indexes, [('status', '==', 'scheduled')], 'date') is None
+
+
+def test_firestore_manifest_is_generated():
+    with open(MANIFEST_PATH) as f:
+        assert json.load(f) == firestore_manifest()
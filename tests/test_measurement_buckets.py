@@ -0,0 +1,74 @@
+"""
+Measurement Bucket Tests
+Row ordering and migration of flat measurements into monthly buckets
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from services.measurement_buckets import (
+    BUCKETS_COLLECTION, MeasurementBuckets, append_row, bucket_id, new_bucket, remove_row
+)
+
+START = datetime(2026, 1, 30, 8)
+
+
+def measurement(i, when, client_id='c1'):
+    return {'id': f'm{i:02d}', 'clientId': client_id, 'date': when, 'weight': 80.0 - i, 'photos': []}
+
+
+def test_append_row_orders_and_replaces():
+    bucket = new_bucket('c1', START)
+    for i, day in enumerate((3, 1, 2, 1)):
+        append_row(bucket, measurement(i, datetime(2026, 1, day)))
+    append_row(bucket, dict(measurement(2, datetime(2026, 1, 2)), weight=70.0))
+    remove_row(bucket, 'missing')
+
+    assert bucket['columns']['id'] == ['m01', 'm03', 'm02', 'm00']
+    assert bucket['columns']['weight'][2] == 70.0
+    assert bucket['count'] == 4
+
+
+def test_migration_merges_months_and_is_rerunnable(repo):
+    buckets = MeasurementBuckets(repo)
+    rows = [measurement(i, START + timedelta(days=i)) for i in range(5)]
+
+    async def scenario():
+        for row in rows:
+            await repo.set('measurements', row['id'], row)
+        # Appended to its bucket before the migration ran: kept
+        await repo.run_transaction(lambda tx: buckets.append(tx, measurement(9, START)))
+
+        first = await buckets.migrate_client('c1')
+        second = await buckets.migrate_client('c1', prune=True)
+        return first, second, (
+            await repo.get(BUCKETS_COLLECTION, bucket_id('c1', START)),
+            await repo.get(BUCKETS_COLLECTION, bucket_id('c1', START + timedelta(days=4))),
+            await repo.count('measurements'),
+            [row['id'] for row in await buckets.query('c1')],
+        )
+
+    first, second, (january, february, flat, history) = asyncio.run(scenario())
+    assert first == second == 5
+    assert january['columns']['id'] == ['m00', 'm09', 'm01']
+    assert february['columns']['id'] == ['m02', 'm03', 'm04']
+    assert flat == 0
+    assert history == ['m04', 'm03', 'm02', 'm01', 'm09', 'm00']
+
+
+def test_pages_match_the_row_order(repo):
+    buckets = MeasurementBuckets(repo)
+
+    async def scenario():
+        for i in range(12):
+            row = measurement(i, START + timedelta(days=i // 2 * 9))
+            await repo.run_transaction(lambda tx, row=row: buckets.append(tx, row))
+        paged, cursor = [], None
+        while True:
+            page, cursor = await buckets.query_page('c1', page_size=5, cursor=cursor)
+            paged.extend(row['id'] for row in page)
+            if cursor is None:
+                return paged, [row['id'] for row in await buckets.query('c1')]
+
+    paged, history = asyncio.run(scenario())
+    assert paged == history
+    assert len(history) == 12
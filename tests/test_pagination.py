@@ -0,0 +1,85 @@
+"""
+Pagination Tests
+Cursor pages and streams over tied and interleaved sort values
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.appointment_service import AppointmentService
+
+START = datetime(2026, 10, 1, 9)
+
+
+async def seed(repo, count=25):
+    """n1's appointment IDs in (date, id) order"""
+    # Three appointments share each date, so pages must break ties by ID;
+    # IDs are written out of order
+    expected = []
+    for i in reversed(range(count)):
+        await repo.set('appointments', f'a{i:02d}', {
+            'nutritionistId': 'n1' if i % 4 else 'n2',
+            'date': START + timedelta(days=i // 3),
+        })
+        if i % 4:
+            expected.insert(0, f'a{i:02d}')
+    return expected
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('page_size', [1, 4, 18, 30])
+def test_pages_cover_the_query_once(repo, descending, page_size):
+    async def scenario():
+        expected = await seed(repo)
+        seen, cursor, pages = [], None, 0
+        while True:
+            docs, cursor = await repo.query_page(
+                'appointments', [('nutritionistId', '==', 'n1')], order_by='date',
+                descending=descending, page_size=page_size, cursor=cursor
+            )
+            seen.extend(doc['id'] for doc in docs)
+            pages += 1
+            if cursor is None:
+                return expected, seen, pages
+
+    expected, seen, pages = asyncio.run(scenario())
+    assert seen == (expected[::-1] if descending else expected)
+    assert pages == -(-len(expected) // page_size)
+
+
+def test_pages_survive_inserts_before_the_cursor(repo):
+    async def scenario():
+        await seed(repo)
+        first, cursor = await repo.query_page(
+            'appointments', [('nutritionistId', '==', 'n1')], order_by='date', page_size=5
+        )
+        # A new appointment sorting before the cursor does not shift later pages
+        await repo.set('appointments', 'a00-new', {'nutritionistId': 'n1', 'date': START})
+        second, _ = await repo.query_page(
+            'appointments', [('nutritionistId', '==', 'n1')], order_by='date', page_size=5, cursor=cursor
+        )
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert not {doc['id'] for doc in first} & {doc['id'] for doc in second}
+    assert second[0]['date'] >= first[-1]['date']
+
+
+def test_service_pages_and_stream_agree(repo):
+    service = AppointmentService(repo)
+
+    async def scenario():
+        expected = await seed(repo)
+        paged, cursor = [], None
+        while True:
+            page = await service.get_appointments_page_by_nutritionist('n1', page_size=7, cursor=cursor)
+            paged.extend(doc['id'] for doc in page['items'])
+            cursor = page['nextCursor']
+            if cursor is None:
+                break
+        streamed = [doc['id'] async for doc in service.iter_appointments_by_nutritionist('n1', page_size=4)]
+        return expected, paged, streamed
+
+    expected, paged, streamed = asyncio.run(scenario())
+    assert paged == streamed == expected
@@ -0,0 +1,18 @@
+"""
+Startup Tests
+Cold-start budget of the entry point (see utils.startup)
+"""
+import pytest
+
+# The cold start imports main, which needs the UI toolkit
+pytest.importorskip('flet')
+
+from utils.startup import budget_ms, measure_cold_start
+
+
+def test_cold_start_within_budget():
+    result = measure_cold_start(runs=3)
+
+    # None of HEAVY_MODULES may load before the login screen
+    assert result['heavyModules'] == []
+    assert result['medianMs'] <= budget_ms(), f"cold start {result['runsMs']} ms over {budget_ms()} ms"
@@ -0,0 +1,67 @@
+"""
+Statistics Tests
+Counters maintained on write, the count fallback and the rebuild job
+"""
+import asyncio
+from datetime import date, datetime, timedelta
+
+from services.appointment_service import AppointmentService
+from services.client_service import ClientService
+from services.stats_service import COUNTERS_COLLECTION, StatsService
+
+TODAY = date(2026, 10, 18)
+NOON = datetime(2026, 10, 18, 12)
+
+
+def test_counters_follow_writes(repo):
+    async def scenario():
+        clients, appointments, stats = ClientService(repo), AppointmentService(repo), StatsService(repo)
+        client = await clients.create_client('n1', {'name': 'Ana'}, {})
+        today = await appointments.create_appointment(client['client']['id'], 'n1', NOON)
+        await appointments.create_appointment(client['client']['id'], 'n1', NOON + timedelta(days=2))
+        await stats.rebuild_counters('n1')
+
+        await appointments.update_appointment_status(today['appointment']['id'], 'completed')
+        await clients.create_client('n1', {'name': 'Luis'}, {})
+        return await stats.get_nutritionist_stats('n1', TODAY)
+
+    assert asyncio.run(scenario()) == {
+        'totalClients': 2, 'appointmentsToday': 1, 'upcomingAppointments': 1,
+    }
+
+
+def test_partial_counters_are_counted_not_rebuilt(repo):
+    async def scenario():
+        clients, stats = ClientService(repo), StatsService(repo)
+        await repo.set('clients', 'old', {'nutritionistId': 'n1'})
+        # The first increment creates a counters document without the old client
+        await clients.create_client('n1', {'name': 'Ana'}, {})
+        figures = await stats.get_nutritionist_stats('n1', TODAY)
+        return figures, await repo.get(COUNTERS_COLLECTION, 'n1')
+
+    figures, counters = asyncio.run(scenario())
+    assert figures['totalClients'] == 2
+    assert counters['clients'] == 1 and 'rebuiltAt' not in counters
+
+
+def test_rebuild_retries_when_an_increment_races(repo):
+    clients = ClientService(repo)
+
+    class Racing(StatsService):
+        raced = False
+
+        async def compute_counters(self, nutritionist_id):
+            counters = await super().compute_counters(nutritionist_id)
+            if not self.raced:
+                self.raced = True
+                await clients.create_client(nutritionist_id, {'name': 'Luis'}, {})
+            return counters
+
+    async def scenario():
+        await clients.create_client('n1', {'name': 'Ana'}, {})
+        rebuilt = await Racing(repo).rebuild_counters('n1')
+        return rebuilt, await repo.get(COUNTERS_COLLECTION, 'n1')
+
+    rebuilt, stored = asyncio.run(scenario())
+    assert rebuilt['clients'] == stored['clients'] == 2
+    assert stored['rebuiltAt'] is not None
@@ -3,12 +3,14 @@ Client Dashboard Screen
 """
 import flet as ft
 from utils.theme import AppColors, AppSpacing, AppTheme
+from services.metrics import track_screen
 from services.auth_service import auth_service
 from services.appointment_service import appointment_service
 from services.measurement_service import measurement_service
 from datetime import datetime
 
 
+@track_screen('client_dashboard')
 class ClientDashboard:
     """Dashboard for clients"""
     
@@ -20,18 +22,22 @@ class ClientDashboard:
         # Data
         self.next_appointment = None
         self.latest_measurement = None
+        self.view = None
+        self.unsubscribers = []
+        self.disposed = False
         
         # Load data
-        self.load_data()
+        self.page.run_task(self.load_data)
     
     def get_view(self):
         """Get the screen view as a Container"""
-        return ft.Container(
+        self.view = ft.Container(
             content=self.build(),
             expand=True,
             bgcolor=AppColors.BACKGROUND,
             padding=AppSpacing.MD,
         )
+        return self.view
     
     def build(self):
         """Build dashboard UI"""
@@ -178,21 +184,57 @@ class ClientDashboard:
         """Load client data"""
         try:
             # Get next appointment
-            appointments = await appointment_service.get_appointments_by_client(self.user_data['id'])
-            upcoming = [a for a in appointments if a.get('status') == 'scheduled']
-            if upcoming:
-                self.next_appointment = upcoming[0]
+            self.next_appointment = await appointment_service.get_next_appointment(self.user_data['id'])
             
             # Get latest measurement
             self.latest_measurement = await measurement_service.get_latest_measurement(self.user_data['id'])
             
             # Update UI
-            self.content = self.build()
-            self.page.update()
+            self.refresh()
+            
+            # Keep both cards live from here on
+            await self.watch(
+                appointment_service.watch_next_appointment(self.user_data['id'], self.on_next_appointment)
+            )
+            await self.watch(
+                measurement_service.watch_latest_measurement(self.user_data['id'], self.on_latest_measurement)
+            )
             
         except Exception as e:
             print(f"Error loading data: {e}")
     
+    def on_next_appointment(self, appointment):
+        """Live update of the next appointment"""
+        self.next_appointment = appointment
+        self.refresh()
+    
+    def on_latest_measurement(self, measurement):
+        """Live update of the latest measurement"""
+        self.latest_measurement = measurement
+        self.refresh()
+    
+    def refresh(self):
+        """Rebuild the view with the current data"""
+        if self.view:
+            self.view.content = self.build()
+        self.page.update()
+    
+    async def watch(self, subscription):
+        """Keep a live subscription until the dashboard is disposed"""
+        unsubscribe = await subscription
+        if self.disposed:
+            # Left the dashboard while subscribing
+            unsubscribe()
+        else:
+            self.unsubscribers.append(unsubscribe)
+    
+    def dispose(self):
+        """Stop live updates (the dashboard is being left)"""
+        self.disposed = True
+        for unsubscribe in self.unsubscribers:
+            unsubscribe()
+        self.unsubscribers = []
+    
     def show_message(self, message: str):
         """Show a snackbar message"""
         self.page.snack_bar = ft.SnackBar(content=ft.Text(message))
@@ -4,8 +4,10 @@ Premium Redesign
 """
 import flet as ft
 from utils.theme import AppColors, AppSpacing, AppBorderRadius, AppTheme, AppShadows
+from services.metrics import track_screen
 
 
+@track_screen('login')
 class LoginScreen:
     """Login screen component with premium styling"""
     
@@ -149,13 +151,16 @@ class LoginScreen:
                                     content=ft.Stack(
                                         controls=[
                                             self.login_button,
+                                            # Same box as the button: Stack takes
+                                            # no alignment in Flet 0.21
                                             ft.Container(
                                                 content=self.loading_indicator,
                                                 alignment=ft.alignment.center_right,
                                                 padding=ft.padding.only(right=15),
+                                                width=320,
+                                                height=48,
                                             )
                                         ],
-                                        alignment=ft.alignment.center
                                     ),
                                 ),
                                 
@@ -168,12 +173,10 @@ class LoginScreen:
                                                style=AppTheme.get_body_style(),
                                                color=AppColors.TEXT_SECONDARY),
                                         ft.TextButton(
-                                            "Crear cuenta",
+                                            # ButtonStyle has no text_style in Flet 0.21
+                                            content=ft.Text("Crear cuenta", weight=ft.FontWeight.W_600),
                                             on_click=lambda _: self.on_go_to_register(),
-                                            style=ft.ButtonStyle(
-                                                color=AppColors.PRIMARY,
-                                                text_style=ft.TextStyle(weight=ft.FontWeight.W_600)
-                                            )
+                                            style=ft.ButtonStyle(color=AppColors.PRIMARY)
                                         ),
                                     ],
                                     alignment=ft.MainAxisAlignment.CENTER,
@@ -221,8 +224,13 @@ class LoginScreen:
         self.page.update()
         
         try:
+            # Services load in the background while this screen renders
+            # (see main.preload_services); this waits only if still loading
+            from services.auth_service import auth_service
+            
             # Attempt login
             result = await auth_service.login(
+                self.page.session_id,
                 self.email_field.value,
                 self.password_field.value
             )
@@ -3,12 +3,15 @@ Nutritionist Dashboard Screen
 """
 import flet as ft
 from utils.theme import AppColors, AppSpacing, AppTheme
+from services.metrics import track_screen
 from services.auth_service import auth_service
 from services.client_service import client_service
 from services.appointment_service import appointment_service
-from datetime import datetime, date
+from services.stats_service import stats_service
+from datetime import datetime
 
 
+@track_screen('nutritionist_dashboard')
 class NutritionistDashboard:
     """Dashboard for nutritionists"""
     
@@ -21,9 +24,12 @@ class NutritionistDashboard:
         self.total_clients = 0
         self.appointments_today = 0
         self.upcoming_appointments = 0
+        self.stat_values = {}
+        self.unsubscribers = []
+        self.disposed = False
         
         # Load data
-        self.load_stats()
+        self.page.run_task(self.load_stats)
     
     def get_view(self):
         """Get the screen view as a Container"""
@@ -76,19 +82,22 @@ class NutritionistDashboard:
                             "Total Clientes",
                             str(self.total_clients),
                             "people",
-                            AppColors.PRIMARY
+                            AppColors.PRIMARY,
+                            key='totalClients'
                         ),
                         self.create_stat_card(
                             "Citas Hoy",
                             str(self.appointments_today),
                             "today",
-                            AppColors.SECONDARY
+                            AppColors.SECONDARY,
+                            key='appointmentsToday'
                         ),
                         self.create_stat_card(
                             "Próximas Citas",
                             str(self.upcoming_appointments),
                             "event",
-                            AppColors.ACCENT
+                            AppColors.ACCENT,
+                            key='upcomingAppointments'
                         ),
                     ],
                     wrap=True,
@@ -148,14 +157,18 @@ class NutritionistDashboard:
             scroll=ft.ScrollMode.AUTO,
         )
     
-    def create_stat_card(self, title: str, value: str, icon, color: str):
+    def create_stat_card(self, title: str, value: str, icon, color: str, key: str = None):
         """Create a statistics card"""
+        value_text = ft.Text(value, size=32, weight=ft.FontWeight.BOLD)
+        if key:
+            self.stat_values[key] = value_text
+        
         return ft.Card(
             content=ft.Container(
                 content=ft.Column(
                     controls=[
                         ft.Icon(icon, size=40, color=color),
-                        ft.Text(value, size=32, weight=ft.FontWeight.BOLD),
+                        value_text,
                         ft.Text(title, size=14, color=AppColors.TEXT_SECONDARY),
                     ],
                     horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -169,35 +182,43 @@ class NutritionistDashboard:
     async def load_stats(self):
         """Load dashboard statistics"""
         try:
-            # Get total clients
-            clients = await client_service.get_clients_by_nutritionist(self.user_data['id'])
-            self.total_clients = len(clients)
-            
-            # Get appointments for today
-            today = date.today()
-            appointments = await appointment_service.get_appointments_by_nutritionist(
-                self.user_data['id'],
-                start_date=today,
-                end_date=today
-            )
-            self.appointments_today = len(appointments)
+            stats = await stats_service.get_nutritionist_stats(self.user_data['id'])
+            self.show_stats(stats)
             
-            # Get upcoming appointments
-            all_appointments = await appointment_service.get_appointments_by_nutritionist(
-                self.user_data['id']
+            # Keep the cards live from here on
+            await self.watch(
+                stats_service.watch_nutritionist_stats(self.user_data['id'], self.show_stats)
             )
-            self.upcoming_appointments = len([
-                a for a in all_appointments
-                if a.get('status') == 'scheduled' and a.get('date', datetime.now()).date() >= today
-            ])
-            
-            # Update UI would go here in production
-            # For now, stats are loaded but UI needs manual refresh
-            self.page.update()
             
         except Exception as e:
             print(f"Error loading stats: {e}")
     
+    def show_stats(self, stats: dict):
+        """Refresh the stat cards"""
+        self.total_clients = stats['totalClients']
+        self.appointments_today = stats['appointmentsToday']
+        self.upcoming_appointments = stats['upcomingAppointments']
+        
+        for key, value_text in self.stat_values.items():
+            value_text.value = str(stats[key])
+        self.page.update()
+    
+    async def watch(self, subscription):
+        """Keep a live subscription until the dashboard is disposed"""
+        unsubscribe = await subscription
+        if self.disposed:
+            # Left the dashboard while subscribing
+            unsubscribe()
+        else:
+            self.unsubscribers.append(unsubscribe)
+    
+    def dispose(self):
+        """Stop live updates (the dashboard is being left)"""
+        self.disposed = True
+        for unsubscribe in self.unsubscribers:
+            unsubscribe()
+        self.unsubscribers = []
+    
     def show_message(self, message: str):
         """Show a snackbar message"""
         self.page.snack_bar = ft.SnackBar(content=ft.Text(message))
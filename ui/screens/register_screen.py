@@ -3,9 +3,11 @@ Register Screen
 """
 import flet as ft
 from utils.theme import AppColors, AppSpacing, AppTheme
+from services.metrics import track_screen
 from services.auth_service import auth_service
 
 
+@track_screen('register')
 class RegisterScreen:
     """Registration screen component"""
     
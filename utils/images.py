@@ -0,0 +1,74 @@
+"""
+Image Processing
+Pure Pillow helpers, safe to run in worker processes
+"""
+import os
+from typing import Dict, List, Tuple
+
+# Variant spec: (name, longest side in pixels, output formats)
+Variant = Tuple[str, int, Tuple[str, ...]]
+
+CONTENT_TYPES = {
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+
+EXTENSIONS = {
+    'jpeg': 'jpg',
+    'webp': 'webp',
+}
+
+
+def _encode(image, image_format: str, quality: int, path: str):
+    # No exif/icc_profile arguments: metadata is not carried over
+    if image_format == 'webp':
+        image.save(path, format='WEBP', quality=quality, method=4)
+    else:
+        image.save(path, format='JPEG', quality=quality, optimize=True, progressive=True)
+
+
+def render_variants(
+    source_path: str,
+    variants: List[Variant],
+    quality: int,
+    output_dir: str
+) -> Dict[str, Dict[str, str]]:
+    """
+    Normalize a photo and render it at several sizes and formats
+
+    The photo is decoded once, rotated according to its EXIF orientation
+    and stripped of all metadata (EXIF, GPS, ICC). Variants are then
+    rendered from largest to smallest, each downsized from the previous one.
+    Input and output stay on disk so neither side of a worker pool has to
+    hold (or pickle) the encoded files.
+
+    Args:
+        source_path: Original encoded image (JPEG, PNG, WebP...)
+        variants: Variants to render
+        quality: Encoder quality (1-95)
+        output_dir: Directory the rendered files are written to
+
+    Returns:
+        {variant name: {format: rendered file path}}
+    """
+    from PIL import Image, ImageOps
+
+    largest = max(size for _, size, _ in variants)
+    results: Dict[str, Dict[str, str]] = {}
+
+    with Image.open(source_path) as original:
+        # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        for name, size, formats in sorted(variants, key=lambda v: -v[1]):
+            image.thumbnail((size, size), Image.LANCZOS)
+            results[name] = {}
+            for image_format in formats:
+                path = os.path.join(output_dir, f"{name}.{EXTENSIONS[image_format]}")
+                _encode(image, image_format, quality, path)
+                results[name][image_format] = path
+
+    return results
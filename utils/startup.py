@@ -0,0 +1,126 @@
+"""
+Startup Profiling
+Per-module import cost and cold-start budget of the entry point
+
+    python -m utils.startup [--top 25] [--runs 3] [--budget 2000]
+
+Prints the modules that `import main` spends the most time on, then
+checks that a fresh interpreter builds the login screen within
+COLD_START_BUDGET_MS and without loading any of HEAVY_MODULES; the exit
+status is 1 otherwise, so the check can gate a deploy or a test.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must stay out of the login screen's import path (loaded in the background)
+HEAVY_MODULES = ('firebase_admin', 'google.cloud.firestore', 'google.cloud.storage', 'PIL', 'numpy')
+
+# Run in a fresh interpreter: what a cold instance does before serving the login screen
+_COLD_START_SCRIPT = f"""
+import json, sys
+import main
+main.LoginScreen(None, None, None).get_view()
+print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))
+"""
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+def import_times(target: str = 'main') -> List[Tuple[str, float, float]]:
+    """
+    Import cost of every module loaded by `import target` (python -X importtime)
+
+    Returns:
+        (module, self ms, cumulative ms), slowest cumulative first
+    """
+    result = _run(['-X', 'importtime', '-c', f'import {target}'])
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line.split(':', 1)[1].split('|')
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            # Header line
+            continue
+        times.append((parts[2].strip(), self_us / 1000, cumulative_us / 1000))
+    return sorted(times, key=lambda t: -t[2])
+
+
+def measure_cold_start(runs: int = 3) -> Dict[str, Any]:
+    """
+    Time a fresh interpreter importing main and building the login screen
+
+    Returns:
+        median and per-run wall times in ms, and the heavy modules loaded
+    """
+    timings = []
+    loaded: List[str] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = _run(['-c', _COLD_START_SCRIPT])
+        timings.append((time.perf_counter() - started) * 1000)
+        loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        'medianMs': statistics.median(timings),
+        'runsMs': timings,
+        'heavyModules': loaded,
+    }
+
+
+def budget_ms() -> float:
+    """Cold-start budget in ms (COLD_START_BUDGET_MS)"""
+    return float(os.getenv('COLD_START_BUDGET_MS', '2000'))
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m utils.startup',
+        description='Report import costs and check the cold-start budget of main.py'
+    )
+    parser.add_argument('--top', type=int, default=25, help='Modules to list')
+    parser.add_argument('--runs', type=int, default=3, help='Cold starts to time')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='Budget in ms (default COLD_START_BUDGET_MS or 2000)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    budget = args.budget if args.budget is not None else budget_ms()
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for module, self_ms, cumulative_ms in import_times()[:args.top]:
+        print(f"{cumulative_ms:14.1f} {self_ms:9.1f}  {module}")
+
+    result = measure_cold_start(args.runs)
+    runs = ', '.join(f"{ms:.0f}" for ms in result['runsMs'])
+    print(f"\nCold start to login screen: {result['medianMs']:.0f} ms median ({runs}), budget {budget:.0f} ms")
+
+    ok = result['medianMs'] <= budget
+    if result['heavyModules']:
+        print(f"⚠️  Loaded before the login screen: {', '.join(result['heavyModules'])}")
+        ok = False
+    print("✅ Within budget" if ok else "⚠️  Over budget")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())